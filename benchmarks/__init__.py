@@ -0,0 +1,9 @@
+"""Suite de benchmarks de carga e inferencia.
+
+casos.py define las redes (cardio, reunion y redes sintéticas de tamaño creciente de
+src.generador_redes) y los casos que se miden sobre cada una; comparar.py contrasta
+dos archivos de resultados y marca las regresiones. Se ejecuta con:
+
+    python -m benchmarks correr -o benchmarks/resultados.json
+    python -m benchmarks comparar benchmarks/linea_base.json benchmarks/resultados.json
+"""
@@ -0,0 +1,89 @@
+"""Línea de comandos de la suite de benchmarks (python -m benchmarks)."""
+import argparse
+import sys
+
+from benchmarks import casos, comparar
+
+
+def _mostrar(resultado):
+    if 'omitido' in resultado:
+        detalle = f"omitido: {resultado['omitido']}"
+    else:
+        detalle = f"mediana {resultado['mediana'] * 1e3:.3f} ms  min {resultado['min'] * 1e3:.3f} ms"
+    print(f"{resultado['red']:<18} {resultado['caso']:<14} {detalle}", file=sys.stderr)
+
+
+def _historial(args):
+    """Imprime la mediana de cada (red, caso) a lo largo de las ejecuciones del historial."""
+    informes = casos.leer_historial(args.historial)
+    if not informes:
+        print(f"Historial vacío: {args.historial}")
+        return
+    print(f"{'fecha':<26} {'commit':<11} {'red':<18} {'caso':<14} {'mediana':>14}")
+    for informe in informes[-args.ultimos:]:
+        m = informe['metadatos']
+        for r in informe['resultados']:
+            if (args.red and r['red'] != args.red) or (args.caso and r['caso'] != args.caso):
+                continue
+            mediana = f"{r['mediana'] * 1e3:11.3f} ms" if 'mediana' in r else f"{'omitido':>14}"
+            print(f"{m['fecha']:<26} {str(m['commit'])[:10]:<11} {r['red']:<18} "
+                  f"{r['caso']:<14} {mediana}")
+
+
+def main():
+    p = argparse.ArgumentParser(description='Benchmarks de carga e inferencia')
+    sub = p.add_subparsers(dest='comando', required=True)
+    p_correr = sub.add_parser('correr', help='Medir todos los casos y guardar el informe JSON')
+    p_correr.add_argument('-o', '--salida', default='benchmarks/resultados.json')
+    p_correr.add_argument('--tamanos', type=int, nargs='*', default=list(casos.TAMANOS),
+                          help='Nodos de cada red sintética')
+    p_correr.add_argument('--repeticiones', type=int, default=5)
+    p_correr.add_argument('--casos', nargs='+', choices=casos.CASOS, default=list(casos.CASOS))
+    p_correr.add_argument('--base', help='Informe JSON contra el que comparar al terminar')
+    p_correr.add_argument('--guardar-base', action='store_true',
+                          help=f'Guardar además el informe como línea base ({casos.LINEA_BASE.name})')
+    p_correr.add_argument('--historial', nargs='?', const=str(casos.HISTORIAL), default=None,
+                          help='Agregar el informe a este archivo JSONL (sin valor, '
+                               f'a {casos.HISTORIAL.relative_to(casos.RAIZ)})')
+    p_comparar = sub.add_parser('comparar', help='Comparar un informe contra una línea base')
+    p_comparar.add_argument('nuevo', help='Informe JSON a comparar')
+    p_comparar.add_argument('--base', default=str(casos.LINEA_BASE),
+                            help='Informe JSON de la línea base (por defecto la versionada)')
+    for sp in (p_correr, p_comparar):
+        sp.add_argument('--umbral', type=float, default=comparar.UMBRAL,
+                        help='Aumento relativo de la mediana que se considera regresión')
+    p_historial = sub.add_parser('historial', help='Mostrar la evolución de las medianas')
+    p_historial.add_argument('--historial', default=str(casos.HISTORIAL))
+    p_historial.add_argument('--red', default=None)
+    p_historial.add_argument('--caso', choices=casos.CASOS, default=None)
+    p_historial.add_argument('--ultimos', type=int, default=10,
+                             help='Cantidad de ejecuciones más recientes a mostrar')
+    args = p.parse_args()
+
+    if args.comando == 'historial':
+        _historial(args)
+        return
+    if args.comando == 'correr':
+        nuevo = casos.correr(args.tamanos, args.repeticiones, args.casos, progreso=_mostrar)
+        casos.guardar(nuevo, args.salida)
+        print(f"Resultados guardados en: {args.salida}", file=sys.stderr)
+        if args.guardar_base:
+            casos.guardar(nuevo, casos.LINEA_BASE)
+            print(f"Línea base guardada en: {casos.LINEA_BASE}", file=sys.stderr)
+        if args.historial is not None:
+            casos.agregar_historial(nuevo, args.historial)
+            print(f"Informe agregado al historial: {args.historial}", file=sys.stderr)
+        if args.base is None:
+            return
+        base = comparar.cargar(args.base)
+    else:
+        base, nuevo = comparar.cargar(args.base), comparar.cargar(args.nuevo)
+
+    comparaciones = comparar.comparar(base, nuevo, args.umbral)
+    print(comparar.informe_texto(base, nuevo, comparaciones))
+    if any(c.estado == 'regresion' for c in comparaciones):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+"""Redes y casos medidos por la suite de benchmarks.
+
+Cada red se mide con los casos:
+- 'carga': construir_red_bayesiana desde los CSV (con compilación de CPTs)
+- 'enumeracion', 'eliminacion', 'arbol_uniones': una consulta P(X | e) con cada motor
+  exacto; X es el último nodo en orden topológico y e fija el primero
+- 'planificador': la misma consulta a través de Planificador
+- 'lote': consulta_lote sobre N_FILAS_LOTE filas de evidencia aleatoria
+- 'muestreo': consulta_muestreo_ponderado con N_MUESTRAS muestras
+
+Los motores exactos sólo se miden si el Planificador estima que la consulta cabe en
+MAX_OPERACIONES; si no, el caso se reporta como omitido.
+
+Cada informe puede guardarse como línea base (LINEA_BASE, versionada en el repositorio)
+y, si se pide, agregarse como una línea a HISTORIAL, un JSONL versionado que acumula
+las ejecuciones de referencia con su commit y los datos de la máquina.
+"""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import networkx
+import numpy as np
+import pandas as pd
+
+from src.arbol_uniones import compilar_arbol_uniones
+from src.bayesnet import construir_red_bayesiana, vista_modelo
+from src.eliminacion import consulta_eliminacion
+from src.generador_redes import escribir_red, generar_red
+from src.inference import consulta_enumeracion
+from src.lote import consulta_lote
+from src.muestreo import consulta_muestreo_ponderado
+from src.planificador import Planificador
+
+RAIZ = Path(__file__).resolve().parents[1]
+LINEA_BASE = RAIZ / 'benchmarks' / 'linea_base.json'
+HISTORIAL = RAIZ / 'benchmarks' / 'historial.jsonl'
+REDES_INCLUIDAS = ('cardio', 'reunion')
+TAMANOS = (10, 100, 1000)
+CASOS = ('carga', 'enumeracion', 'eliminacion', 'arbol_uniones', 'planificador', 'lote',
+         'muestreo')
+
+MAX_OPERACIONES = {'enumeracion': 1e6, 'eliminacion': 1e8, 'arbol_uniones': 1e8}
+N_FILAS_LOTE = 1000
+N_MUESTRAS = 10_000
+
+# Parámetros de las redes sintéticas (ver generar_red)
+PARAMETROS_SINTETICAS = {'max_padres': 2, 'tam_dominio': (2, 3), 'topologia': 'aleatoria',
+                         'localidad': 10, 'semilla': 0}
+
+
+def metadatos_maquina():
+    """Retorna dict con la máquina, el intérprete, las versiones de dependencias y el commit."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=RAIZ, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {'fecha': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'plataforma': platform.platform(), 'maquina': platform.machine(),
+            'procesador': platform.processor(), 'cpus': os.cpu_count(),
+            'python': sys.version.split()[0], 'numpy': np.__version__,
+            'pandas': pd.__version__, 'networkx': networkx.__version__, 'commit': commit}
+
+
+def medir(funcion, repeticiones):
+    """Ejecuta funcion una vez sin medir y luego repeticiones veces.
+
+    Returns:
+        dict con los segundos mínimo, mediana, media y desviación estándar
+    """
+    funcion()
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return {'repeticiones': repeticiones, 'min': min(tiempos),
+            'mediana': statistics.median(tiempos), 'media': statistics.fmean(tiempos),
+            'desviacion': statistics.stdev(tiempos) if len(tiempos) > 1 else 0.0}
+
+
+def _consulta(vista):
+    """Retorna (X, evidencia): último nodo en orden topológico dado el primero."""
+    orden = vista.orden_topologico
+    primero = orden[0]
+    return orden[-1], {primero: vista.dominios[primero][0]}
+
+
+def _evidencias_lote(vista, X, n_filas, semilla=0):
+    """Retorna un DataFrame de n_filas con valores aleatorios para hasta 3 variables."""
+    orden = [v for v in vista.orden_topologico if v != X]
+    columnas = list(dict.fromkeys(orden[i] for i in (0, len(orden) // 2, -1)))
+    rng = np.random.default_rng(semilla)
+    return pd.DataFrame({c: [vista.dominios[c][i]
+                             for i in rng.integers(0, len(vista.dominios[c]), n_filas)]
+                         for c in columnas})
+
+
+def medir_red(nombre, aristas, carpeta, repeticiones=5, casos=CASOS):
+    """Mide los casos sobre la red en carpeta; retorna la lista de resultados."""
+    cargar = lambda: construir_red_bayesiana(aristas, carpeta, compilar=True)
+    G = cargar()
+    vista = vista_modelo(G)
+    X, evidencia = _consulta(vista)
+    planificador = Planificador(G)
+    plan = planificador.planear(X, evidencia)
+
+    funciones = {
+        'carga': cargar,
+        'enumeracion': lambda: consulta_enumeracion(X, dict(evidencia), G,
+                                                    nivel_traza='apagado'),
+        'eliminacion': lambda: consulta_eliminacion(X, evidencia, G, nivel_traza='apagado'),
+        'planificador': lambda: planificador.consultar(X, evidencia),
+        'muestreo': lambda: consulta_muestreo_ponderado(X, evidencia, G,
+                                                        n_muestras=N_MUESTRAS, semilla=0),
+    }
+    if 'arbol_uniones' in casos and \
+            plan.operaciones['arbol_uniones'] <= MAX_OPERACIONES['arbol_uniones']:
+        arbol = compilar_arbol_uniones(G)
+        funciones['arbol_uniones'] = lambda: arbol.calibrar(evidencia)[X]
+    if 'lote' in casos:
+        filas = _evidencias_lote(vista, X, N_FILAS_LOTE)
+        funciones['lote'] = lambda: consulta_lote(X, filas, G)
+
+    resultados = []
+    for caso in casos:
+        resultado = {'red': nombre, 'nodos': len(vista.orden_topologico), 'caso': caso}
+        limite = MAX_OPERACIONES.get(caso)
+        if limite is not None and plan.operaciones[caso] > limite:
+            resultado['omitido'] = (f"{plan.operaciones[caso]:.3g} operaciones estimadas "
+                                    f"(límite {limite:.3g})")
+        else:
+            resultado.update(medir(funciones[caso], repeticiones))
+        resultados.append(resultado)
+    return resultados
+
+
+def correr(tamanos=TAMANOS, repeticiones=5, casos=CASOS, progreso=None):
+    """Corre la suite completa.
+
+    Args:
+        tamanos: número de nodos de cada red sintética
+        repeticiones: mediciones por caso (después de una ejecución de calentamiento)
+        casos: subconjunto de CASOS a medir
+        progreso: función opcional que recibe cada resultado al terminarlo
+
+    Returns:
+        dict con 'metadatos', 'parametros' y 'resultados' (serializable a JSON)
+    """
+    resultados = []
+
+    def registrar(lista):
+        for r in lista:
+            resultados.append(r)
+            if progreso is not None:
+                progreso(r)
+
+    for nombre in REDES_INCLUIDAS:
+        carpeta = RAIZ / 'data' / nombre
+        registrar(medir_red(nombre, carpeta / 'edges.csv', carpeta, repeticiones, casos))
+    with tempfile.TemporaryDirectory() as temporal:
+        for n in tamanos:
+            carpeta = Path(temporal) / f'sintetica_{n}'
+            escribir_red(carpeta, *generar_red(n, **PARAMETROS_SINTETICAS))
+            registrar(medir_red(f'sintetica_{n}', carpeta / 'edges.csv', carpeta,
+                                repeticiones, casos))
+    return {'metadatos': metadatos_maquina(),
+            'parametros': {'repeticiones': repeticiones, 'tamanos': list(tamanos),
+                           'n_filas_lote': N_FILAS_LOTE, 'n_muestras': N_MUESTRAS,
+                           'sinteticas': PARAMETROS_SINTETICAS},
+            'resultados': resultados}
+
+
+def guardar(informe, ruta):
+    """Escribe el informe de correr en ruta como JSON."""
+    Path(ruta).write_text(json.dumps(informe, indent=2, ensure_ascii=False) + '\n',
+                          encoding='utf-8')
+
+
+def agregar_historial(informe, ruta=HISTORIAL):
+    """Agrega el informe como una línea JSON al final del historial."""
+    with open(ruta, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(informe, ensure_ascii=False, separators=(',', ':')) + '\n')
+
+
+def leer_historial(ruta=HISTORIAL):
+    """Retorna la lista de informes del historial, del más antiguo al más reciente."""
+    ruta = Path(ruta)
+    if not ruta.exists():
+        return []
+    with open(ruta, encoding='utf-8') as f:
+        return [json.loads(linea) for linea in f if linea.strip()]
@@ -0,0 +1,80 @@
+"""Comparación de resultados de benchmarks contra una línea base.
+
+Se comparan las medianas de cada (red, caso) presente en ambos archivos. Un caso es
+regresión si su mediana nueva supera a la de la línea base en más de umbral (relativo)
+y en más de MINIMO_SEGUNDOS (para no marcar ruido en casos de microsegundos).
+"""
+import json
+from pathlib import Path
+
+UMBRAL = 0.25
+MINIMO_SEGUNDOS = 1e-4
+
+
+class Comparacion:
+    """Resultado de comparar un caso entre la línea base y una ejecución nueva.
+
+    Atributos:
+        red, caso: identificación del caso
+        base, nuevo: medianas en segundos (None si el caso falta o se omitió)
+        razon: nuevo / base (None si falta alguno)
+        estado: 'regresion', 'mejora', 'igual', 'nuevo', 'ausente' u 'omitido'
+    """
+    def __init__(self, red, caso, base, nuevo, umbral, minimo):
+        self.red = red
+        self.caso = caso
+        self.base = base
+        self.nuevo = nuevo
+        self.razon = nuevo / base if base and nuevo is not None else None
+        if base is None and nuevo is None:
+            self.estado = 'omitido'
+        elif base is None:
+            self.estado = 'nuevo'
+        elif nuevo is None:
+            self.estado = 'ausente'
+        elif nuevo - base > max(umbral * base, minimo):
+            self.estado = 'regresion'
+        elif base - nuevo > max(umbral * base, minimo):
+            self.estado = 'mejora'
+        else:
+            self.estado = 'igual'
+
+    def __str__(self):
+        formato = lambda s: f"{s * 1e3:11.3f} ms" if s is not None else f"{'-':>14}"
+        razon = f"{self.razon:6.2f}x" if self.razon is not None else f"{'-':>7}"
+        return (f"{self.red:<18} {self.caso:<14} {formato(self.base)} {formato(self.nuevo)} "
+                f"{razon}  {self.estado.upper() if self.estado == 'regresion' else self.estado}")
+
+
+def _medianas(informe):
+    return {(r['red'], r['caso']): r.get('mediana') for r in informe['resultados']}
+
+
+def cargar(ruta):
+    """Lee un informe JSON escrito por casos.guardar."""
+    return json.loads(Path(ruta).read_text(encoding='utf-8'))
+
+
+def comparar(base, nuevo, umbral=UMBRAL, minimo=MINIMO_SEGUNDOS):
+    """Compara dos informes (dicts de casos.correr); retorna lista de Comparacion."""
+    medianas_base, medianas_nuevo = _medianas(base), _medianas(nuevo)
+    claves = list(medianas_base) + [k for k in medianas_nuevo if k not in medianas_base]
+    return [Comparacion(red, caso, medianas_base.get((red, caso)),
+                        medianas_nuevo.get((red, caso)), umbral, minimo)
+            for red, caso in claves]
+
+
+def informe_texto(base, nuevo, comparaciones):
+    """Retorna la tabla de comparaciones con un encabezado sobre ambas máquinas."""
+    lineas = []
+    for etiqueta, informe in (('Base', base), ('Nuevo', nuevo)):
+        m = informe['metadatos']
+        lineas.append(f"{etiqueta}: {m['fecha']}  commit {str(m['commit'])[:10]}  "
+                      f"{m['plataforma']}  python {m['python']}  cpus {m['cpus']}")
+    if base['metadatos']['plataforma'] != nuevo['metadatos']['plataforma']:
+        lineas.append("Aviso: los informes vienen de plataformas distintas")
+    lineas.append(f"{'red':<18} {'caso':<14} {'base':>14} {'nuevo':>14} {'razón':>7}  estado")
+    lineas.extend(str(c) for c in comparaciones)
+    regresiones = sum(c.estado == 'regresion' for c in comparaciones)
+    lineas.append(f"{regresiones} regresiones de {len(comparaciones)} casos")
+    return '\n'.join(lineas)
@@ -0,0 +1,109 @@
+"""Análisis de trazas estructuradas (JSONL) de consulta_enumeracion.
+
+Lee la traza registro a registro, sin cargar el archivo completo en memoria, y
+reconstruye el árbol de enumeración con una pila: cada registro 'entra' abre un nodo
+y el 'ret'/'suma' correspondiente lo cierra. Por variable reporta cuántas veces se
+entró a enumerarla, el tiempo inclusivo pasado en sus subárboles y el tamaño de
+esos subárboles. También puede volver a renderizar la traza en el formato de texto.
+
+Uso:
+    python -m src.analisis_traza traza.jsonl
+    python -m src.analisis_traza traza.jsonl --texto
+"""
+import argparse
+import json
+from collections import defaultdict
+
+from src.inference import RenderizadorTraza
+
+
+def leer_registros(ruta):
+    """Genera los registros (dicts) de una traza JSONL, uno por línea."""
+    with open(ruta, encoding='utf-8') as f:
+        for linea in f:
+            linea = linea.strip()
+            if linea:
+                yield json.loads(linea)
+
+
+def renderizar(registros):
+    """Genera las líneas de texto legibles equivalentes a los registros."""
+    renderizador = RenderizadorTraza()
+    for r in registros:
+        yield from renderizador.lineas(r)
+
+
+class EstadisticaVariable:
+    """Acumulados de la enumeración de una variable."""
+    def __init__(self):
+        self.llamadas = 0
+        self.aciertos_cache = 0
+        self.tiempo = 0.0
+        self.nodos_subarbol = 0
+        self.max_subarbol = 0
+
+
+def analizar(registros):
+    """Recorre los registros y retorna (dict variable -> EstadisticaVariable, resumen).
+
+    resumen es un dict con el total de consultas, nodos del árbol y profundidad máxima.
+    """
+    stats = defaultdict(EstadisticaVariable)
+    resumen = {'consultas': 0, 'nodos': 0, 'profundidad_max': 0}
+    pila = []  # marcos [variable, ts de entrada, nodos del subárbol]
+    for r in registros:
+        t = r['t']
+        if t == 'consulta':
+            resumen['consultas'] += 1
+            pila = []
+        elif t == 'entra':
+            pila.append([r['v'], r.get('ts', 0.0), 1])
+            resumen['profundidad_max'] = max(resumen['profundidad_max'], r['d'] + 1)
+        elif t == 'cache':
+            st = stats[r['v']]
+            st.llamadas += 1
+            st.aciertos_cache += 1
+            resumen['nodos'] += 1
+            if pila:
+                pila[-1][2] += 1
+        elif t in ('ret', 'suma') and pila:
+            var, ts, nodos = pila.pop()
+            st = stats[var]
+            st.llamadas += 1
+            st.tiempo += r.get('ts', ts) - ts
+            st.nodos_subarbol += nodos
+            st.max_subarbol = max(st.max_subarbol, nodos)
+            resumen['nodos'] += 1
+            if pila:
+                pila[-1][2] += nodos
+    return dict(stats), resumen
+
+
+def imprimir_analisis(stats, resumen):
+    """Imprime una tabla por variable ordenada por tiempo inclusivo."""
+    print(f"Consultas: {resumen['consultas']}  Nodos del árbol: {resumen['nodos']}  "
+          f"Profundidad máxima: {resumen['profundidad_max']}")
+    print(f"{'Variable':<20} {'llamadas':>10} {'caché':>8} {'tiempo(s)':>11} "
+          f"{'subárbol medio':>15} {'subárbol máx':>13}")
+    for var, st in sorted(stats.items(), key=lambda kv: -kv[1].tiempo):
+        medio = st.nodos_subarbol / max(st.llamadas - st.aciertos_cache, 1)
+        print(f"{var:<20} {st.llamadas:>10} {st.aciertos_cache:>8} {st.tiempo:>11.6f} "
+              f"{medio:>15.1f} {st.max_subarbol:>13}")
+
+
+def main():
+    p = argparse.ArgumentParser(description='Analizar una traza JSONL de inferencia')
+    p.add_argument('traza', help='Ruta al archivo .jsonl generado con formato_traza="jsonl"')
+    p.add_argument('--texto', action='store_true',
+                   help='Imprimir la traza en el formato de texto legible en lugar de analizarla')
+    args = p.parse_args()
+
+    if args.texto:
+        for linea in renderizar(leer_registros(args.traza)):
+            print(linea)
+    else:
+        imprimir_analisis(*analizar(leer_registros(args.traza)))
+
+
+if __name__ == '__main__':
+    main()
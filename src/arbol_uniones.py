@@ -0,0 +1,238 @@
+"""Árbol de uniones (junction tree) para obtener todas las marginales de una vez.
+
+compilar_arbol_uniones construye, a partir del DiGraph de construir_red_bayesiana,
+un árbol de cliques del grafo moral triangulado. ArbolUniones.calibrar propaga la
+evidencia con dos pasadas de mensajes (Shafer-Shenoy: recolección hacia la raíz y
+distribución desde ella) y retorna la posterior de cada nodo, en lugar de una llamada
+a consulta_enumeracion por variable.
+"""
+import itertools
+import networkx as nx
+import numpy as np
+
+from src.bayesnet import vista_modelo
+from src.eliminacion import Factor, asegurar_compilada, multiplicar_factores
+from src.orden_eliminacion import grafo_moral, ordenar_eliminacion
+
+
+def triangular(moral, cardinalidades=None, heuristica='min_relleno'):
+    """Triangula el grafo moral por eliminación voraz (ver orden_eliminacion).
+
+    Retorna la lista de cliques maximales (tuplas de variables) inducidas por el orden.
+    Sin cardinalidades se supone que todas las variables son binarias.
+    """
+    if cardinalidades is None:
+        cardinalidades = dict.fromkeys(moral.nodes, 2)
+    return ordenar_eliminacion(moral, cardinalidades, heuristica=heuristica).cliques
+
+
+class ArbolUniones:
+    """Árbol de cliques compilado con los potenciales iniciales de la red."""
+    def __init__(self, cliques, aristas, potenciales, dominios, indices):
+        self.cliques = cliques
+        self.vecinos = {i: [] for i in range(len(cliques))}
+        for i, j in aristas:
+            self.vecinos[i].append(j)
+            self.vecinos[j].append(i)
+        self.separadores = {}
+        for i, j in aristas:
+            sep = tuple(v for v in cliques[i] if v in cliques[j])
+            self.separadores[(i, j)] = self.separadores[(j, i)] = sep
+        self.potenciales = potenciales
+        self.dominios = dominios
+        self.indices = indices
+        # clique más pequeña que contiene cada variable (para leer su marginal)
+        self.clique_de = {}
+        for i, c in sorted(enumerate(cliques), key=lambda ic: len(ic[1])):
+            for v in c:
+                self.clique_de.setdefault(v, i)
+        self.orden_recoleccion = list(self._postorden(0))
+
+    def _postorden(self, raiz):
+        """Genera pares (hijo, padre) del árbol desde las hojas hacia la raíz."""
+        pila, visitados, pares = [(raiz, None)], set(), []
+        while pila:
+            i, padre = pila.pop()
+            visitados.add(i)
+            if padre is not None:
+                pares.append((i, padre))
+            pila.extend((j, i) for j in self.vecinos[i] if j not in visitados)
+        return reversed(pares)
+
+    def _indicador(self, var, val):
+        """Factor indicador de var=val (1 en la posición de val, 0 en el resto)."""
+        if val not in self.indices[var]:
+            raise KeyError(f"Valor {val!r} fuera del dominio de '{var}'")
+        indicador = np.zeros(len(self.dominios[var]))
+        indicador[self.indices[var][val]] = 1.0
+        return Factor((var,), indicador)
+
+    def _potenciales_con_evidencia(self, evidencia):
+        """Copia de los potenciales multiplicados por indicadores de la evidencia."""
+        potenciales = list(self.potenciales)
+        for var, val in evidencia.items():
+            i = self.clique_de[var]
+            potenciales[i] = potenciales[i].multiplicar(self._indicador(var, val))
+        return potenciales
+
+    def _mensaje(self, i, j, potenciales, mensajes):
+        """Mensaje de la clique i a la clique j, normalizado para evitar subdesbordes."""
+        entrantes = [mensajes[(k, i)] for k in self.vecinos[i] if k != j]
+        m = multiplicar_factores([potenciales[i], *entrantes]).proyectar(self.separadores[(i, j)])
+        total = m.tabla.sum()
+        return Factor(m.variables, m.tabla / total) if total > 0 else m
+
+    def creencia(self, i, potenciales, mensajes):
+        """Potencial de la clique i por todos sus mensajes entrantes."""
+        return multiplicar_factores([potenciales[i]] +
+                                    [mensajes[(k, i)] for k in self.vecinos[i]])
+
+    def propagar(self, potenciales):
+        """Recolección y distribución; retorna dict (i, j) -> mensaje de i a j."""
+        mensajes = {}
+        for i, j in self.orden_recoleccion:
+            mensajes[(i, j)] = self._mensaje(i, j, potenciales, mensajes)
+        for j, i in reversed(self.orden_recoleccion):
+            mensajes[(i, j)] = self._mensaje(i, j, potenciales, mensajes)
+        return mensajes
+
+    def marginal(self, var, potenciales, mensajes):
+        """Distribución normalizada de var a partir de la creencia de su clique."""
+        tabla = self.creencia(self.clique_de[var], potenciales, mensajes).proyectar((var,)).tabla
+        total = tabla.sum()
+        if total == 0:
+            raise ValueError("La evidencia tiene probabilidad cero")
+        return {val: float(p) for val, p in zip(self.dominios[var], tabla / total)}
+
+    def calibrar(self, evidencia):
+        """Retorna dict variable -> distribución posterior para todos los nodos.
+
+        Args:
+            evidencia: dict con mapeo de variables a valores
+        """
+        potenciales = self._potenciales_con_evidencia(evidencia)
+        mensajes = self.propagar(potenciales)
+        return {var: self.marginal(var, potenciales, mensajes) for var in self.clique_de}
+
+    def sesion(self, evidencia=None):
+        """Retorna una SesionEvidencia sobre este árbol con la evidencia inicial dada."""
+        return SesionEvidencia(self, evidencia)
+
+
+class SesionEvidencia:
+    """Sesión de diagnóstico que agrega, cambia o retira evidencia de a un elemento.
+
+    Guarda los potenciales con evidencia y los mensajes de la última propagación. Al
+    cambiar la evidencia de una variable sólo se modifica el potencial de su clique y
+    sólo se invalidan los mensajes que se alejan de esa clique (los que dependen de
+    ella); el resto se reutiliza. Los mensajes inválidos se recalculan bajo demanda
+    al pedir posteriores. mensajes_calculados cuenta cuántos se han calculado.
+
+    Args:
+        arbol: ArbolUniones compilado (ver compilar_arbol_uniones)
+        evidencia: dict opcional con la evidencia inicial
+    """
+    def __init__(self, arbol, evidencia=None):
+        self.arbol = arbol
+        self.evidencia = {}
+        self.potenciales = list(arbol.potenciales)
+        self.mensajes = {}
+        self.mensajes_calculados = 0
+        for var, val in (evidencia or {}).items():
+            self.agregar(var, val)
+
+    def _fijar(self, var, val):
+        """Aplica evidencia[var] = val (o la retira si val es None) e invalida mensajes."""
+        if var not in self.arbol.clique_de:
+            raise KeyError(f"Variable '{var}' no está en la red")
+        if val is None:
+            self.evidencia.pop(var, None)
+        else:
+            self.arbol._indicador(var, val)  # valida el valor antes de modificar nada
+            self.evidencia[var] = val
+        c = self.arbol.clique_de[var]
+        potencial = self.arbol.potenciales[c]
+        for v, x in self.evidencia.items():
+            if self.arbol.clique_de[v] == c:
+                potencial = potencial.multiplicar(self.arbol._indicador(v, x))
+        self.potenciales[c] = potencial
+        # los mensajes (i, j) que se alejan de c son los que dependen de su potencial
+        pila, visitados = [c], {c}
+        while pila:
+            i = pila.pop()
+            for j in self.arbol.vecinos[i]:
+                if j not in visitados:
+                    visitados.add(j)
+                    self.mensajes.pop((i, j), None)
+                    pila.append(j)
+
+    def agregar(self, var, val):
+        """Agrega la observación var=val; var no debe estar observada."""
+        if var in self.evidencia:
+            raise ValueError(f"'{var}' ya está observada; use cambiar")
+        self._fijar(var, val)
+
+    def cambiar(self, var, val):
+        """Cambia el valor observado de var."""
+        if var not in self.evidencia:
+            raise ValueError(f"'{var}' no está observada; use agregar")
+        self._fijar(var, val)
+
+    def retirar(self, var):
+        """Retira la observación de var."""
+        if var not in self.evidencia:
+            raise ValueError(f"'{var}' no está observada")
+        self._fijar(var, None)
+
+    def _asegurar_mensajes(self, pares):
+        """Calcula, en el orden dado, los mensajes (i, j) que no estén vigentes."""
+        for i, j in pares:
+            if (i, j) not in self.mensajes:
+                self.mensajes[(i, j)] = self.arbol._mensaje(i, j, self.potenciales, self.mensajes)
+                self.mensajes_calculados += 1
+
+    def posterior(self, var):
+        """Retorna la distribución posterior de var dada la evidencia actual."""
+        raiz = self.arbol.clique_de[var]
+        self._asegurar_mensajes(self.arbol._postorden(raiz))
+        return self.arbol.marginal(var, self.potenciales, self.mensajes)
+
+    def posteriores(self):
+        """Retorna dict variable -> distribución posterior para todos los nodos."""
+        recoleccion = self.arbol.orden_recoleccion
+        self._asegurar_mensajes(recoleccion)
+        self._asegurar_mensajes((i, j) for j, i in reversed(recoleccion))
+        return {var: self.arbol.marginal(var, self.potenciales, self.mensajes)
+                for var in self.arbol.clique_de}
+
+
+def compilar_arbol_uniones(G, heuristica='min_relleno'):
+    """Construye un ArbolUniones a partir de la red bayesiana G.
+
+    Moraliza y triangula G (con la heurística de orden_eliminacion.HEURISTICAS dada),
+    une las cliques con un árbol de expansión máximo según el tamaño de los separadores
+    y asigna cada CPT a una clique que contenga su familia.
+    """
+    asegurar_compilada(G)
+    vista = vista_modelo(G)
+    dominios = vista.dominios
+    cliques = triangular(grafo_moral(G), {v: len(d) for v, d in dominios.items()}, heuristica)
+
+    grafo_cliques = nx.Graph()
+    grafo_cliques.add_nodes_from(range(len(cliques)))
+    for i, j in itertools.combinations(range(len(cliques)), 2):
+        grafo_cliques.add_edge(i, j, weight=len(set(cliques[i]) & set(cliques[j])))
+    aristas = list(nx.maximum_spanning_tree(grafo_cliques).edges)
+
+    potenciales = [Factor(c, np.ones(tuple(len(dominios[v]) for v in c))) for c in cliques]
+    for n in G.nodes:
+        compilada = G.nodes[n].get('cpt_compilada')
+        if compilada is None:
+            continue
+        familia = set(compilada.padres) | {n}
+        i = min((i for i, c in enumerate(cliques) if familia <= set(c)),
+                key=lambda i: len(cliques[i]))
+        f = Factor(compilada.padres + (n,), compilada.tabla)
+        potenciales[i] = potenciales[i].multiplicar(f)
+
+    return ArbolUniones(cliques, aristas, potenciales, dominios, vista.codigos)
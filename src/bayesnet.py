@@ -6,9 +6,16 @@ Archivos esperados:
   de padres que coincidan con los nombres de los padres.
 
 Este módulo construye un networkx DiGraph con CPTs almacenadas como atributo 'cpt' del nodo
-(un pandas.DataFrame).
+(un pandas.DataFrame), indexada una vez al cargar en un dict (atributo 'indice_cpt').
+Opcionalmente compila cada CPT a un arreglo denso de NumPy (atributo 'cpt_compilada')
+para búsquedas O(1). La estructura derivada (orden topológico, padres, hijos, mantos de
+Markov, dominios y sus códigos enteros) se calcula una vez y se guarda en G.graph['vista']
+(ver VistaModelo). Los dominios son tuplas ordenadas deducidas de las columnas 'value'
+y de padres de los archivos CPT (ver inferir_dominios).
 """
 from pathlib import Path
+from types import MappingProxyType
+import numpy as np
 import pandas as pd
 import networkx as nx
 import matplotlib.pyplot as plt
@@ -33,10 +40,407 @@ def leer_cpts(carpeta_cpt):
     return cpts
 
 
-def construir_red_bayesiana(ruta_csv_aristas, carpeta_cpt):
+class CPTCompilada:
+    """CPT de un nodo compilada a un arreglo denso de NumPy.
+
+    ``tabla`` tiene un eje por cada padre (en el orden de ``padres``) más un último
+    eje para el valor propio del nodo. ``indices`` mapea, para cada variable de la
+    familia, cada valor a su posición en el eje correspondiente. ``cpt`` guarda el
+    DataFrame del que se compiló (None si la tabla viene de un .bnc): si el atributo
+    'cpt' del nodo se reemplaza por otro objeto la tabla deja de corresponder y se
+    recompila (ver compilada_vigente).
+    """
+    def __init__(self, variable, padres, dominios, tabla, cpt=None):
+        self.cpt = cpt
+        self.variable = variable
+        self.padres = tuple(padres)
+        self.dominios = {v: tuple(dominios[v]) for v in self.padres + (variable,)}
+        self.indices = {v: {val: i for i, val in enumerate(dom)}
+                        for v, dom in self.dominios.items()}
+        self.tabla = tabla
+
+    def probabilidad(self, evidencia):
+        """Retorna P(variable=valor|padres) leyendo los valores desde evidencia."""
+        idx = tuple(self.indices[p][evidencia[p]] for p in self.padres)
+        idx += (self.indices[self.variable][evidencia[self.variable]],)
+        return float(self.tabla[idx])
+
+
+class IndiceCPT:
+    """Índice hash de las filas de una CPT (DataFrame).
+
+    ``tabla`` mapea (valores de padres..., valor) -> probabilidad. ``cpt`` guarda el
+    DataFrame indexado: si el atributo 'cpt' del nodo se reemplaza por otro objeto,
+    el índice deja de corresponder y se reconstruye (ver indexar_cpt).
+    """
+    def __init__(self, cpt, padres):
+        self.cpt = cpt
+        self.padres = tuple(padres)
+        columnas = [cpt[c].tolist() for c in self.padres + ('value',)]
+        self.tabla = dict(zip(zip(*columnas), cpt['prob'].astype(float).tolist()))
+
+    def probabilidad(self, variable, evidencia):
+        """Retorna P(variable=valor|padres) leyendo los valores desde evidencia."""
+        clave = tuple(evidencia[p] for p in self.padres) + (evidencia[variable],)
+        try:
+            return self.tabla[clave]
+        except KeyError:
+            raise KeyError(f"La CPT de '{variable}' no tiene fila para "
+                           f"{dict(zip(self.padres + (variable,), clave))}") from None
+
+
+def indexar_cpt(G, nodo):
+    """Construye y guarda en el atributo 'indice_cpt' del nodo el IndiceCPT de su CPT."""
+    indice = IndiceCPT(G.nodes[nodo]['cpt'], G.predecessors(nodo))
+    G.nodes[nodo]['indice_cpt'] = indice
+    return indice
+
+
+def reemplazar_cpt(G, nodo, cpt):
+    """Reemplaza la CPT de un nodo y regenera los datos derivados de ella.
+
+    La CPT se completa y valida (ver completar_cpt), se reconstruye el índice hash y,
+    si la red estaba compilada, se vuelve a compilar (los dominios pueden haber cambiado).
+    También sirve en redes cargadas de un .bnc, cuyos nodos sólo tienen 'cpt_compilada'.
+    Si la CPT es inválida se lanza ValueError y el nodo queda como estaba.
+    """
+    atributos = G.nodes[nodo]
+    anteriores = {k: atributos[k] for k in ('cpt', 'indice_cpt', 'huella_cpt')
+                  if k in atributos}
+    try:
+        atributos['cpt'] = cpt
+        atributos.pop('huella_cpt', None)
+        G.graph.pop('huella_red', None)
+        dominios = inferir_dominios(G)
+        atributos['cpt'] = completar_cpt(nodo, cpt, G.predecessors(nodo), dominios)
+        indexar_cpt(G, nodo)
+        if 'cpt_compilada' in atributos:
+            compilar_red(G)
+    except ValueError:
+        for k in ('cpt', 'indice_cpt', 'huella_cpt'):
+            atributos.pop(k, None)
+        atributos.update(anteriores)
+        raise
+    if 'cpt_compilada' not in atributos:
+        G.graph['dominios'] = dominios
+        G.graph.pop('vista', None)
+
+
+_PARES_BINARIOS = [('si', 'no'), ('sí', 'no'), ('yes', 'no'), ('true', 'false'),
+                   ('True', 'False'), ('verdadero', 'falso')]
+# valor -> valores que pueden acompañarlo en una variable binaria ('no' tiene varios)
+COMPLEMENTOS = {v: tuple(b if v == a else a for a, b in _PARES_BINARIOS if v in (a, b))
+                for par in _PARES_BINARIOS for v in par}
+
+
+def _complemento(valor, vistos):
+    """Retorna el valor complementario de un valor binario, o None si no es inequívoco.
+
+    Un booleano siempre tiene complemento. Para una cadena, de sus pares posibles en
+    COMPLEMENTOS se toma el único que aparece en vistos (valores usados por las
+    demás variables de la red); si no aparece ninguno o aparece más de uno, None.
+    """
+    if isinstance(valor, (bool, np.bool_)):
+        return not valor
+    if isinstance(valor, str):
+        candidatos = [c for c in COMPLEMENTOS.get(valor, ()) if c in vistos]
+        if len(candidatos) == 1:
+            return candidatos[0]
+    return None
+
+
+def inferir_dominios(G):
+    """Deduce el dominio ordenado de cada variable a partir de las CPTs del grafo.
+
+    El orden es el de primera aparición en la columna 'value' de la CPT propia;
+    los valores que sólo aparecen en columnas de padres se agregan al final. Si de una
+    variable sólo se conoce un valor y éste tiene un complemento inequívoco (True/False,
+    o un par de COMPLEMENTOS como 'si'/'no' cuyo otro valor ya usa otra variable de la
+    red) se considera binaria y se agrega el complemento, para que completar_tabla
+    pueda generar sus filas. Si no, el dominio queda con un solo valor y la validación
+    de la CPT reporta las probabilidades que no suman 1.
+    Los nodos sin 'cpt' (por ejemplo, los de un modelo .bnc) conservan el dominio de su
+    'cpt_compilada' o, si no la tienen, el de G.graph['dominios']. Si una variable tiene
+    los mismos valores que en G.graph['dominios'] se conserva el orden anterior.
+    Retorna dict variable -> tupla de valores.
+    """
+    dominios = {n: [] for n in G.nodes}
+    previos = G.graph.get('dominios') or {}
+    for n in G.nodes:
+        cpt = G.nodes[n].get('cpt')
+        if cpt is not None:
+            valores = cpt['value'].tolist()
+        else:
+            compilada = G.nodes[n].get('cpt_compilada')
+            valores = compilada.dominios[n] if compilada is not None else previos.get(n, ())
+        for val in valores:
+            if val not in dominios[n]:
+                dominios[n].append(val)
+    for n in G.nodes:
+        cpt = G.nodes[n].get('cpt')
+        if cpt is None:
+            compilada = G.nodes[n].get('cpt_compilada')
+            columnas = {} if compilada is None else compilada.dominios
+        else:
+            columnas = cpt
+        for p in G.predecessors(n):
+            if p not in columnas:
+                raise ValueError(f"La CPT de '{n}' no tiene columna para el padre '{p}'")
+            valores = cpt[p].tolist() if cpt is not None else columnas[p]
+            for val in valores:
+                if val not in dominios[p]:
+                    dominios[p].append(val)
+    vistos = {val for d in dominios.values() if len(d) > 1 for val in d
+              if isinstance(val, str)}
+    for d in dominios.values():
+        if len(d) == 1:
+            complemento = _complemento(d[0], vistos)
+            if complemento is not None:
+                d.append(complemento)
+    resultado = {}
+    for n, d in dominios.items():
+        previo = tuple(previos.get(n, ()))
+        resultado[n] = previo if len(previo) == len(d) and set(previo) == set(d) else tuple(d)
+    return resultado
+
+
+def codificar_dominios(dominios):
+    """Retorna dict variable -> mapeo valor -> código entero (su posición en el dominio)."""
+    return {n: MappingProxyType({val: i for i, val in enumerate(dom)})
+            for n, dom in dominios.items()}
+
+
+TOLERANCIA_SUMA = 1e-6
+
+
+def _tabla_desde_cpt(cpt, ejes, columnas, dominios):
+    """Vuelca las filas de la CPT en un arreglo denso; las celdas ausentes quedan en NaN."""
+    tabla = np.full(tuple(len(dominios[v]) for v in ejes), np.nan)
+    codigos = []
+    for v, col in zip(ejes, columnas):
+        indice = {val: i for i, val in enumerate(dominios[v])}
+        codigos.append(np.fromiter((indice[val] for val in cpt[col].tolist()),
+                                   dtype=np.intp, count=len(cpt)))
+    tabla[tuple(codigos)] = cpt['prob'].to_numpy(dtype=float)
+    return tabla
+
+
+def _describir_configuraciones(padres, dominios, posiciones, limite=3):
+    """Texto con las primeras configuraciones de padres indicadas por posiciones."""
+    descripciones = [str({p: dominios[p][i] for p, i in zip(padres, pos)})
+                     for pos in posiciones[:limite]]
+    if len(posiciones) > limite:
+        descripciones.append(f"... ({len(posiciones)} en total)")
+    return ', '.join(descripciones)
+
+
+def completar_tabla(variable, padres, dominios, tabla):
+    """Completa en sitio las celdas faltantes de una tabla CPT y la valida.
+
+    En cada configuración de padres a la que le falta exactamente un valor (el
+    complemento de una variable binaria, o el último estado de una n-aria) ese valor
+    se completa con 1 menos la suma del resto. Después se comprueba, en una sola pasada
+    vectorizada, que no queden celdas faltantes y que cada configuración sume 1.
+
+    Args:
+        variable: nombre del nodo dueño de la tabla
+        padres: secuencia de padres, en el orden de los ejes de la tabla
+        dominios: dict variable -> tupla de valores
+        tabla: numpy.ndarray con un eje por padre más uno para el valor propio
+
+    Returns:
+        numpy.ndarray booleano con las celdas que se completaron
+
+    Raises:
+        ValueError: si a alguna configuración le falta más de un valor, tiene
+                    probabilidades negativas o no suma 1
+    """
+    faltantes = np.isnan(tabla)
+    completadas = faltantes & (faltantes.sum(axis=-1, keepdims=True) == 1)
+    if completadas.any():
+        complemento = 1.0 - np.nansum(tabla, axis=-1, keepdims=True)
+        tabla[completadas] = np.broadcast_to(complemento, tabla.shape)[completadas]
+    validar_tabla(variable, padres, dominios, tabla)
+    np.clip(tabla, 0.0, None, out=tabla)
+    return completadas
+
+
+def validar_tabla(variable, padres, dominios, tabla):
+    """Verifica que la tabla CPT esté completa y que cada configuración sume 1.
+
+    Lanza ValueError describiendo las configuraciones de padres inválidas.
+    """
+    padres = tuple(padres)
+    incompletas = np.argwhere(np.isnan(tabla).any(axis=-1))
+    if len(incompletas):
+        raise ValueError(f"La CPT de '{variable}' no tiene filas suficientes para "
+                         f"{_describir_configuraciones(padres, dominios, incompletas)}")
+    sumas = tabla.sum(axis=-1)
+    invalidas = np.argwhere((np.abs(sumas - 1.0) > TOLERANCIA_SUMA)
+                            | (tabla < -TOLERANCIA_SUMA).any(axis=-1))
+    if len(invalidas):
+        raise ValueError(f"Las probabilidades de la CPT de '{variable}' no suman 1 para "
+                         f"{_describir_configuraciones(padres, dominios, invalidas)}")
+
+
+def completar_cpt(variable, cpt, padres, dominios):
+    """Retorna la CPT (DataFrame) con las filas de complemento agregadas al final.
+
+    Usa completar_tabla, así que también valida la CPT. Si no falta ninguna fila
+    retorna el mismo DataFrame.
+    """
+    padres = tuple(padres)
+    ejes = padres + (variable,)
+    columnas = padres + ('value',)
+    tabla = _tabla_desde_cpt(cpt, ejes, columnas, dominios)
+    completadas = completar_tabla(variable, padres, dominios, tabla)
+    if not completadas.any():
+        return cpt
+    posiciones = np.argwhere(completadas)
+    nuevas = pd.DataFrame({col: [dominios[v][i] for i in posiciones[:, k]]
+                           for k, (v, col) in enumerate(zip(ejes, columnas))})
+    nuevas['prob'] = tabla[completadas]
+    return pd.concat([cpt, nuevas], ignore_index=True)
+
+
+def compilar_cpt(variable, cpt, padres, dominios):
+    """Convierte la CPT (DataFrame) de una variable en una CPTCompilada.
+
+    Las filas de complemento ausentes se completan y la tabla se valida (ver
+    completar_tabla), así que la tabla resultante no tiene celdas faltantes.
+    """
+    padres = tuple(padres)
+    tabla = _tabla_desde_cpt(cpt, padres + (variable,), padres + ('value',), dominios)
+    completar_tabla(variable, padres, dominios, tabla)
+    return CPTCompilada(variable, padres, dominios, tabla, cpt)
+
+
+def compilar_red(G):
+    """Compila las CPTs de todos los nodos de G a tablas de NumPy.
+
+    Guarda cada CPTCompilada en el atributo 'cpt_compilada' del nodo y los dominios
+    deducidos en G.graph['dominios']. Los nodos sin 'cpt' conservan su tabla compilada;
+    lanza ValueError si los dominios de su familia cambiaron (la tabla ya no corresponde).
+    Retorna G.
+    """
+    dominios = inferir_dominios(G)
+    compiladas = {}
+    for n in G.nodes:
+        cpt = G.nodes[n].get('cpt')
+        if cpt is not None:
+            compiladas[n] = compilar_cpt(n, cpt, G.predecessors(n), dominios)
+            continue
+        compilada = G.nodes[n].get('cpt_compilada')
+        if compilada is not None:
+            cambiados = [v for v, dom in compilada.dominios.items()
+                         if tuple(dominios[v]) != dom]
+            if cambiados:
+                raise ValueError(f"La tabla compilada de '{n}' no admite los dominios nuevos "
+                                 f"de {cambiados}; reemplace también su CPT")
+    for n, compilada in compiladas.items():
+        G.nodes[n]['cpt_compilada'] = compilada
+    G.graph['dominios'] = dominios
+    G.graph.pop('vista', None)
+    return G
+
+
+def compilada_vigente(G, nodo):
+    """Retorna la CPTCompilada del nodo, recompilando la red si su 'cpt' fue reemplazada.
+
+    Retorna None si el nodo no está compilado.
+    """
+    atributos = G.nodes[nodo]
+    compilada = atributos.get('cpt_compilada')
+    if compilada is not None:
+        cpt = atributos.get('cpt')
+        if cpt is not None and cpt is not compilada.cpt:
+            compilar_red(G)
+            compilada = atributos['cpt_compilada']
+    return compilada
+
+
+class VistaModelo:
+    """Vista inmutable de la estructura de una red, calculada una sola vez.
+
+    Atributos (de sólo lectura):
+        orden_topologico: tupla de nodos en orden topológico
+        padres: mapeo nodo -> tupla de padres (mismo orden que G.predecessors)
+        hijos: mapeo nodo -> tupla de hijos
+        mantos_markov: mapeo nodo -> tupla con padres, hijos y padres de los hijos
+        dominios: mapeo nodo -> tupla de valores
+        codigos: mapeo nodo -> (valor -> código entero), ver codificar_dominios
+    """
+    __slots__ = ('orden_topologico', 'padres', 'hijos', 'mantos_markov', 'dominios',
+                 'codigos', 'firma', '_posicion')
+
+    def __init__(self, G, dominios):
+        orden = tuple(nx.topological_sort(G))
+        padres = {n: tuple(G.predecessors(n)) for n in orden}
+        hijos = {n: tuple(G.successors(n)) for n in orden}
+        mantos = {}
+        for n in orden:
+            manto = dict.fromkeys(padres[n] + hijos[n])
+            for c in hijos[n]:
+                manto.update(dict.fromkeys(padres[c]))
+            manto.pop(n, None)
+            mantos[n] = tuple(manto)
+        asignar = super().__setattr__
+        asignar('orden_topologico', orden)
+        asignar('padres', MappingProxyType(padres))
+        asignar('hijos', MappingProxyType(hijos))
+        asignar('mantos_markov', MappingProxyType(mantos))
+        dominios = {n: tuple(d) for n, d in dominios.items()}
+        asignar('dominios', MappingProxyType(dominios))
+        asignar('codigos', MappingProxyType(codificar_dominios(dominios)))
+        asignar('firma', (G.number_of_nodes(), G.number_of_edges()))
+        asignar('_posicion', MappingProxyType({n: i for i, n in enumerate(orden)}))
+
+    def __setattr__(self, nombre, valor):
+        raise AttributeError("VistaModelo es inmutable")
+
+    def ancestros(self, nodos):
+        """Retorna el conjunto de nodos junto con todos sus ancestros."""
+        resultado = set(nodos)
+        pendientes = list(resultado)
+        while pendientes:
+            for p in self.padres[pendientes.pop()]:
+                if p not in resultado:
+                    resultado.add(p)
+                    pendientes.append(p)
+        return resultado
+
+    def en_orden(self, nodos):
+        """Retorna los nodos dados como lista en orden topológico."""
+        return sorted(nodos, key=self._posicion.__getitem__)
+
+
+def vista_modelo(G):
+    """Retorna la VistaModelo de G, creándola si no existe o si la estructura cambió.
+
+    El cambio de estructura se detecta por el número de nodos y aristas; tras otras
+    modificaciones estructurales basta con borrar G.graph['vista']. Si G.graph no tiene
+    'dominios' se deducen de las CPTs (ver inferir_dominios) y se guardan ahí.
+    """
+    vista = G.graph.get('vista')
+    if vista is None or vista.firma != (G.number_of_nodes(), G.number_of_edges()):
+        dominios = G.graph.get('dominios')
+        if dominios is None:
+            dominios = G.graph['dominios'] = inferir_dominios(G)
+        vista = G.graph['vista'] = VistaModelo(G, dominios)
+    return vista
+
+
+def construir_red_bayesiana(ruta_csv_aristas, carpeta_cpt, compilar=False):
     """Construye y retorna un networkx.DiGraph con CPTs adjuntas.
 
-    El atributo 'cpt' del nodo contiene el pandas.DataFrame para la CPT de ese nodo (si existe).
+    El atributo 'cpt' del nodo contiene el pandas.DataFrame para la CPT de ese nodo (si existe),
+    con las filas de complemento faltantes agregadas (ver completar_cpt), y 'indice_cpt' su
+    IndiceCPT para búsquedas por clave; G.graph['dominios'] guarda los dominios deducidos
+    de las CPTs y G.graph['vista'] la VistaModelo de la red. Con compilar=True además se
+    adjunta 'cpt_compilada' (ver compilar_red), que usan directamente los motores de
+    inferencia.
+
+    Lanza ValueError si alguna CPT está incompleta o sus probabilidades no suman 1.
     """
     G = nx.DiGraph()
     aristas = leer_aristas(ruta_csv_aristas)
@@ -59,6 +463,19 @@ def construir_red_bayesiana(ruta_csv_aristas, carpeta_cpt):
             G.add_node(nodo)
         G.nodes[nodo]['cpt'] = df
 
+    # completar y validar cada CPT una vez conocidos los dominios
+    dominios = inferir_dominios(G)
+    for nodo in cpts:
+        G.nodes[nodo]['cpt'] = completar_cpt(nodo, G.nodes[nodo]['cpt'],
+                                             G.predecessors(nodo), dominios)
+        indexar_cpt(G, nodo)
+
+    if compilar:
+        compilar_red(G)
+    else:
+        G.graph['dominios'] = dominios
+    vista_modelo(G)
+
     return G
 
 
@@ -0,0 +1,170 @@
+"""Caché LRU/TTL de distribuciones posteriores.
+
+La clave de cada entrada es (huella de la red, variable de consulta, evidencia
+canónica). La huella (ver huella_red) resume la estructura y el contenido de todas
+las CPTs; si una CPT se reemplaza la huella cambia y las entradas calculadas con la
+CPT anterior dejan de encontrarse, sin tener que vaciar la caché a mano.
+"""
+import hashlib
+import inspect
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from src.bayesnet import vista_modelo
+from src.inference import consulta_enumeracion
+
+
+def _huella_cpt(nodo):
+    """Retorna el resumen del contenido de la CPT de un nodo, recalculándolo sólo si
+    el objeto de la CPT cambió desde la última vez (se compara por identidad)."""
+    cpt = nodo.get('cpt')
+    objeto = cpt if cpt is not None else nodo.get('cpt_compilada')
+    guardada = nodo.get('huella_cpt')
+    if guardada is not None and guardada[0] is objeto:
+        return guardada[1]
+    h = hashlib.blake2b(digest_size=16)
+    if cpt is not None:
+        h.update(repr(list(cpt.columns)).encode('utf-8'))
+        h.update(pd.util.hash_pandas_object(cpt, index=False).to_numpy().tobytes())
+    elif objeto is not None:
+        h.update(repr(objeto.padres).encode('utf-8'))
+        h.update(np.ascontiguousarray(objeto.tabla).tobytes())
+    nodo['huella_cpt'] = (objeto, h.digest())
+    return nodo['huella_cpt'][1]
+
+
+def _objeto_cpt(nodo):
+    cpt = nodo.get('cpt')
+    return cpt if cpt is not None else nodo.get('cpt_compilada')
+
+
+def huella_red(G):
+    """Retorna un resumen (bytes) de la estructura de G y del contenido de sus CPTs.
+
+    El resumen se guarda en G.graph['huella_red'] junto con la VistaModelo y el objeto
+    CPT de cada nodo; mientras ninguno cambie (se compara por identidad, sin volver a
+    leer las tablas ni contar aristas) se retorna el guardado. bayesnet.reemplazar_cpt
+    y compilar_red lo invalidan; tras agregar o quitar aristas a mano hay que borrar
+    G.graph['vista'] (o llamar a vista_modelo) para que se recalcule. El
+    resumen de cada CPT se guarda a su vez en el atributo 'huella_cpt' del nodo, así
+    que al recalcular sólo se leen las CPTs reemplazadas. Modificar un DataFrame en
+    sitio no cambia su identidad: en ese caso hay que pasar por reemplazar_cpt.
+    """
+    guardada = G.graph.get('huella_red')
+    if guardada is not None and guardada[0] is G.graph.get('vista') and \
+            len(guardada[1]) == len(G) and \
+            all(_objeto_cpt(a) is o for (_, a), o in zip(G.nodes(data=True), guardada[1])):
+        return guardada[2]
+    vista = vista_modelo(G)
+    h = hashlib.blake2b(digest_size=16)
+    for n in vista.orden_topologico:
+        h.update(repr((n, vista.padres[n])).encode('utf-8'))
+        h.update(_huella_cpt(G.nodes[n]))
+    objetos = [_objeto_cpt(a) for _, a in G.nodes(data=True)]
+    G.graph['huella_red'] = (vista, objetos, h.digest())
+    return h.digest()
+
+
+def evidencia_canonica(X, evidencia):
+    """Retorna la evidencia (sin X) como tupla de pares ordenada por variable."""
+    return tuple(sorted(((k, v) for k, v in evidencia.items() if k != X),
+                        key=lambda kv: str(kv[0])))
+
+
+class CachePosteriores:
+    """Caché acotada de posteriores con desalojo LRU y expiración opcional.
+
+    Args:
+        capacidad: número máximo de entradas; al superarlo se desaloja la menos
+                   usada recientemente
+        ttl: segundos de vida de cada entrada (None para que no expiren)
+        reloj: función que retorna el tiempo actual en segundos
+    """
+    def __init__(self, capacidad=1024, ttl=None, reloj=time.monotonic):
+        if capacidad < 1:
+            raise ValueError("capacidad debe ser al menos 1")
+        self.capacidad = capacidad
+        self.ttl = ttl
+        self.reloj = reloj
+        self.entradas = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+        self.expirados = 0
+        self.desalojos = 0
+        self._candado = threading.Lock()
+
+    def clave(self, G, X, evidencia):
+        """Retorna la clave (huella de la red, X, evidencia canónica) de una consulta."""
+        return huella_red(G), X, evidencia_canonica(X, evidencia)
+
+    def obtener(self, clave):
+        """Retorna la distribución guardada para clave, o None si no está o expiró."""
+        with self._candado:
+            entrada = self.entradas.get(clave)
+            if entrada is not None and self.ttl is not None and \
+                    self.reloj() - entrada[1] > self.ttl:
+                del self.entradas[clave]
+                self.expirados += 1
+                entrada = None
+            if entrada is None:
+                self.fallos += 1
+                return None
+            self.entradas.move_to_end(clave)
+            self.aciertos += 1
+            return dict(entrada[0])
+
+    def guardar(self, clave, distribucion):
+        """Guarda una copia de distribucion bajo clave, desalojando si hace falta."""
+        with self._candado:
+            self.entradas[clave] = (dict(distribucion), self.reloj())
+            self.entradas.move_to_end(clave)
+            while len(self.entradas) > self.capacidad:
+                self.entradas.popitem(last=False)
+                self.desalojos += 1
+
+    def consultar(self, X, evidencia, G, motor=consulta_enumeracion, **kwargs):
+        """Retorna P(X|evidencia) desde la caché o calculándola con motor.
+
+        Args:
+            X: str, variable de consulta
+            evidencia: dict con mapeo de variables a valores (no se modifica)
+            G: networkx.DiGraph de construir_red_bayesiana
+            motor: función con la firma de consulta_enumeracion; puede retornar la
+                   distribución o un resultado con atributo distribucion (como
+                   consulta_muestreo_ponderado), del que se guarda sólo la distribución
+            **kwargs: argumentos adicionales para motor (a los motores que aceptan
+                      nivel_traza se les pasa 'apagado' por defecto)
+
+        Returns:
+            Distribución sobre X como dict que mapea valores a probabilidades
+        """
+        clave = self.clave(G, X, evidencia)
+        distribucion = self.obtener(clave)
+        if distribucion is None:
+            if 'nivel_traza' in inspect.signature(motor).parameters:
+                kwargs.setdefault('nivel_traza', 'apagado')
+            resultado = motor(X, dict(evidencia), G, **kwargs)
+            distribucion = getattr(resultado, 'distribucion', resultado)
+            self.guardar(clave, distribucion)
+        return distribucion
+
+    def vaciar(self):
+        """Elimina todas las entradas (las estadísticas se conservan)."""
+        with self._candado:
+            self.entradas.clear()
+
+    def tasa_aciertos(self):
+        """Fracción de búsquedas que encontraron una entrada vigente."""
+        total = self.aciertos + self.fallos
+        return self.aciertos / total if total else 0.0
+
+    def estadisticas(self):
+        """Retorna dict con aciertos, fallos, expirados, desalojos, tamaño y tasa."""
+        with self._candado:
+            return {'aciertos': self.aciertos, 'fallos': self.fallos,
+                    'expirados': self.expirados, 'desalojos': self.desalojos,
+                    'tamano': len(self.entradas), 'tasa_aciertos': self.tasa_aciertos()}
@@ -29,17 +29,6 @@ def main():
     carpeta_data = Path(__file__).resolve().parents[1] / 'data' / 'cardio'
     aristas = carpeta_data / 'edges.csv'
 
-    # Definir valores posibles para cada variable
-    valores_variables = {
-        'Edad': {'joven', 'adulto', 'mayor'},
-        'Obesidad': {'si', 'no'},
-        'Sedentarismo': {'si', 'no'},
-        'PresionAlta': {'si', 'no'},
-        'DolorPecho': {'si', 'no'},
-        'Fatiga': {'si', 'no'},
-        'DiagnosticoCardio': {'si', 'no'}
-    }
-
     print("Construyendo red bayesiana del sistema de diagnóstico cardíaco...")
     G = construir_red_bayesiana(aristas, carpeta_data)
     mostrar_grafo(G, ruta_guardado=carpeta_data / 'grafo_cardio.png')
@@ -48,7 +37,6 @@ def main():
     print("Calculando probabilidad de condición cardíaca en persona mayor con presión alta")
     evidencia = {'Edad': 'mayor', 'PresionAlta': 'si'}
     dist = consulta_enumeracion('DiagnosticoCardio', evidencia, G,
-                               vars_red=valores_variables,
                                archivo_log=carpeta_data / 'traza_mayor_presion.txt')
     print("\nResultado:")
     imprimir_distribucion(dist)
@@ -62,7 +50,6 @@ def main():
         'DolorPecho': 'si'
     }
     dist = consulta_enumeracion('DiagnosticoCardio', evidencia, G,
-                               vars_red=valores_variables,
                                archivo_log=carpeta_data / 'traza_adulto_riesgo.txt')
     print("\nResultado:")
     imprimir_distribucion(dist)
@@ -76,7 +63,6 @@ def main():
         'Fatiga': 'si'
     }
     dist = consulta_enumeracion('DiagnosticoCardio', evidencia, G,
-                               vars_red=valores_variables,
                                archivo_log=carpeta_data / 'traza_joven_fatiga.txt')
     print("\nResultado:")
     imprimir_distribucion(dist)
@@ -12,21 +12,12 @@ def main():
     G = construir_red_bayesiana(aristas, carpeta_data)
     mostrar_grafo(G, ruta_guardado=carpeta_data / 'grafo_reunion.png')
 
-    # Definir valores posibles para cada variable
-    valores_variables = {
-        'Rain': {'none', 'light', 'heavy'},
-        'Maintenance': {'yes', 'no'},
-        'Train': {'on_time', 'delayed'},
-        'Appointment': {'yes', 'no'}
-    }
-
     # Consulta: P(Appointment | Rain=light ∧ Maintenance=no)
     print("\nEjemplo: P(Appointment | Rain=light ∧ Maintenance=no)")
     print("Calculando la probabilidad de llegar a la reunión dado que hay lluvia ligera y no hay mantenimiento")
     
     evidencia = {'Rain': 'light', 'Maintenance': 'no'}
-    dist = consulta_enumeracion('Appointment', evidencia, G, 
-                            vars_red=valores_variables,
+    dist = consulta_enumeracion('Appointment', evidencia, G,
                             archivo_log=carpeta_data / 'traza_reunion.txt')
     
     print("\nResultado P(Appointment | Rain=light ∧ Maintenance=no):")
@@ -0,0 +1,178 @@
+"""Inferencia exacta por eliminación de variables sobre factores de NumPy.
+
+Alternativa a consulta_enumeracion: en lugar de recorrer recursivamente todas las
+asignaciones de las variables ocultas, multiplica los factores (CPTs compiladas)
+que mencionan cada variable oculta y la suma, una variable a la vez.
+"""
+from functools import reduce
+import numpy as np
+
+from src.bayesnet import compilar_red, vista_modelo
+from src.inference import RastreadorInferencia, variables_relevantes
+from src.orden_eliminacion import grafo_interaccion, ordenar_eliminacion
+
+
+class Factor:
+    """Factor sobre variables discretas: una tabla de NumPy con un eje por variable."""
+    def __init__(self, variables, tabla):
+        self.variables = tuple(variables)
+        self.tabla = tabla
+
+    def _alinear(self, variables):
+        """Retorna la tabla transpuesta y con ejes de tamaño 1 para operar contra variables."""
+        orden = sorted(range(len(self.variables)),
+                       key=lambda i: variables.index(self.variables[i]))
+        forma = [self.tabla.shape[self.variables.index(v)] if v in self.variables else 1
+                 for v in variables]
+        return self.tabla.transpose(orden).reshape(forma)
+
+    def multiplicar(self, otro):
+        """Producto punto a punto con otro factor (unión de variables)."""
+        variables = self.variables + tuple(v for v in otro.variables if v not in self.variables)
+        return Factor(variables, self._alinear(variables) * otro._alinear(variables))
+
+    def sumar(self, var):
+        """Elimina var sumando sobre sus valores."""
+        eje = self.variables.index(var)
+        return Factor(self.variables[:eje] + self.variables[eje + 1:], self.tabla.sum(axis=eje))
+
+    def proyectar(self, variables):
+        """Suma todas las variables que no están en variables (marginal sobre ellas)."""
+        ejes = tuple(i for i, v in enumerate(self.variables) if v not in variables)
+        return Factor(tuple(v for v in self.variables if v in variables),
+                      self.tabla.sum(axis=ejes))
+
+    def reducir(self, var, idx):
+        """Fija var en el valor de posición idx (evidencia) y elimina su eje."""
+        eje = self.variables.index(var)
+        return Factor(self.variables[:eje] + self.variables[eje + 1:],
+                      np.take(self.tabla, idx, axis=eje))
+
+
+def multiplicar_factores(factores):
+    """Multiplica una lista de factores; con lista vacía retorna el factor unidad."""
+    return reduce(Factor.multiplicar, factores, Factor((), np.array(1.0)))
+
+
+def asegurar_compilada(G):
+    """Compila las CPTs de G si aún no lo están o si alguna 'cpt' se reemplazó desde
+    que se compiló (ver bayesnet.compilar_red)."""
+    if 'dominios' not in G.graph or any(
+            'cpt' in atributos and getattr(atributos.get('cpt_compilada'), 'cpt', None)
+            is not atributos['cpt'] for _, atributos in G.nodes(data=True)):
+        compilar_red(G)
+    return G
+
+
+def factores_con_evidencia(G, evidencia, nodos=None):
+    """Retorna la lista de factores de G (uno por CPT, o sólo los de nodos) reducidos
+    por la evidencia."""
+    factores = []
+    for n in (G.nodes if nodos is None else nodos):
+        compilada = G.nodes[n].get('cpt_compilada')
+        if compilada is None:
+            continue
+        f = Factor(compilada.padres + (n,), compilada.tabla)
+        for var in f.variables:
+            if var in evidencia:
+                if evidencia[var] not in compilada.indices[var]:
+                    raise KeyError(f"Valor {evidencia[var]!r} fuera del dominio de '{var}'")
+                f = f.reducir(var, compilada.indices[var][evidencia[var]])
+        factores.append(f)
+    return factores
+
+
+def eliminar_variables(factores, ocultas, rastreador=None, heuristica='min_relleno_ponderado'):
+    """Suma las variables ocultas de la lista de factores y retorna los factores restantes.
+
+    El orden de eliminación se calcula con orden_eliminacion.ordenar_eliminacion sobre
+    el grafo de interacción de los factores (el grafo moral una vez aplicada la
+    evidencia), con la heurística dada.
+    """
+    factores = list(factores)
+    cardinalidades = {}
+    for f in factores:
+        cardinalidades.update(zip(f.variables, f.tabla.shape))
+    grafo = grafo_interaccion(f.variables for f in factores)
+    orden = ordenar_eliminacion(grafo, cardinalidades, ocultas, heuristica).orden
+    for var in orden:
+        usados = [f for f in factores if var in f.variables]
+        factores = [f for f in factores if var not in f.variables]
+        nuevo = multiplicar_factores(usados).sumar(var)
+        factores.append(nuevo)
+        if rastreador is not None:
+            rastreador.agregar_paso(
+                f"Eliminando {var}: {len(usados)} factores -> factor sobre {list(nuevo.variables)}")
+    return factores
+
+
+def distribucion_conjunta(G, variables):
+    """Retorna un Factor con P(variables), con los ejes en el orden de variables.
+
+    Sólo se usan las CPTs de las variables y sus ancestros: las de los descendientes
+    estériles suman 1 y no cambian el resultado.
+    """
+    asegurar_compilada(G)
+    variables = tuple(variables)
+    relevantes = vista_modelo(G).ancestros(variables)
+    factores = [f for f in factores_con_evidencia(G, {}) if f.variables[-1] in relevantes]
+    ocultas = [n for n in relevantes if n not in variables]
+    conjunta = multiplicar_factores(eliminar_variables(factores, ocultas))
+    return Factor(variables, conjunta._alinear(variables))
+
+
+def consulta_eliminacion(X, evidencia, G, vars_red=None, archivo_log=None,
+                         nivel_traza='completo', rastreador=None):
+    """Retorna distribución sobre X por eliminación de variables dada la evidencia.
+
+    Misma firma y resultado que consulta_enumeracion. Las CPTs se compilan bajo demanda
+    si G no fue construido con compilar=True.
+
+    Args:
+        X: str, variable de consulta
+        evidencia: dict con mapeo de variables a valores
+        G: networkx.DiGraph con CPTs almacenadas en atributos de nodos
+        vars_red: dict opcional que mapea variables a sus valores posibles; si se da,
+                sólo se reportan los valores de vars_red[X]
+        archivo_log: ruta opcional para escribir traza de cómputo
+        nivel_traza: 'apagado', 'resumen' o 'completo' (por defecto)
+        rastreador: RastreadorInferencia ya configurado; si se da, archivo_log y
+                    nivel_traza se ignoran y cerrarlo queda a cargo de quien llama
+
+    Returns:
+        Distribución sobre X como dict que mapea valores a probabilidades
+    """
+    asegurar_compilada(G)
+    evidencia = {k: v for k, v in evidencia.items() if k != X}
+    propio = rastreador is None
+    if propio:
+        rastreador = RastreadorInferencia(archivo_log, nivel=nivel_traza)
+    try:
+        rastreador.agregar_paso(
+            f"\nCalculando P({X}|{evidencia}) por eliminación de variables", 'resumen')
+
+        # Sólo las CPTs de la red podada (ver inference.variables_relevantes): las de
+        # nodos estériles o d-separados de X aportan factores que se cancelan
+        dominios = vista_modelo(G).dominios
+        for var, val in evidencia.items():
+            if var in dominios and val not in G.nodes[var]['cpt_compilada'].indices[var]:
+                raise KeyError(f"Valor {val!r} fuera del dominio de '{var}'")
+        evidencia = {k: v for k, v in evidencia.items() if k in dominios}
+        relevantes = variables_relevantes(G, X, evidencia)
+        factores = factores_con_evidencia(G, evidencia, relevantes)
+        ocultas = [n for n in relevantes if n != X and n not in evidencia]
+        factores = eliminar_variables(factores, ocultas,
+                                      rastreador if rastreador.detallado else None)
+        resultado = multiplicar_factores(factores)
+
+        dominio = G.graph['dominios'][X]
+        Q = {x: float(resultado.tabla[i]) for i, x in enumerate(dominio)
+             if vars_red is None or x in vars_red[X]}
+        total = sum(Q.values())
+        for x in Q:
+            Q[x] /= total
+            rastreador.agregar_paso(f"P({X}={x}|e) = {Q[x]:.4f}", 'resumen')
+        return Q
+    finally:
+        if propio:
+            rastreador.cerrar()
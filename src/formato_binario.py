@@ -0,0 +1,108 @@
+"""Formato binario de red compilada, cargable con mmap.
+
+Un archivo .bnc contiene toda la red en un solo artefacto:
+
+    b'BNC1' | longitud del encabezado (uint64 little-endian) | encabezado JSON |
+    relleno hasta múltiplo de 64 | tablas CPT en float64 little-endian, cada una
+    alineada a 64 bytes
+
+El encabezado guarda la topología (nodos en orden topológico y aristas como pares de
+índices), la tabla de dominios y, por cada CPT, sus padres, forma y desplazamiento.
+cargar_modelo mapea el archivo en memoria: las tablas son vistas de sólo lectura sobre
+el mmap, así que varios procesos que cargan el mismo archivo comparten esas páginas a
+través del caché del sistema operativo y no hace falta releer ningún CSV.
+"""
+import json
+import mmap
+import struct
+from pathlib import Path
+
+import networkx as nx
+import numpy as np
+
+from src.bayesnet import CPTCompilada, construir_red_bayesiana, validar_tabla, vista_modelo
+from src.eliminacion import asegurar_compilada
+
+MAGICO = b'BNC1'
+ALINEACION = 64
+
+
+def _alinear(n):
+    return -(-n // ALINEACION) * ALINEACION
+
+
+def guardar_modelo(G, ruta):
+    """Escribe la red G (se compila si hace falta) como un archivo binario .bnc."""
+    asegurar_compilada(G)
+    nodos = list(vista_modelo(G).orden_topologico)
+    posicion = {n: i for i, n in enumerate(nodos)}
+    tablas = []
+    cpts = []
+    desplazamiento = 0
+    for n in nodos:
+        compilada = G.nodes[n].get('cpt_compilada')
+        if compilada is None:
+            continue
+        tabla = np.ascontiguousarray(compilada.tabla, dtype='<f8')
+        cpts.append({'nodo': posicion[n], 'padres': [posicion[p] for p in compilada.padres],
+                     'forma': list(tabla.shape), 'desplazamiento': desplazamiento})
+        tablas.append(tabla)
+        desplazamiento = _alinear(desplazamiento + tabla.nbytes)
+    encabezado = json.dumps({
+        'nodos': nodos,
+        'aristas': [[posicion[u], posicion[v]] for u, v in G.edges],
+        'dominios': [list(G.graph['dominios'][n]) for n in nodos],
+        'cpts': cpts,
+    }, ensure_ascii=False).encode('utf-8')
+
+    inicio_datos = _alinear(len(MAGICO) + 8 + len(encabezado))
+    with open(ruta, 'wb') as f:
+        f.write(MAGICO)
+        f.write(struct.pack('<Q', len(encabezado)))
+        f.write(encabezado)
+        f.write(b'\0' * (inicio_datos - f.tell()))
+        for cpt, tabla in zip(cpts, tablas):
+            f.write(b'\0' * (inicio_datos + cpt['desplazamiento'] - f.tell()))
+            f.write(tabla.tobytes())
+
+
+def cargar_modelo(ruta):
+    """Carga un archivo .bnc y retorna un networkx.DiGraph con CPTs compiladas.
+
+    Las tablas de cada 'cpt_compilada' son vistas de sólo lectura sobre el archivo
+    mapeado en memoria. El grafo no tiene atributo 'cpt' (DataFrame) en los nodos.
+    Lanza ValueError si alguna tabla está incompleta o no suma 1 (ver validar_tabla).
+    """
+    with open(ruta, 'rb') as f:
+        datos = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if datos[:len(MAGICO)] != MAGICO:
+        raise ValueError(f"{ruta} no es un modelo compilado (.bnc)")
+    (largo,) = struct.unpack_from('<Q', datos, len(MAGICO))
+    inicio = len(MAGICO) + 8
+    encabezado = json.loads(bytes(datos[inicio:inicio + largo]).decode('utf-8'))
+    inicio_datos = _alinear(inicio + largo)
+
+    nodos = encabezado['nodos']
+    dominios = {n: tuple(d) for n, d in zip(nodos, encabezado['dominios'])}
+    G = nx.DiGraph()
+    G.add_nodes_from(nodos)
+    G.add_edges_from((nodos[u], nodos[v]) for u, v in encabezado['aristas'])
+    for cpt in encabezado['cpts']:
+        nodo = nodos[cpt['nodo']]
+        forma = tuple(cpt['forma'])
+        tabla = np.frombuffer(datos, dtype='<f8', count=int(np.prod(forma)),
+                              offset=inicio_datos + cpt['desplazamiento']).reshape(forma)
+        padres = [nodos[p] for p in cpt['padres']]
+        validar_tabla(nodo, padres, dominios, tabla)
+        G.nodes[nodo]['cpt_compilada'] = CPTCompilada(nodo, padres, dominios, tabla)
+    G.graph['dominios'] = dominios
+    vista_modelo(G)
+    return G
+
+
+def cargar_red(ruta):
+    """Carga una red compilada desde un .bnc o desde una carpeta con edges.csv y cpt_*.csv."""
+    ruta = Path(ruta)
+    if ruta.suffix == '.bnc':
+        return cargar_modelo(ruta)
+    return construir_red_bayesiana(ruta / 'edges.csv', ruta, compilar=True)
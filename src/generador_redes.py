@@ -0,0 +1,145 @@
+"""Generador de redes bayesianas sintéticas para pruebas de escala.
+
+generar_red construye una red aleatoria (aristas y CPTs como DataFrames) y
+escribir_red la guarda en el formato que lee construir_red_bayesiana: edges.csv con
+columnas parent,child y un cpt_<Nodo>.csv por nodo con una columna por padre más
+'value' y 'prob'. Todas las filas de cada CPT se escriben, así que las tablas están
+completas y cada configuración de padres suma 1.
+
+Topologías:
+- 'aleatoria': los nodos se ordenan y cada uno elige sus padres entre los anteriores
+  (o sólo entre los `localidad` anteriores, para acotar el ancho inducido).
+- 'capas': los nodos se reparten en capas y los padres de cada nodo se eligen en la
+  capa anterior.
+
+Uso:
+    python -m src.generador_redes data/sintetica --nodos 1000 --max-padres 3 --semilla 1
+"""
+import argparse
+import itertools
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+TOPOLOGIAS = ('aleatoria', 'capas')
+
+
+def _nombre(i, n):
+    return f"V{i:0{len(str(n - 1))}d}"
+
+
+def _padres_aleatorios(rng, n, max_padres, localidad):
+    padres = []
+    for i in range(n):
+        inicio = 0 if localidad is None else max(0, i - localidad)
+        candidatos = np.arange(inicio, i)
+        k = int(rng.integers(0, min(max_padres, len(candidatos)) + 1))
+        padres.append(sorted(rng.choice(candidatos, size=k, replace=False).tolist()))
+    return padres
+
+
+def _padres_por_capas(rng, n, max_padres, n_capas):
+    limites = np.linspace(0, n, n_capas + 1).astype(int)
+    padres = [[] for _ in range(n)]
+    for c in range(1, n_capas):
+        anterior = np.arange(limites[c - 1], limites[c])
+        for i in range(limites[c], limites[c + 1]):
+            k = int(rng.integers(1, min(max_padres, len(anterior)) + 1)) if len(anterior) else 0
+            padres[i] = sorted(rng.choice(anterior, size=k, replace=False).tolist())
+    return padres
+
+
+def _tabla_aleatoria(rng, n_config, k, dispersion):
+    """Retorna (n_config, k) probabilidades; cada fila suma 1 y, con dispersion > 0,
+    una fracción de las celdas es exactamente 0 (nunca la fila completa)."""
+    tabla = rng.dirichlet(np.ones(k), size=n_config)
+    if dispersion > 0 and k > 1:
+        ceros = rng.random((n_config, k)) < dispersion
+        ceros[np.arange(n_config), tabla.argmax(axis=1)] = False
+        tabla[ceros] = 0.0
+        tabla /= tabla.sum(axis=1, keepdims=True)
+    return tabla
+
+
+def generar_red(n_nodos, max_padres=3, tam_dominio=(2, 2), topologia='aleatoria',
+                n_capas=None, localidad=None, dispersion=0.0, semilla=None):
+    """Genera una red bayesiana aleatoria.
+
+    Args:
+        n_nodos: número de nodos
+        max_padres: grado de entrada máximo de cada nodo
+        tam_dominio: (mínimo, máximo) del tamaño de dominio de cada variable
+        topologia: 'aleatoria' o 'capas'
+        n_capas: número de capas para 'capas' (por defecto ~ raíz de n_nodos)
+        localidad: para 'aleatoria', sólo se eligen padres entre los localidad nodos
+                   anteriores (None para cualquiera)
+        dispersion: fracción esperada de probabilidades iguales a 0 en las CPTs
+        semilla: semilla para numpy.random.default_rng
+
+    Returns:
+        (aristas, cpts): lista de pares (padre, hijo) y dict nodo -> DataFrame con la CPT
+    """
+    if topologia not in TOPOLOGIAS:
+        raise ValueError(f"topologia debe ser una de {TOPOLOGIAS}")
+    if not 0 <= dispersion < 1:
+        raise ValueError("dispersion debe estar en [0, 1)")
+    rng = np.random.default_rng(semilla)
+    if topologia == 'capas':
+        n_capas = n_capas or max(2, int(round(np.sqrt(n_nodos))))
+        padres = _padres_por_capas(rng, n_nodos, max_padres, min(n_capas, n_nodos))
+    else:
+        padres = _padres_aleatorios(rng, n_nodos, max_padres, localidad)
+
+    nombres = [_nombre(i, n_nodos) for i in range(n_nodos)]
+    tamanos = rng.integers(tam_dominio[0], tam_dominio[1] + 1, size=n_nodos)
+    dominios = [[f"v{j}" for j in range(t)] for t in tamanos]
+
+    aristas = [(nombres[p], nombres[i]) for i in range(n_nodos) for p in padres[i]]
+    cpts = {}
+    for i, nombre in enumerate(nombres):
+        configuraciones = list(itertools.product(*(dominios[p] for p in padres[i])))
+        k = len(dominios[i])
+        tabla = _tabla_aleatoria(rng, len(configuraciones), k, dispersion)
+        filas = {nombres[p]: np.repeat([c[j] for c in configuraciones], k)
+                 for j, p in enumerate(padres[i])}
+        filas['value'] = np.tile(dominios[i], len(configuraciones))
+        filas['prob'] = tabla.reshape(-1)
+        cpts[nombre] = pd.DataFrame(filas)
+    return aristas, cpts
+
+
+def escribir_red(carpeta, aristas, cpts):
+    """Escribe edges.csv y un cpt_<Nodo>.csv por nodo en carpeta (se crea si no existe)."""
+    carpeta = Path(carpeta)
+    carpeta.mkdir(parents=True, exist_ok=True)
+    pd.DataFrame(aristas, columns=['parent', 'child']).to_csv(carpeta / 'edges.csv', index=False)
+    for nodo, cpt in cpts.items():
+        cpt.to_csv(carpeta / f'cpt_{nodo}.csv', index=False)
+
+
+def main():
+    p = argparse.ArgumentParser(description='Generar una red bayesiana sintética en CSV')
+    p.add_argument('salida', help='Carpeta donde escribir edges.csv y cpt_*.csv')
+    p.add_argument('--nodos', type=int, default=100)
+    p.add_argument('--max-padres', type=int, default=3)
+    p.add_argument('--dominio-min', type=int, default=2, help='Tamaño mínimo de dominio')
+    p.add_argument('--dominio-max', type=int, default=2, help='Tamaño máximo de dominio')
+    p.add_argument('--topologia', choices=TOPOLOGIAS, default='aleatoria')
+    p.add_argument('--capas', type=int, default=None, help="Número de capas (topología 'capas')")
+    p.add_argument('--localidad', type=int, default=None,
+                   help="Elegir padres sólo entre los N nodos anteriores (topología 'aleatoria')")
+    p.add_argument('--dispersion', type=float, default=0.0,
+                   help='Fracción esperada de probabilidades iguales a 0')
+    p.add_argument('--semilla', type=int, default=None)
+    args = p.parse_args()
+
+    aristas, cpts = generar_red(args.nodos, args.max_padres, (args.dominio_min, args.dominio_max),
+                                args.topologia, args.capas, args.localidad, args.dispersion,
+                                args.semilla)
+    escribir_red(args.salida, aristas, cpts)
+    print(f"Red con {len(cpts)} nodos y {len(aristas)} aristas escrita en: {args.salida}")
+
+
+if __name__ == '__main__':
+    main()
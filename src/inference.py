@@ -4,39 +4,287 @@ Este módulo implementa el algoritmo de enumeración para inferencia exacta en
 redes bayesianas discretas, con un registro detallado del proceso de cómputo.
 """
 import itertools
+import json
+import queue
+import threading
+import time
 from collections import defaultdict
 from pathlib import Path
 import pandas as pd
-import networkx as nx
+
+from src.bayesnet import compilada_vigente, indexar_cpt, vista_modelo
+
+
+# Niveles de traza, de menor a mayor detalle
+NIVELES_TRAZA = ('apagado', 'resumen', 'completo')
+
+
+class EscritorTraza:
+    """Escribe líneas de traza en un archivo que se abre una sola vez.
+
+    Las líneas se acumulan y se escriben por bloques de tam_bloque. Con
+    en_segundo_plano=True los bloques se entregan a un hilo escritor, de modo que
+    quien traza nunca espera al disco.
+    """
+    def __init__(self, ruta, tam_bloque=256, en_segundo_plano=False):
+        self.archivo = open(ruta, 'w', encoding='utf-8')
+        self.tam_bloque = tam_bloque
+        self.bloque = []
+        self._cola = None
+        if en_segundo_plano:
+            self._cola = queue.Queue()
+            self._hilo = threading.Thread(target=self._escribir_cola, daemon=True)
+            self._hilo.start()
+
+    def _escribir_cola(self):
+        while True:
+            texto = self._cola.get()
+            if texto is None:
+                break
+            self.archivo.write(texto)
+
+    def escribir(self, linea):
+        """Agrega una línea al bloque actual y lo vacía si está lleno."""
+        self.bloque.append(linea)
+        if len(self.bloque) >= self.tam_bloque:
+            self.vaciar()
+
+    def vaciar(self):
+        """Entrega el bloque pendiente al archivo (o al hilo escritor)."""
+        if not self.bloque:
+            return
+        texto = '\n'.join(self.bloque) + '\n'
+        self.bloque = []
+        if self._cola is not None:
+            self._cola.put(texto)
+        else:
+            self.archivo.write(texto)
+
+    def cerrar(self):
+        """Vacía lo pendiente, detiene el hilo escritor (si hay) y cierra el archivo."""
+        self.vaciar()
+        if self._cola is not None:
+            self._cola.put(None)
+            self._hilo.join()
+        self.archivo.close()
+
+
+# Tipos de registro que sólo se emiten con nivel 'completo' (uno por paso de la recursión)
+TIPOS_DETALLE = frozenset({'entra', 'obs', 'ret', 'suma_ini', 'val', 'term', 'suma', 'cache'})
+
+
+class RenderizadorTraza:
+    """Convierte registros estructurados de traza en las líneas de texto legibles.
+
+    Mantiene la evidencia vigente (evidencia inicial más las asignaciones de la rama
+    actual) para reproducir las líneas 'Evidencia actual' sin guardarla en cada registro.
+    """
+    def __init__(self):
+        self.actual = {}
+
+    def lineas(self, r):
+        """Retorna la lista de líneas de texto correspondientes al registro r."""
+        t = r['t']
+        if t == 'consulta':
+            self.actual = dict(r['e'])
+            return [f"\nCalculando P({r['x']}|{self.actual})"]
+        if t == 'orden':
+            return [f"Variables en orden topológico: {r['v']}"]
+        if t == 'poda':
+            return [f"Variables relevantes tras la poda: {r['v']}"]
+        if t == 'inicio_x':
+            self.actual[r['x']] = r['val']
+            return [f"\nCalculando P({r['x']}={r['val']}, e)"]
+        if t == 'entra':
+            return [f"\nEnumerando sobre {r['v']}", f"  Evidencia actual: {self.actual}"]
+        if t == 'obs':
+            return [f"  {r['v']} en evidencia, P({r['v']}={r['val']}|padres)={r['p']:.4f}"]
+        if t == 'ret':
+            return [f"  Retornando {r['r']:.4f}"]
+        if t == 'suma_ini':
+            valores = ', '.join(repr(v) for v in r['vals'])
+            return [f"  Sumando sobre valores de {r['v']}: {{{valores}}}"]
+        if t == 'val':
+            self.actual[r['v']] = r['val']
+            return [f"    P({r['v']}={r['val']}|padres)={r['p']:.4f}"]
+        if t == 'term':
+            return [f"    Término para {r['v']}={r['val']}: {r['s']:.4f}"]
+        if t == 'suma':
+            self.actual.pop(r['v'], None)
+            return [f"  Suma para {r['v']}: {r['r']:.4f}"]
+        if t == 'cache':
+            return [f"\nSubresultado en caché desde {r['v']}: {r['r']:.4f}"]
+        if t == 'res_x':
+            return [f"P({r['x']}={r['val']}, e) = {r['p']:.4f}"]
+        if t == 'cache_stats':
+            return [f"Caché de enumeración: {r['aciertos']} aciertos, {r['fallos']} fallos"]
+        if t == 'posterior':
+            return [f"P({r['x']}={r['val']}|e) = {r['p']:.4f}"]
+        return [r['texto']]
 
 
 class RastreadorInferencia:
-    """Rastrea y registra los pasos de cómputo de la inferencia."""
-    def __init__(self, archivo_log=None):
+    """Rastrea y registra los pasos de cómputo de la inferencia.
+
+    El nivel controla qué se registra: 'apagado' no registra nada, 'resumen' sólo
+    los pasos de nivel resumen (consulta, resultados) y 'completo' todos. Los motores
+    consultan rastreador.detallado antes de construir los registros de cada paso, así
+    que con niveles bajos no se paga el costo de construirlos.
+
+    Los pasos se registran como dicts (ver RenderizadorTraza para los tipos). Con
+    formato='texto' se escriben las líneas legibles de siempre; con formato='jsonl'
+    se escribe un registro JSON compacto por línea, con marca de tiempo 'ts' en
+    segundos desde la creación del rastreador (ver src/analisis_traza.py).
+    """
+    def __init__(self, archivo_log=None, nivel='completo', imprimir=True, tam_bloque=256,
+                 en_segundo_plano=False, formato='texto'):
+        if nivel not in NIVELES_TRAZA:
+            raise ValueError(f"Nivel de traza desconocido: {nivel!r} (use uno de {NIVELES_TRAZA})")
+        if formato not in ('texto', 'jsonl'):
+            raise ValueError(f"Formato de traza desconocido: {formato!r} (use 'texto' o 'jsonl')")
+        self.nivel = NIVELES_TRAZA.index(nivel)
+        self.detallado = nivel == 'completo'
+        self.imprimir = imprimir
+        self.formato = formato
+        self.renderizador = RenderizadorTraza()
+        self.inicio = time.perf_counter()
         self.pasos = []
         self.archivo_log = Path(archivo_log) if archivo_log else None
-        if self.archivo_log:
+        self.escritor = None
+        if self.archivo_log and nivel != 'apagado':
             # Iniciar log nuevo
-            self.archivo_log.write_text('')
+            self.escritor = EscritorTraza(self.archivo_log, tam_bloque, en_segundo_plano)
+
+    def registrar(self, registro, nivel=None):
+        """Registra un paso estructurado si el nivel del rastreador lo incluye.
+
+        Si no se indica nivel, los tipos de TIPOS_DETALLE son de nivel 'completo' y
+        el resto de nivel 'resumen'.
+        """
+        if nivel is None:
+            nivel = 'completo' if registro['t'] in TIPOS_DETALLE else 'resumen'
+        if NIVELES_TRAZA.index(nivel) > self.nivel:
+            return
+        if self.formato == 'jsonl':
+            registro['ts'] = round(time.perf_counter() - self.inicio, 7)
+            self.pasos.append(registro)
+            if self.escritor:
+                self.escritor.escribir(json.dumps(registro, separators=(',', ':'),
+                                                  ensure_ascii=False, default=str))
+            if self.imprimir:
+                for linea in self.renderizador.lineas(registro):
+                    print(linea)
+            return
+        for linea in self.renderizador.lineas(registro):
+            if self.imprimir:
+                print(linea)
+            self.pasos.append(linea)
+            if self.escritor:
+                self.escritor.escribir(linea)
     
-    def agregar_paso(self, msg):
-        """Agrega un paso de cómputo y opcionalmente lo escribe al archivo."""
-        print(msg)  # Siempre imprimir a consola
-        self.pasos.append(msg)
-        if self.archivo_log:
-            with open(self.archivo_log, 'a', encoding='utf-8') as f:
-                f.write(msg + '\n')
+    def agregar_paso(self, msg, nivel='completo'):
+        """Agrega un paso de cómputo en texto libre si el nivel del rastreador lo incluye."""
+        self.registrar({'t': 'msg', 'texto': msg}, nivel)
+
+    def cerrar(self):
+        """Escribe los pasos pendientes y cierra el archivo de log."""
+        if self.escritor:
+            self.escritor.cerrar()
+            self.escritor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+
+class CacheEnumeracion:
+    """Caché de subresultados de enumerar_todo para la enumeración memoizada.
 
+    La clave de cada subresultado es (variables restantes, valores asignados a las
+    variables que mencionan las CPTs de esas variables). Dos ramas de la enumeración
+    que coinciden en esa proyección comparten el mismo valor, sin importar cómo se
+    asignaron el resto de variables. Una instancia sólo debe reutilizarse con la
+    misma red y los mismos vars_red.
+    """
+    def __init__(self):
+        self.subresultados = {}
+        self.familias = {}
+        self.aciertos = 0
+        self.fallos = 0
+
+    def clave(self, variables, evidencia, G):
+        """Retorna la clave de caché para enumerar variables (tupla) con evidencia."""
+        familia = self.familias.get(variables)
+        if familia is None:
+            padres = vista_modelo(G).padres
+            nombres = set(variables)
+            for Y in variables:
+                nombres.update(padres[Y])
+            familia = self.familias[variables] = tuple(sorted(nombres, key=str))
+        return variables, tuple(evidencia.get(v) for v in familia)
+
+
+class PerfilInferencia:
+    """Contadores por nodo de una o varias consultas por enumeración.
+
+    Se activa pasando perfil a consulta_enumeracion; sin perfil, enumerar_todo sólo
+    paga una comparación con None por llamada. Para cada variable se cuentan:
+
+    Atributos:
+        entradas: llamadas a enumerar_todo que empiezan por la variable
+        consultas_cpt: búsquedas en su CPT (llamadas a obtener_probabilidad)
+        multiplicaciones: productos P(variable|padres) * subresultado
+        segundos: tiempo de reloj dentro de obtener_probabilidad
+        consultas: número de consultas acumuladas en el perfil
+        segundos_total: tiempo de reloj total de esas consultas
+    """
+    def __init__(self):
+        self.entradas = defaultdict(int)
+        self.consultas_cpt = defaultdict(int)
+        self.multiplicaciones = defaultdict(int)
+        self.segundos = defaultdict(float)
+        self.consultas = 0
+        self.segundos_total = 0.0
 
-def enumerar_todo(variables, evidencia, G, vars_red, rastreador):
+    def probabilidad(self, var, evidencia, G):
+        """obtener_probabilidad contando la búsqueda y el tiempo que tomó."""
+        inicio = time.perf_counter()
+        p = obtener_probabilidad(var, evidencia, G)
+        self.segundos[var] += time.perf_counter() - inicio
+        self.consultas_cpt[var] += 1
+        return p
+
+    def tabla(self):
+        """Retorna un DataFrame con una fila por variable, ordenado por búsquedas en la CPT."""
+        variables = set(self.entradas) | set(self.consultas_cpt)
+        tabla = pd.DataFrame({'entradas': {v: self.entradas[v] for v in variables},
+                              'consultas_cpt': {v: self.consultas_cpt[v] for v in variables},
+                              'multiplicaciones': {v: self.multiplicaciones[v] for v in variables},
+                              'segundos': {v: self.segundos[v] for v in variables}},
+                             columns=['entradas', 'consultas_cpt', 'multiplicaciones', 'segundos'])
+        return tabla.sort_values(['consultas_cpt', 'segundos'], ascending=False)
+
+    def __str__(self):
+        return (f"Perfil de {self.consultas} consulta(s) en {self.segundos_total:.6f} s\n"
+                f"{self.tabla().to_string()}")
+
+
+def enumerar_todo(variables, evidencia, G, vars_red, rastreador, cache=None, profundidad=0,
+                  perfil=None):
     """Retorna la distribución sobre la variable de consulta por enumeración.
     
     Args:
-        variables: List[str], variables a enumerar (en orden topológico)
+        variables: List[str], variables a enumerar (en orden topológico); debe ser
+                   una tupla si se usa cache
         evidencia: dict, variable -> asignación de valores
         G: networkx.DiGraph con CPTs almacenadas en atributos de nodos
         vars_red: dict que mapea cada variable a sus valores posibles
         rastreador: RastreadorInferencia para registrar pasos
+        cache: CacheEnumeracion opcional para reutilizar subresultados
+        profundidad: nivel de recursión (se registra en la traza)
+        perfil: PerfilInferencia opcional donde contar entradas, búsquedas y productos
     
     Returns:
         float: probabilidad de la evidencia
@@ -45,56 +293,137 @@ def enumerar_todo(variables, evidencia, G, vars_red, rastreador):
         return 1.0
     
     Y, resto = variables[0], variables[1:]
-    rastreador.agregar_paso(f"\nEnumerando sobre {Y}")
-    rastreador.agregar_paso(f"  Evidencia actual: {evidencia}")
+    traza = rastreador.detallado
+    d = profundidad
+    if perfil is not None:
+        perfil.entradas[Y] += 1
+    if cache is not None:
+        clave = cache.clave(variables, evidencia, G)
+        if clave in cache.subresultados:
+            cache.aciertos += 1
+            resultado = cache.subresultados[clave]
+            if traza:
+                rastreador.registrar({'t': 'cache', 'd': d, 'v': Y, 'r': resultado})
+            return resultado
+        cache.fallos += 1
+
+    if traza:
+        rastreador.registrar({'t': 'entra', 'd': d, 'v': Y})
     
     if Y in evidencia:
         # Variable ya tiene valor en evidencia
-        py = obtener_probabilidad(Y, evidencia, G)
-        rastreador.agregar_paso(f"  {Y} en evidencia, P({Y}={evidencia[Y]}|padres)={py:.4f}")
-        resultado = py * enumerar_todo(resto, evidencia, G, vars_red, rastreador)
-        rastreador.agregar_paso(f"  Retornando {resultado:.4f}")
-        return resultado
-    
-    # Sumar sobre valores posibles de Y
-    total = 0
-    rastreador.agregar_paso(f"  Sumando sobre valores de {Y}: {vars_red[Y]}")
-    for y in vars_red[Y]:
-        evidencia[Y] = y
-        py = obtener_probabilidad(Y, evidencia, G)
-        rastreador.agregar_paso(f"    P({Y}={y}|padres)={py:.4f}")
-        sub = py * enumerar_todo(resto, evidencia, G, vars_red, rastreador)
-        rastreador.agregar_paso(f"    Término para {Y}={y}: {sub:.4f}")
-        total += sub
-    evidencia.pop(Y)  # Eliminar de evidencia antes de retornar
-    rastreador.agregar_paso(f"  Suma para {Y}: {total:.4f}")
-    return total
+        if perfil is None:
+            py = obtener_probabilidad(Y, evidencia, G)
+        else:
+            py = perfil.probabilidad(Y, evidencia, G)
+            perfil.multiplicaciones[Y] += 1
+        if traza:
+            rastreador.registrar({'t': 'obs', 'd': d, 'v': Y, 'val': evidencia[Y], 'p': py})
+        resultado = py * enumerar_todo(resto, evidencia, G, vars_red, rastreador, cache, d + 1,
+                                       perfil)
+        if traza:
+            rastreador.registrar({'t': 'ret', 'd': d, 'v': Y, 'r': resultado})
+    else:
+        # Sumar sobre valores posibles de Y
+        resultado = 0
+        if traza:
+            rastreador.registrar({'t': 'suma_ini', 'd': d, 'v': Y, 'vals': list(vars_red[Y])})
+        for y in vars_red[Y]:
+            evidencia[Y] = y
+            if perfil is None:
+                py = obtener_probabilidad(Y, evidencia, G)
+            else:
+                py = perfil.probabilidad(Y, evidencia, G)
+                perfil.multiplicaciones[Y] += 1
+            if traza:
+                rastreador.registrar({'t': 'val', 'd': d, 'v': Y, 'val': y, 'p': py})
+            sub = py * enumerar_todo(resto, evidencia, G, vars_red, rastreador, cache, d + 1,
+                                     perfil)
+            resultado += sub
+            if traza:
+                rastreador.registrar({'t': 'term', 'd': d, 'v': Y, 'val': y, 's': sub,
+                                      'ps': resultado})
+        evidencia.pop(Y)  # Eliminar de evidencia antes de retornar
+        if traza:
+            rastreador.registrar({'t': 'suma', 'd': d, 'v': Y, 'r': resultado})
+
+    if cache is not None:
+        cache.subresultados[clave] = resultado
+    return resultado
 
 
 def obtener_probabilidad(var, evidencia, G):
     """Retorna la probabilidad de var=val dados los valores de los padres en evidencia.
     
     La CPT de cada nodo debe estar almacenada en G.nodes[var]['cpt'] como DataFrame
-    con columnas para valores de padres (si hay) y 'value', 'prob'.
+    con columnas para valores de padres (si hay) y 'value', 'prob'. Si el nodo tiene
+    'cpt_compilada' (ver bayesnet.compilar_red) se usa indexación directa del arreglo,
+    que se recompila si la CPT fue reemplazada; si no, el índice hash 'indice_cpt',
+    que se reconstruye en el mismo caso.
     """
-    cpt = G.nodes[var]['cpt']
-    # Obtener padres y sus valores de evidencia
-    padres = list(G.predecessors(var))
-    if not padres:
-        # Sin padres - solo buscar probabilidad
-        return float(cpt[cpt['value'] == evidencia[var]]['prob'].iloc[0])
-    
-    # Buscar valores de padres en CPT
-    consulta = {p: evidencia[p] for p in padres}
-    consulta['value'] = evidencia[var]
-    # Usar indexación booleana de pandas para encontrar fila
-    coincidencias = cpt
-    for col, val in consulta.items():
-        coincidencias = coincidencias[coincidencias[col] == val]
-    return float(coincidencias['prob'].iloc[0])
+    nodo = G.nodes[var]
+    compilada = nodo.get('cpt_compilada')
+    if compilada is not None:
+        if compilada.cpt is not nodo.get('cpt', compilada.cpt):
+            compilada = compilada_vigente(G, var)
+        return compilada.probabilidad(evidencia)
+    indice = nodo.get('indice_cpt')
+    if indice is None or indice.cpt is not nodo['cpt']:
+        indice = indexar_cpt(G, var)
+    return indice.probabilidad(var, evidencia)
+
+
+def alcanzables(G, origen, observados):
+    """Retorna los nodos con un camino activo desde origen dados los observados (Bayes-ball).
+
+    Un nodo no alcanzable está d-separado de origen. Los nodos observados nunca se
+    incluyen en el resultado.
+    """
+    vista = vista_modelo(G)
+    # Observados y sus ancestros: activan las estructuras en V (colisionadores)
+    activadores = vista.ancestros(observados)
+
+    alcanzados = set()
+    visitados = set()
+    pendientes = [(origen, 'subiendo')]
+    while pendientes:
+        Y, direccion = pendientes.pop()
+        if (Y, direccion) in visitados:
+            continue
+        visitados.add((Y, direccion))
+        if Y not in observados:
+            alcanzados.add(Y)
+        if direccion == 'subiendo' and Y not in observados:
+            pendientes.extend((p, 'subiendo') for p in vista.padres[Y])
+            pendientes.extend((c, 'bajando') for c in vista.hijos[Y])
+        elif direccion == 'bajando':
+            if Y not in observados:
+                pendientes.extend((c, 'bajando') for c in vista.hijos[Y])
+            if Y in activadores:
+                pendientes.extend((p, 'subiendo') for p in vista.padres[Y])
+    return alcanzados
+
 
+def variables_relevantes(G, X, evidencia):
+    """Retorna, en orden topológico, las variables cuyas CPTs afectan P(X|evidencia).
 
-def consulta_enumeracion(X, evidencia, G, vars_red=None, archivo_log=None):
+    Se descartan los nodos estériles (que no son ancestros de X ni de la evidencia) y
+    los d-separados de X dada la evidencia. Una variable de evidencia se conserva sólo
+    si alguno de sus padres es una variable oculta relevante; el resto aporta un factor
+    constante que se cancela al normalizar.
+    """
+    vista = vista_modelo(G)
+    observados = set(evidencia) - {X}
+    ancestral = vista.ancestros({X} | observados)
+    ocultas = (alcanzables(G, X, observados) & ancestral) | {X}
+    relevantes = ocultas | {e for e in observados
+                            if any(p in ocultas for p in vista.padres[e])}
+    return vista.en_orden(relevantes)
+
+
+def consulta_enumeracion(X, evidencia, G, vars_red=None, archivo_log=None, podar=True,
+                         memoizar=False, nivel_traza='completo', rastreador=None,
+                         formato_traza='texto', perfil=None):
     """Retorna distribución sobre X por enumeración dada la evidencia.
     
     Args:
@@ -102,37 +431,92 @@ def consulta_enumeracion(X, evidencia, G, vars_red=None, archivo_log=None):
         evidencia: dict con mapeo de variables a valores
         G: networkx.DiGraph con CPTs almacenadas en atributos de nodos
         vars_red: dict opcional que mapea variables a sus valores posibles
-                (por defecto {True, False} para todas las variables)
+                (por defecto los dominios deducidos de las CPTs, ver
+                bayesnet.inferir_dominios)
         archivo_log: ruta opcional para escribir traza de cómputo
+        podar: si es True (por defecto) sólo se enumeran las variables relevantes
+               para la consulta (ver variables_relevantes)
+        memoizar: True para enumerar con una CacheEnumeracion nueva, o una instancia
+                  de CacheEnumeracion para consultar después sus aciertos y fallos
+        nivel_traza: 'apagado', 'resumen' o 'completo' (por defecto)
+        rastreador: RastreadorInferencia ya configurado; si se da, archivo_log,
+                    nivel_traza y formato_traza se ignoran y cerrarlo queda a cargo
+                    de quien llama
+        formato_traza: 'texto' (por defecto) o 'jsonl' para registros estructurados
+        perfil: True para contar por nodo con un PerfilInferencia nuevo, o una
+                instancia de PerfilInferencia para acumular sobre varias consultas
     
     Returns:
-        Distribución sobre X como dict que mapea valores a probabilidades
+        Distribución sobre X como dict que mapea valores a probabilidades; con
+        perfil, la tupla (distribución, PerfilInferencia)
     """
     if vars_red is None:
-        # Por defecto variables binarias
-        vars_red = {var: {True, False} for var in G.nodes}
+        vars_red = vista_modelo(G).dominios
     
-    rastreador = RastreadorInferencia(archivo_log)
-    rastreador.agregar_paso(f"\nCalculando P({X}|{evidencia})")
+    if perfil is True:
+        perfil = PerfilInferencia()
+    elif perfil is False:
+        perfil = None
+
+    propio = rastreador is None
+    if propio:
+        rastreador = RastreadorInferencia(archivo_log, nivel=nivel_traza, formato=formato_traza)
+    try:
+        if perfil is None:
+            return _enumerar_consulta(X, evidencia, G, vars_red, podar, memoizar, rastreador)
+        inicio = time.perf_counter()
+        distribucion = _enumerar_consulta(X, evidencia, G, vars_red, podar, memoizar,
+                                          rastreador, perfil)
+        perfil.segundos_total += time.perf_counter() - inicio
+        perfil.consultas += 1
+        return distribucion, perfil
+    finally:
+        if propio:
+            rastreador.cerrar()
+
+
+def _enumerar_consulta(X, evidencia, G, vars_red, podar, memoizar, rastreador, perfil=None):
+    """Cuerpo de consulta_enumeracion una vez resueltos vars_red y el rastreador."""
+    resumen = rastreador.nivel > 0
+    if resumen:
+        rastreador.registrar({'t': 'consulta', 'x': X, 'e': dict(evidencia)})
     
     # Obtener variables en orden topológico (asegura orden correcto de enumeración)
-    variables = list(nx.topological_sort(G))
-    rastreador.agregar_paso(f"Variables en orden topológico: {variables}")
+    variables = list(vista_modelo(G).orden_topologico)
+    if resumen:
+        rastreador.registrar({'t': 'orden', 'v': variables})
+    if podar:
+        variables = variables_relevantes(G, X, evidencia)
+        if resumen:
+            rastreador.registrar({'t': 'poda', 'v': variables})
     
+    if isinstance(memoizar, CacheEnumeracion):
+        cache = memoizar
+    else:
+        cache = CacheEnumeracion() if memoizar else None
+    if cache is not None:
+        variables = tuple(variables)
+
     # Calcular distribución normalizando sobre valores de variable de consulta
     Q = defaultdict(float)
     for x in vars_red[X]:
         evidencia[X] = x
-        rastreador.agregar_paso(f"\nCalculando P({X}={x}, e)")
-        Q[x] = enumerar_todo(variables, evidencia, G, vars_red, rastreador)
-        rastreador.agregar_paso(f"P({X}={x}, e) = {Q[x]:.4f}")
+        if resumen:
+            rastreador.registrar({'t': 'inicio_x', 'x': X, 'val': x})
+        Q[x] = enumerar_todo(variables, evidencia, G, vars_red, rastreador, cache, 0, perfil)
+        if resumen:
+            rastreador.registrar({'t': 'res_x', 'x': X, 'val': x, 'p': Q[x]})
     evidencia.pop(X)
+    if cache is not None and resumen:
+        rastreador.registrar({'t': 'cache_stats', 'aciertos': cache.aciertos,
+                              'fallos': cache.fallos})
     
     # Normalizar
     total = sum(Q.values())
     for x in Q:
         Q[x] /= total
-        rastreador.agregar_paso(f"P({X}={x}|e) = {Q[x]:.4f}")
+        if resumen:
+            rastreador.registrar({'t': 'posterior', 'x': X, 'val': x, 'p': Q[x]})
     
     return dict(Q)  # Convertir defaultdict a dict normal
 
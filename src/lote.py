@@ -0,0 +1,81 @@
+"""Consultas por lote: posteriores para muchas filas de evidencia en una sola llamada.
+
+consulta_lote agrupa las filas de un DataFrame según qué variables están observadas.
+Para cada patrón calcula una sola vez la tabla conjunta P(X, E) por eliminación de
+variables y luego evalúa todas las filas del grupo indexando esa tabla con NumPy.
+"""
+import numpy as np
+import pandas as pd
+
+from src.bayesnet import vista_modelo
+from src.eliminacion import asegurar_compilada, consulta_eliminacion, distribucion_conjunta
+
+
+def _codificar(columna, indices, var):
+    """Convierte una columna de valores en un arreglo de posiciones dentro del dominio."""
+    codigos = columna.map(indices)
+    if codigos.isna().any():
+        invalidos = sorted(set(columna[codigos.isna()].tolist()), key=str)
+        raise KeyError(f"Valores {invalidos} fuera del dominio de '{var}'")
+    return codigos.to_numpy(dtype=np.intp)
+
+
+def consulta_lote(X, evidencias_df, G, max_celdas=1_000_000):
+    """Retorna un DataFrame con P(X|evidencia) para cada fila de evidencias_df.
+
+    Args:
+        X: str, variable de consulta
+        evidencias_df: pandas.DataFrame con una columna por variable observable; las
+                       celdas vacías (NaN/None) significan variable no observada. Una
+                       columna con el nombre de X se ignora.
+        G: networkx.DiGraph con CPTs almacenadas en atributos de nodos
+        max_celdas: tamaño máximo de la tabla P(X, E) por patrón; si un patrón lo
+                    excede se evalúa fila única por fila única con consulta_eliminacion
+
+    Returns:
+        pandas.DataFrame con el mismo índice que evidencias_df y una columna por valor
+        de X. Las filas cuya evidencia tiene probabilidad cero quedan en NaN.
+    """
+    asegurar_compilada(G)
+    vista = vista_modelo(G)
+    dominios = vista.dominios
+    columnas = [c for c in evidencias_df.columns if c != X]
+    desconocidas = [c for c in columnas if c not in G.nodes]
+    if desconocidas:
+        raise ValueError(f"Columnas sin nodo en la red: {desconocidas}")
+
+    resultado = np.full((len(evidencias_df), len(dominios[X])), np.nan)
+    if not columnas:
+        patrones, grupos = np.zeros((1, 0), dtype=bool), np.zeros(len(evidencias_df), dtype=np.intp)
+    else:
+        observado = evidencias_df[columnas].notna().to_numpy()
+        patrones, grupos = np.unique(observado, axis=0, return_inverse=True)
+        grupos = grupos.reshape(-1)
+
+    for k, patron in enumerate(patrones):
+        filas = np.flatnonzero(grupos == k)
+        if not len(filas):
+            continue
+        E = [c for c, obs in zip(columnas, patron) if obs]
+        sub = evidencias_df.iloc[filas][E]
+        celdas = len(dominios[X]) * np.prod([len(dominios[e]) for e in E], dtype=float)
+        if E and celdas > max_celdas:
+            for posiciones in sub.groupby(E, sort=False).indices.values():
+                evidencia = sub.iloc[posiciones[0]].to_dict()
+                try:
+                    dist = consulta_eliminacion(X, evidencia, G, nivel_traza='apagado')
+                except ZeroDivisionError:
+                    continue
+                resultado[filas[posiciones]] = [dist[x] for x in dominios[X]]
+            continue
+
+        conjunta = distribucion_conjunta(G, [X] + E).tabla
+        codigos = tuple(_codificar(sub[e], vista.codigos[e], e)
+                        for e in E)
+        # conjunta[:, e1, e2, ...] -> (|X|, filas); trasponer a (filas, |X|)
+        tabla = conjunta[(slice(None),) + codigos].reshape(len(dominios[X]), -1).T
+        totales = tabla.sum(axis=1, keepdims=True)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            resultado[filas] = np.where(totales > 0, tabla / totales, np.nan)
+
+    return pd.DataFrame(resultado, index=evidencias_df.index, columns=list(dominios[X]))
@@ -1,9 +1,22 @@
-"""Runner CLI para carga de red bayesiana e inferencia."""
+"""Runner CLI para carga de red bayesiana e inferencia.
+
+Sin subcomando ejecuta la demostración del sistema de riego. Subcomandos:
+    compilar CARPETA [-o SALIDA]   escribe la red de CARPETA como modelo binario .bnc
+    consultar RED [ENTRADA]        resuelve un archivo (o stdin) de consultas JSONL/CSV
+"""
+from collections import deque
 from pathlib import Path
 import argparse
+import csv
+import itertools
+import json
+import os
+import sys
 
 from src.bayesnet import construir_red_bayesiana, mostrar_grafo
+from src.formato_binario import cargar_red, guardar_modelo
 from src.inference import consulta_enumeracion
+from src.pool import MOTORES, PoolInferencia
 
 
 def imprimir_distribucion(dist):
@@ -14,14 +27,155 @@ def imprimir_distribucion(dist):
     print("}")
 
 
+def compilar(args):
+    """Subcomando compilar: CSVs de la red -> modelo binario .bnc."""
+    carpeta = Path(args.carpeta)
+    salida = Path(args.salida) if args.salida else carpeta / 'red.bnc'
+    G = construir_red_bayesiana(carpeta / 'edges.csv', carpeta, compilar=True)
+    guardar_modelo(G, salida)
+    print(f"Modelo compilado ({G.number_of_nodes()} nodos) guardado en: {salida}")
+
+
+def leer_consultas(archivo, formato):
+    """Retorna un generador de (línea, x, evidencia, error) por cada registro de un
+    archivo abierto, sin cargarlo entero.
+
+    En JSONL cada línea es {"x": ..., "evidencia": {...}} (también se aceptan las claves
+    "target" y "evidence"). En CSV la columna 'x' es la variable de consulta y cada otra
+    columna es una variable de evidencia; las celdas vacías significan no observada.
+    Un registro mal formado no detiene la lectura: se genera con x y evidencia en None
+    y el mensaje en error. Lanza ValueError si el CSV no tiene columna 'x'.
+    """
+    if formato == 'csv':
+        lector = csv.DictReader(archivo)
+        if lector.fieldnames is not None and 'x' not in lector.fieldnames:
+            raise ValueError(f"El CSV debe tener una columna 'x' con la variable de consulta "
+                             f"(columnas: {lector.fieldnames})")
+        return _leer_csv(lector)
+    return _leer_jsonl(archivo)
+
+
+def _leer_csv(lector):
+    for fila in lector:
+        if None in fila:
+            yield lector.line_num, None, None, "La fila tiene más campos que el encabezado"
+            continue
+        x = fila.pop('x')
+        yield lector.line_num, x, {k: v for k, v in fila.items() if v not in ('', None)}, None
+
+
+def _leer_jsonl(archivo):
+    for numero, linea in enumerate(archivo, 1):
+        if not linea.strip():
+            continue
+        try:
+            registro = json.loads(linea)
+        except ValueError as e:
+            yield numero, None, None, f"JSON inválido: {e}"
+            continue
+        if not isinstance(registro, dict):
+            yield numero, None, None, "Se espera un objeto JSON con 'x' y 'evidencia'"
+            continue
+        x = registro.get('x', registro.get('target'))
+        if x is None:
+            yield numero, None, None, "Falta la variable de consulta 'x'"
+            continue
+        yield numero, x, registro.get('evidencia', registro.get('evidence')) or {}, None
+
+
+def consultar(args):
+    """Subcomando consultar: resuelve consultas en flujo y escribe JSONL en orden.
+
+    La red se carga una vez y los trabajadores de PoolInferencia la heredan. Las
+    consultas se leen de a bloques y nunca hay más de args.ventana bloques en vuelo, así
+    que la memoria no depende del tamaño de la entrada. Los resultados se escriben en
+    el orden de entrada en cuanto el bloque más antiguo termina; al final se imprime
+    en stderr el tiempo de cada trabajador.
+    """
+    entrada = sys.stdin if args.entrada in (None, '-') else open(args.entrada, encoding='utf-8')
+    salida = sys.stdout if args.salida in (None, '-') else open(args.salida, 'w', encoding='utf-8')
+    formato = args.formato or ('csv' if str(args.entrada).endswith('.csv') else 'jsonl')
+    ventana = args.ventana or 2 * (args.procesos or os.cpu_count() or 1)
+
+    def escribir(bloque, futuro):
+        resultados = iter(pool.registrar(futuro.result()))
+        for linea, X, evidencia, error in bloque:
+            if error is not None:  # registro mal formado: no se envió al pool
+                registro = {'linea': linea, 'error': error}
+            else:
+                registro = {'x': X, 'evidencia': evidencia}
+                dist, error = next(resultados)
+                if error is None:
+                    registro['distribucion'] = {str(v): p for v, p in dist.items()}
+                else:
+                    registro['error'] = error
+            salida.write(json.dumps(registro, ensure_ascii=False, default=str) + '\n')
+        salida.flush()
+
+    try:
+        try:
+            consultas = leer_consultas(entrada, formato)
+        except ValueError as e:
+            sys.exit(f"Error: {e}")
+        with PoolInferencia(cargar_red(args.red), args.procesos, args.motor) as pool:
+            en_vuelo = deque()
+            while True:
+                bloque = list(itertools.islice(consultas, args.tam_bloque))
+                if not bloque:
+                    break
+                if len(en_vuelo) >= ventana:
+                    escribir(*en_vuelo.popleft())
+                validas = [(X, evidencia) for _, X, evidencia, error in bloque if error is None]
+                en_vuelo.append((bloque, pool.enviar(validas)))
+            while en_vuelo:
+                escribir(*en_vuelo.popleft())
+            for t in pool.trabajadores.values():
+                print(f"Trabajador {t.pid}: {t.consultas} consultas en {t.bloques} bloques, "
+                      f"{t.segundos:.3f} s ({t.segundos_cpu:.3f} s de CPU)", file=sys.stderr)
+    finally:
+        if entrada is not sys.stdin:
+            entrada.close()
+        if salida is not sys.stdout:
+            salida.close()
+
+
 def main():
     p = argparse.ArgumentParser(description='Cargar red bayesiana y ejecutar inferencia')
     p.add_argument('--data', '-d', default=str(Path(__file__).resolve().parents[1] / 'data'),
                    help='Ruta a carpeta con edges.csv y cpt_*.csv')
     p.add_argument('--out', '-o', default=None, 
                    help='Ruta para guardar imagen del grafo (png). Si se omite, guarda en data/grafo.png')
+    sub = p.add_subparsers(dest='comando')
+    p_compilar = sub.add_parser('compilar', help='Compilar la red a un modelo binario (.bnc)')
+    p_compilar.add_argument('carpeta', help='Carpeta con edges.csv y cpt_*.csv')
+    p_compilar.add_argument('--salida', '-o', default=None,
+                            help='Ruta del archivo .bnc (por defecto CARPETA/red.bnc)')
+    p_consultar = sub.add_parser('consultar',
+                                 help='Resolver un archivo de consultas JSONL/CSV en flujo')
+    p_consultar.add_argument('red', help='Carpeta con edges.csv y cpt_*.csv, o archivo .bnc')
+    p_consultar.add_argument('entrada', nargs='?', default='-',
+                             help='Archivo de consultas (por defecto stdin)')
+    p_consultar.add_argument('--salida', '-o', default='-',
+                             help='Archivo JSONL de resultados (por defecto stdout)')
+    p_consultar.add_argument('--formato', choices=('jsonl', 'csv'), default=None,
+                             help='Formato de la entrada (por defecto según la extensión)')
+    p_consultar.add_argument('--motor', choices=MOTORES,
+                             default='planificador')
+    p_consultar.add_argument('--procesos', type=int, default=None,
+                             help='Procesos trabajadores (por defecto uno por CPU)')
+    p_consultar.add_argument('--tam-bloque', type=int, default=64,
+                             help='Consultas por bloque enviado a un trabajador')
+    p_consultar.add_argument('--ventana', type=int, default=None,
+                             help='Máximo de bloques en vuelo (por defecto 2 por proceso)')
     args = p.parse_args()
 
+    if args.comando == 'compilar':
+        compilar(args)
+        return
+    if args.comando == 'consultar':
+        consultar(args)
+        return
+
     carpeta_data = Path(args.data)
     aristas = carpeta_data / 'edges.csv'
     salida = Path(args.out) if args.out else (carpeta_data / 'grafo.png')
@@ -0,0 +1,367 @@
+"""Inferencia aproximada por muestreo para redes demasiado grandes para la inferencia exacta.
+
+consulta_muestreo_ponderado implementa ponderación por verosimilitud (likelihood
+weighting): genera lotes completos de muestras ancestrales con NumPy sobre las CPTs
+compiladas, fija las variables de evidencia y pondera cada muestra por la
+probabilidad de la evidencia dados sus padres.
+
+consulta_gibbs implementa muestreo de Gibbs con varias cadenas independientes en un
+ProcessPoolExecutor, útil cuando la evidencia es muy improbable y la ponderación
+degenera. Reporta R-hat y tamaño efectivo de muestra, y se detiene en cuanto ambos
+cumplen los umbrales.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+
+import numpy as np
+
+from src.bayesnet import vista_modelo
+from src.eliminacion import asegurar_compilada
+
+
+class ResultadoMuestreo:
+    """Posterior estimada por muestreo junto con su incertidumbre.
+
+    Atributos:
+        distribucion: dict valor -> probabilidad estimada
+        errores_estandar: dict valor -> error estándar de la estimación
+        intervalos: dict valor -> (inferior, superior) al nivel de confianza pedido
+        n_muestras: número total de muestras generadas
+        tam_efectivo: tamaño efectivo de la muestra, (Σw)² / Σw²
+    """
+    def __init__(self, distribucion, errores_estandar, intervalos, n_muestras, tam_efectivo):
+        self.distribucion = distribucion
+        self.errores_estandar = errores_estandar
+        self.intervalos = intervalos
+        self.n_muestras = n_muestras
+        self.tam_efectivo = tam_efectivo
+
+    def __repr__(self):
+        return (f"ResultadoMuestreo({self.distribucion}, n_muestras={self.n_muestras}, "
+                f"tam_efectivo={self.tam_efectivo:.1f})")
+
+
+def muestrear_categorica(probs, rng):
+    """Muestrea un índice por fila de probs (n, d) con una sola llamada a rng."""
+    u = rng.random(probs.shape[0])[:, None]
+    indices = (u > np.cumsum(probs, axis=1)).sum(axis=1)
+    return np.minimum(indices, probs.shape[1] - 1)
+
+
+def codificar_evidencia(vista, evidencia):
+    """Retorna dict variable -> código entero del valor observado en evidencia."""
+    codigos = {}
+    for var, val in evidencia.items():
+        if val not in vista.codigos[var]:
+            raise KeyError(f"Valor {val!r} fuera del dominio de '{var}'")
+        codigos[var] = vista.codigos[var][val]
+    return codigos
+
+
+def muestras_ponderadas(G, orden, codigos_evidencia, n, rng):
+    """Genera n muestras ancestrales ponderadas por la evidencia.
+
+    Args:
+        G: red con CPTs compiladas
+        orden: variables a muestrear en orden topológico (cerrado bajo ancestros)
+        codigos_evidencia: dict variable -> índice del valor observado
+        n: tamaño del lote
+        rng: numpy.random.Generator
+
+    Returns:
+        (dict variable -> arreglo de índices (n,), arreglo de pesos (n,))
+    """
+    muestras = {}
+    pesos = np.ones(n)
+    for var in orden:
+        compilada = G.nodes[var]['cpt_compilada']
+        idx = tuple(muestras[p] for p in compilada.padres)
+        probs = compilada.tabla[idx] if idx else np.broadcast_to(compilada.tabla,
+                                                                 (n, compilada.tabla.shape[-1]))
+        if var in codigos_evidencia:
+            e = codigos_evidencia[var]
+            pesos *= probs[:, e]
+            muestras[var] = np.full(n, e, dtype=np.intp)
+        else:
+            muestras[var] = muestrear_categorica(probs, rng)
+    return muestras, pesos
+
+
+def consulta_muestreo_ponderado(X, evidencia, G, n_muestras=None, error_objetivo=None,
+                                tam_lote=10_000, max_muestras=1_000_000, confianza=0.95,
+                                semilla=None):
+    """Estima P(X|evidencia) por ponderación por verosimilitud.
+
+    Con n_muestras se generan exactamente esas muestras. Con error_objetivo se generan
+    lotes hasta que el mayor error estándar de la posterior baje de ese valor (o se
+    alcance max_muestras). Sin ninguno de los dos se usan 100.000 muestras.
+
+    Args:
+        X: str, variable de consulta
+        evidencia: dict con mapeo de variables a valores
+        G: networkx.DiGraph con CPTs almacenadas en atributos de nodos
+        n_muestras: presupuesto fijo de muestras
+        error_objetivo: error estándar máximo aceptado para cada valor de X
+        tam_lote: muestras generadas por cada pasada vectorizada
+        max_muestras: tope de muestras cuando se usa error_objetivo
+        confianza: nivel de los intervalos de confianza (aproximación normal)
+        semilla: semilla para numpy.random.default_rng
+
+    Returns:
+        ResultadoMuestreo
+    """
+    asegurar_compilada(G)
+    vista = vista_modelo(G)
+    dominios = vista.dominios
+    evidencia = {k: v for k, v in evidencia.items() if k != X}
+    codigos = codificar_evidencia(vista, evidencia)
+
+    # Sólo hace falta muestrear X, la evidencia y sus ancestros
+    orden = vista.en_orden(vista.ancestros({X} | set(evidencia)))
+
+    if n_muestras is None and error_objetivo is None:
+        n_muestras = 100_000
+    limite = n_muestras if n_muestras is not None else max_muestras
+    rng = np.random.default_rng(semilla)
+    k = len(dominios[X])
+    s1 = s2 = 0.0
+    s1k = np.zeros(k)
+    s2k = np.zeros(k)
+    generadas = 0
+    while generadas < limite:
+        n = min(tam_lote, limite - generadas)
+        muestras, pesos = muestras_ponderadas(G, orden, codigos, n, rng)
+        generadas += n
+        s1 += pesos.sum()
+        s2 += (pesos ** 2).sum()
+        s1k += np.bincount(muestras[X], weights=pesos, minlength=k)
+        s2k += np.bincount(muestras[X], weights=pesos ** 2, minlength=k)
+        if error_objetivo is not None and n_muestras is None and s1 > 0:
+            p = s1k / s1
+            se = np.sqrt(np.maximum(s2k * (1 - 2 * p) + p ** 2 * s2, 0)) / s1
+            if se.max() <= error_objetivo:
+                break
+
+    if s1 == 0:
+        raise ValueError("Ninguna muestra es compatible con la evidencia "
+                         "(evidencia imposible o demasiado improbable para el presupuesto)")
+    p = s1k / s1
+    se = np.sqrt(np.maximum(s2k * (1 - 2 * p) + p ** 2 * s2, 0)) / s1
+    z = NormalDist().inv_cdf(0.5 + confianza / 2)
+    distribucion = {val: float(p[i]) for i, val in enumerate(dominios[X])}
+    errores = {val: float(se[i]) for i, val in enumerate(dominios[X])}
+    intervalos = {val: (max(0.0, float(p[i] - z * se[i])), min(1.0, float(p[i] + z * se[i])))
+                  for i, val in enumerate(dominios[X])}
+    return ResultadoMuestreo(distribucion, errores, intervalos, generadas, float(s1 ** 2 / s2))
+
+
+class ResultadoGibbs(ResultadoMuestreo):
+    """ResultadoMuestreo con los diagnósticos de convergencia de consulta_gibbs.
+
+    Atributos adicionales:
+        rhat: dict valor -> R-hat (dividido) del indicador X=valor
+        tam_efectivo_valor: dict valor -> tamaño efectivo de muestra del indicador
+        barridos: barridos por cadena conservados tras el calentamiento
+        convergio: True si se alcanzaron los umbrales antes de max_barridos
+    """
+    def __init__(self, distribucion, errores_estandar, intervalos, n_muestras, tam_efectivo,
+                 rhat, tam_efectivo_valor, barridos, convergio):
+        super().__init__(distribucion, errores_estandar, intervalos, n_muestras, tam_efectivo)
+        self.rhat = rhat
+        self.tam_efectivo_valor = tam_efectivo_valor
+        self.barridos = barridos
+        self.convergio = convergio
+
+    def __repr__(self):
+        return (f"ResultadoGibbs({self.distribucion}, rhat={self.rhat}, "
+                f"tam_efectivo={self.tam_efectivo:.1f}, convergio={self.convergio})")
+
+
+# Modelo compartido por los procesos trabajadores (ver _iniciar_trabajador)
+_MODELO = None
+
+
+def _iniciar_trabajador(modelo):
+    global _MODELO
+    _MODELO = modelo
+
+
+def _condicional(modelo, var, estado):
+    """Distribución no normalizada de var dado su manto de Markov en estado."""
+    tablas, padres = modelo['tablas'], modelo['padres']
+    dist = tablas[var][tuple(estado[p] for p in padres[var])].copy()
+    for c in modelo['hijos'][var]:
+        idx = tuple(slice(None) if p == var else estado[p] for p in padres[c])
+        dist *= tablas[c][idx + (estado[c],)]
+    return dist
+
+
+def _avanzar_cadena(estado, rng, n_barridos, X, modelo=None):
+    """Ejecuta n_barridos barridos de Gibbs y retorna (estado, rng, índices de X por barrido)."""
+    modelo = modelo if modelo is not None else _MODELO
+    ocultas = modelo['ocultas']
+    traza = np.empty(n_barridos, dtype=np.intp)
+    for b in range(n_barridos):
+        u = rng.random(len(ocultas))
+        for var, ui in zip(ocultas, u):
+            acumulada = np.cumsum(_condicional(modelo, var, estado))
+            if acumulada[-1] <= 0:
+                estado[var] = int(ui * len(acumulada))
+            else:
+                k = int(np.searchsorted(acumulada, ui * acumulada[-1], side='right'))
+                estado[var] = min(k, len(acumulada) - 1)
+        traza[b] = estado[X]
+    return estado, rng, traza
+
+
+def rhat_dividido(cadenas):
+    """R-hat de Gelman-Rubin con cada cadena dividida en dos mitades.
+
+    cadenas: arreglo (m, n) con una fila por cadena.
+    """
+    n = cadenas.shape[1] // 2
+    mitades = np.concatenate([cadenas[:, :n], cadenas[:, n:2 * n]])
+    W = mitades.var(axis=1, ddof=1).mean()
+    B = n * mitades.mean(axis=1).var(ddof=1)
+    if W == 0:
+        return 1.0 if B == 0 else float('inf')
+    var_hat = (n - 1) / n * W + B / n
+    return float(np.sqrt(var_hat / W))
+
+
+def tam_efectivo_muestra(cadenas):
+    """Tamaño efectivo de muestra de varias cadenas (autocorrelación, secuencia de Geyer).
+
+    cadenas: arreglo (m, n) con una fila por cadena.
+    """
+    m, n = cadenas.shape
+    centradas = cadenas - cadenas.mean(axis=1, keepdims=True)
+    tam_fft = 1 << (2 * n - 1).bit_length()
+    espectro = np.fft.rfft(centradas, tam_fft, axis=1)
+    autocov = np.fft.irfft(espectro * np.conj(espectro), tam_fft, axis=1)[:, :n] / n
+    W = cadenas.var(axis=1, ddof=1).mean()
+    B = n * cadenas.mean(axis=1).var(ddof=1) if m > 1 else 0.0
+    var_hat = (n - 1) / n * W + B / n
+    if var_hat == 0:
+        return float(m * n)
+    rho = 1 - (W - autocov.mean(axis=0)) / var_hat
+    # Suma de pares consecutivos mientras sean positivos (secuencia inicial positiva)
+    suma = 0.0
+    for t in range(1, n - 1, 2):
+        par = rho[t] + rho[t + 1]
+        if par < 0:
+            break
+        suma += par
+    tau = -1 + 2 * (rho[0] + suma) if n > 2 else 1.0
+    return float(m * n / max(tau, 1e-12))
+
+
+def consulta_gibbs(X, evidencia, G, n_cadenas=4, tam_bloque=1000, quemado=500,
+                   max_barridos=20_000, umbral_rhat=1.01, ess_minimo=1000, procesos=None,
+                   semilla=None, confianza=0.95):
+    """Estima P(X|evidencia) con muestreo de Gibbs en cadenas independientes.
+
+    Cada cadena corre en un proceso del pool con su propia semilla derivada de
+    semilla (numpy.random.SeedSequence.spawn), por lo que el resultado es reproducible
+    sin importar el orden en que terminen los procesos. Las cadenas avanzan por bloques
+    de tam_bloque barridos; tras cada bloque se calculan R-hat y el tamaño efectivo de
+    muestra de los indicadores X=valor y se detiene en cuanto max(R-hat) <= umbral_rhat
+    y min(ESS) >= ess_minimo, o al llegar a max_barridos por cadena.
+
+    Args:
+        X: str, variable de consulta
+        evidencia: dict con mapeo de variables a valores
+        G: networkx.DiGraph con CPTs almacenadas en atributos de nodos
+        n_cadenas: número de cadenas independientes
+        tam_bloque: barridos por cadena entre diagnósticos
+        quemado: barridos iniciales descartados en cada cadena
+        max_barridos: máximo de barridos conservados por cadena
+        umbral_rhat: R-hat máximo aceptado
+        ess_minimo: tamaño efectivo de muestra mínimo aceptado
+        procesos: procesos del pool (None = número de CPUs; 0 = sin pool, en este proceso)
+        semilla: semilla raíz para las cadenas
+        confianza: nivel de los intervalos de confianza
+
+    Returns:
+        ResultadoGibbs
+    """
+    asegurar_compilada(G)
+    vista = vista_modelo(G)
+    dominios = vista.dominios
+    evidencia = {k: v for k, v in evidencia.items() if k != X}
+    codigos = codificar_evidencia(vista, evidencia)
+
+    # Red restringida a X, la evidencia y sus ancestros; el manto de Markov de cada
+    # variable queda representado por sus padres e hijos (con los padres de éstos)
+    relevantes = vista.ancestros({X} | set(evidencia))
+    orden = vista.en_orden(relevantes)
+    modelo = {
+        'ocultas': [v for v in orden if v not in codigos],
+        'tablas': {v: G.nodes[v]['cpt_compilada'].tabla for v in orden},
+        'padres': {v: G.nodes[v]['cpt_compilada'].padres for v in orden},
+        'hijos': {v: tuple(c for c in vista.hijos[v] if c in relevantes) for v in orden},
+    }
+
+    # Estados iniciales: muestras ancestrales compatibles con la evidencia
+    semillas = np.random.SeedSequence(semilla).spawn(n_cadenas + 1)
+    rng_inicio = np.random.default_rng(semillas[0])
+    muestras, pesos = muestras_ponderadas(G, orden, codigos, 100 * n_cadenas, rng_inicio)
+    if pesos.sum() > 0:
+        elegidas = rng_inicio.choice(len(pesos), size=n_cadenas, p=pesos / pesos.sum())
+    else:
+        elegidas = np.arange(n_cadenas)
+    estados = [{v: int(muestras[v][i]) for v in orden} for i in elegidas]
+    rngs = [np.random.default_rng(s) for s in semillas[1:]]
+
+    k = len(dominios[X])
+    trazas = [[] for _ in range(n_cadenas)]
+    conservados = 0
+    convergio = False
+    pool = None
+    if procesos != 0:
+        pool = ProcessPoolExecutor(max_workers=procesos, initializer=_iniciar_trabajador,
+                                   initargs=(modelo,))
+    try:
+        pendientes_quemado = quemado
+        while conservados < max_barridos:
+            n = min(tam_bloque, max_barridos - conservados) + pendientes_quemado
+            if pool is None:
+                resultados = [_avanzar_cadena(estados[c], rngs[c], n, X, modelo)
+                              for c in range(n_cadenas)]
+            else:
+                futuros = [pool.submit(_avanzar_cadena, estados[c], rngs[c], n, X)
+                           for c in range(n_cadenas)]
+                resultados = [f.result() for f in futuros]
+            for c, (estado, rng, traza) in enumerate(resultados):
+                estados[c], rngs[c] = estado, rng
+                trazas[c].append(traza[pendientes_quemado:])
+            conservados += n - pendientes_quemado
+            pendientes_quemado = 0
+
+            cadenas = np.stack([np.concatenate(t) for t in trazas])
+            indicadores = [(cadenas == i).astype(float) for i in range(k)]
+            rhat = [rhat_dividido(ind) for ind in indicadores]
+            ess = [tam_efectivo_muestra(ind) for ind in indicadores]
+            if max(rhat) <= umbral_rhat and min(ess) >= ess_minimo:
+                convergio = True
+                break
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    p = np.array([ind.mean() for ind in indicadores])
+    se = np.sqrt(p * (1 - p) / np.array(ess))
+    z = NormalDist().inv_cdf(0.5 + confianza / 2)
+    valores = dominios[X]
+    return ResultadoGibbs(
+        distribucion={val: float(p[i]) for i, val in enumerate(valores)},
+        errores_estandar={val: float(se[i]) for i, val in enumerate(valores)},
+        intervalos={val: (max(0.0, float(p[i] - z * se[i])), min(1.0, float(p[i] + z * se[i])))
+                    for i, val in enumerate(valores)},
+        n_muestras=int(cadenas.size),
+        tam_efectivo=float(min(ess)),
+        rhat={val: rhat[i] for i, val in enumerate(valores)},
+        tam_efectivo_valor={val: ess[i] for i, val in enumerate(valores)},
+        barridos=conservados,
+        convergio=convergio,
+    )
@@ -0,0 +1,187 @@
+"""Heurísticas voraces de orden de eliminación sobre el grafo moral de una red.
+
+El costo de la eliminación de variables y el tamaño de las cliques del árbol de uniones
+dependen por completo del orden en que se eliminan las variables. Este módulo calcula
+órdenes con tres heurísticas clásicas:
+
+- 'min_grado': elimina la variable con menos vecinos.
+- 'min_relleno': elimina la variable que agrega menos aristas de relleno.
+- 'min_relleno_ponderado': como la anterior, pero cada arista de relleno (a, b) pesa
+  |dom(a)| * |dom(b)|.
+
+Los empates se rompen por nombre o, si se da una semilla, al azar. Los puntajes se
+guardan en un heap y, al eliminar una variable, sólo se recalculan los de sus vecinos
+(y, para las heurísticas de relleno, los vecinos de éstos). Cada orden se
+reporta con las cliques que induce, el tamaño de la clique más grande y el tamaño total
+de las tablas, así que mejor_orden puede probar varias heurísticas y desempates y quedarse
+con el orden más barato para una red y un patrón de evidencia.
+"""
+import heapq
+import itertools
+import random
+
+import networkx as nx
+import numpy as np
+
+from src.bayesnet import vista_modelo
+
+HEURISTICAS = ('min_grado', 'min_relleno', 'min_relleno_ponderado')
+
+
+def grafo_interaccion(alcances):
+    """Retorna el networkx.Graph que une cada par de variables que comparten un alcance.
+
+    Args:
+        alcances: iterable de secuencias de variables (por ejemplo, las variables de
+                  cada factor)
+    """
+    H = nx.Graph()
+    for alcance in alcances:
+        H.add_nodes_from(alcance)
+        H.add_edges_from(itertools.combinations(alcance, 2))
+    return H
+
+
+def grafo_moral(G, nodos=None):
+    """Retorna el grafo moral de G (o del subgrafo inducido por nodos).
+
+    Cada nodo queda unido a sus padres y los padres de un mismo hijo se unen entre sí.
+    """
+    vista = vista_modelo(G)
+    nodos = vista.orden_topologico if nodos is None else vista.en_orden(set(nodos))
+    incluidos = set(nodos)
+    familias = [(n,) + tuple(p for p in vista.padres[n] if p in incluidos) for n in nodos]
+    return grafo_interaccion(familias)
+
+
+class OrdenEliminacion:
+    """Orden de eliminación y su costo.
+
+    Atributos:
+        orden: tupla de variables en el orden en que se eliminan
+        heuristica: nombre de la heurística que lo produjo
+        cliques: lista de cliques maximales (tuplas) inducidas por el orden
+        tamano_clique_max: número de variables de la clique más grande
+        celdas_max: número de celdas de la tabla más grande que se forma
+        tamano_total: suma de las celdas de las tablas formadas al eliminar cada variable
+    """
+    def __init__(self, orden, heuristica, cliques, tamano_clique_max, celdas_max, tamano_total):
+        self.orden = orden
+        self.heuristica = heuristica
+        self.cliques = cliques
+        self.tamano_clique_max = tamano_clique_max
+        self.celdas_max = celdas_max
+        self.tamano_total = tamano_total
+
+    def costo(self):
+        """Clave de comparación: menor tamaño total y, a igualdad, menor clique."""
+        return (self.tamano_total, self.celdas_max, self.tamano_clique_max)
+
+    def __repr__(self):
+        return (f"OrdenEliminacion({self.heuristica}, clique máx={self.tamano_clique_max}, "
+                f"celdas máx={self.celdas_max}, total={self.tamano_total})")
+
+
+def _puntaje(heuristica, v, vecinos, adyacencia, cardinalidades):
+    if heuristica == 'min_grado':
+        return (len(vecinos),)
+    faltantes = [(a, b) for a, b in itertools.combinations(vecinos, 2)
+                 if b not in adyacencia[a]]
+    if heuristica == 'min_relleno':
+        return (len(faltantes), len(vecinos))
+    peso = sum(cardinalidades[a] * cardinalidades[b] for a, b in faltantes)
+    return (peso, cardinalidades[v] * np.prod([cardinalidades[u] for u in vecinos], dtype=float))
+
+
+def ordenar_eliminacion(grafo, cardinalidades, variables=None,
+                        heuristica='min_relleno_ponderado', semilla=None):
+    """Calcula un orden de eliminación voraz sobre un grafo no dirigido.
+
+    Args:
+        grafo: networkx.Graph (normalmente de grafo_moral o grafo_interaccion)
+        cardinalidades: dict variable -> tamaño de su dominio
+        variables: variables a eliminar (por defecto todas); las demás se quedan en el
+                   grafo y cuentan para el tamaño de las cliques
+        heuristica: una de HEURISTICAS
+        semilla: si es None los empates se rompen por nombre; si no, con una prioridad
+                 aleatoria por variable tomada de random.Random(semilla)
+
+    Returns:
+        OrdenEliminacion
+    """
+    if heuristica not in HEURISTICAS:
+        raise ValueError(f"heuristica debe ser una de {HEURISTICAS}")
+    adyacencia = {v: set(grafo.neighbors(v)) for v in grafo.nodes}
+    pendientes = set(adyacencia) if variables is None else set(variables) & set(adyacencia)
+    # recorrer en orden fijo para que el desempate aleatorio sea reproducible
+    if semilla is not None:
+        rng = random.Random(semilla)
+        desempate = {v: rng.random() for v in sorted(pendientes, key=str)}
+    else:
+        desempate = {v: str(v) for v in pendientes}
+
+    # heap de (puntaje, desempate, versión, contador, variable); una entrada vale sólo
+    # si su versión es la vigente de la variable (invalidación perezosa)
+    version = dict.fromkeys(pendientes, 0)
+    contador = itertools.count()
+    heap = [(_puntaje(heuristica, v, adyacencia[v], adyacencia, cardinalidades),
+             desempate[v], 0, next(contador), v) for v in pendientes]
+    heapq.heapify(heap)
+
+    orden, cliques, cliques_de = [], [], {}
+    tamano_clique_max = celdas_max = tamano_total = 0
+    while pendientes:
+        *_, vigente, _, v = heapq.heappop(heap)
+        if v not in pendientes or vigente != version[v]:
+            continue
+        vecinos = adyacencia.pop(v)
+        for a, b in itertools.combinations(vecinos, 2):
+            adyacencia[a].add(b)
+            adyacencia[b].add(a)
+        for u in vecinos:
+            adyacencia[u].discard(v)
+        pendientes.remove(v)
+        orden.append(v)
+
+        afectados = set(vecinos)
+        if heuristica != 'min_grado':
+            for u in vecinos:
+                afectados.update(adyacencia[u])
+        for u in afectados & pendientes:
+            version[u] += 1
+            heapq.heappush(heap, (_puntaje(heuristica, u, adyacencia[u], adyacencia,
+                                           cardinalidades),
+                                  desempate[u], version[u], next(contador), u))
+
+        clique = frozenset(vecinos | {v})
+        celdas = int(np.prod([cardinalidades[u] for u in clique], dtype=float))
+        tamano_clique_max = max(tamano_clique_max, len(clique))
+        celdas_max = max(celdas_max, celdas)
+        tamano_total += celdas
+        # una clique anterior no puede contener a ésta salvo que contenga a v, y
+        # ninguna anterior está contenida en ésta (contiene una variable ya eliminada)
+        if not any(clique <= cliques[i] for i in cliques_de.get(v, ())):
+            for u in clique:
+                cliques_de.setdefault(u, []).append(len(cliques))
+            cliques.append(clique)
+
+    return OrdenEliminacion(tuple(orden), heuristica, [tuple(sorted(c, key=str)) for c in cliques],
+                            tamano_clique_max, celdas_max, tamano_total)
+
+
+def mejor_orden(grafo, cardinalidades, variables=None, heuristicas=HEURISTICAS,
+                intentos=8, semilla=0):
+    """Retorna el OrdenEliminacion más barato entre varias heurísticas y desempates.
+
+    Cada heurística se prueba una vez con desempate por nombre y intentos - 1 veces
+    con desempate aleatorio (semillas derivadas de semilla).
+    """
+    rng = random.Random(semilla)
+    mejor = None
+    for heuristica in heuristicas:
+        for k in range(intentos):
+            candidato = ordenar_eliminacion(grafo, cardinalidades, variables, heuristica,
+                                            semilla=None if k == 0 else rng.random())
+            if mejor is None or candidato.costo() < mejor.costo():
+                mejor = candidato
+    return mejor
@@ -0,0 +1,222 @@
+"""Planificador de consultas basado en costo.
+
+Antes de resolver una consulta, Planificador estima cuánto costaría con cada motor de
+inferencia y la envía al más barato:
+
+- 'enumeracion' (consulta_enumeracion con poda): nodos del árbol de enumeración sobre
+  la red podada, es decir, productos acumulados de los tamaños de dominio.
+- 'eliminacion' (consulta_eliminacion): celdas de las tablas intermedias según un
+  orden 'min_grado' (barato de calcular) sobre los factores de la red podada
+  (variables_relevantes) reducidos por la evidencia.
+- 'arbol_uniones' (ArbolUniones.calibrar): dos pasadas de mensajes sobre las cliques;
+  conviene cuando se piden varias variables con la misma evidencia. El árbol se
+  compila una vez y se reutiliza.
+- 'muestreo' (consulta_muestreo_ponderado): se usa sólo si ningún motor exacto cabe
+  en max_operaciones.
+
+Las operaciones de cada motor tienen distinto costo real (la enumeración recorre el
+árbol en Python, los motores de factores operan sobre arreglos de NumPy), así que
+cada estimación se pondera con COSTO_OPERACION y SOBRECARGA_PASO antes de comparar.
+
+Las estimaciones dependen sólo de las variables de consulta y de qué variables están
+observadas, así que se guardan por (consulta, conjunto de variables de evidencia). Si
+la huella de la red (cache.huella_red) cambia se descartan, junto con el árbol de
+uniones compilado.
+"""
+from src.arbol_uniones import compilar_arbol_uniones
+from src.bayesnet import vista_modelo
+from src.cache import huella_red
+from src.eliminacion import consulta_eliminacion
+from src.inference import consulta_enumeracion, variables_relevantes
+from src.muestreo import consulta_muestreo_ponderado
+from src.orden_eliminacion import grafo_interaccion, grafo_moral, ordenar_eliminacion
+
+MOTORES = ('enumeracion', 'eliminacion', 'arbol_uniones', 'muestreo')
+
+# Costo relativo (en microsegundos aproximados) de una operación elemental de cada motor
+COSTO_OPERACION = {'enumeracion': 1.0, 'eliminacion': 0.01, 'arbol_uniones': 0.01,
+                   'muestreo': 0.02}
+# Costo fijo de cada paso vectorizado (multiplicar/sumar un factor, enviar un mensaje)
+SOBRECARGA_PASO = 20.0
+
+
+class Plan:
+    """Plan de una consulta: motor elegido y estimaciones que llevaron a elegirlo.
+
+    Atributos:
+        variables: tupla de variables de consulta
+        evidencia: dict de evidencia
+        motor: nombre del motor elegido (uno de MOTORES)
+        relevantes: variables de la red podada (unión sobre las variables de consulta)
+        ancho_inducido: tamaño de la clique más grande del orden de eliminación menos 1
+        producto_dominios: producto de los dominios de las variables no observadas
+                           de la red podada
+        operaciones: dict motor -> operaciones estimadas
+        costos: dict motor -> costo ponderado estimado
+    """
+    def __init__(self, variables, evidencia, motor, relevantes, ancho_inducido,
+                 producto_dominios, operaciones, costos):
+        self.variables = variables
+        self.evidencia = evidencia
+        self.motor = motor
+        self.relevantes = relevantes
+        self.ancho_inducido = ancho_inducido
+        self.producto_dominios = producto_dominios
+        self.operaciones = operaciones
+        self.costos = costos
+
+    def __str__(self):
+        lineas = [f"Consulta: P({', '.join(self.variables)} | {self.evidencia})",
+                  f"Red podada: {len(self.relevantes)} variables {list(self.relevantes)}",
+                  f"Ancho inducido: {self.ancho_inducido}",
+                  f"Producto de dominios: {self.producto_dominios:.3g}"]
+        for motor in MOTORES:
+            marca = '->' if motor == self.motor else '  '
+            lineas.append(f"{marca} {motor:<14} operaciones ~ {self.operaciones[motor]:>12.3g}"
+                          f"   costo ~ {self.costos[motor]:>12.3g}")
+        lineas.append(f"Motor elegido: {self.motor}")
+        return '\n'.join(lineas)
+
+
+class Planificador:
+    """Elige y ejecuta el motor de inferencia más barato para cada consulta.
+
+    Args:
+        G: networkx.DiGraph de construir_red_bayesiana
+        max_operaciones: operaciones estimadas a partir de las cuales un motor exacto
+                         se considera inviable; si ninguno cabe se usa muestreo
+        n_muestras: muestras para el motor de muestreo
+        semilla: semilla para el motor de muestreo
+    """
+    def __init__(self, G, max_operaciones=1e8, n_muestras=100_000, semilla=None):
+        self.G = G
+        self.max_operaciones = max_operaciones
+        self.n_muestras = n_muestras
+        self.semilla = semilla
+        self._arbol = None
+        self._costo_arbol = None
+        self._planes = {}
+        self._huella = None
+
+    def _verificar_red(self):
+        """Descarta planes y árbol de uniones si la red cambió desde que se calcularon."""
+        huella = huella_red(self.G)
+        if huella != self._huella:
+            self._huella = huella
+            self._arbol = None
+            self._costo_arbol = None
+            self._planes.clear()
+
+    def _operaciones_enumeracion(self, X, evidencia, vista):
+        """Nodos del árbol de enumeración podado y producto de dominios de las ocultas."""
+        relevantes = variables_relevantes(self.G, X, evidencia)
+        hojas = len(vista.dominios[X])
+        nodos = hojas
+        for v in relevantes:
+            if v != X and v not in evidencia:
+                hojas *= len(vista.dominios[v])
+            nodos += hojas
+        return relevantes, float(nodos), float(hojas)
+
+    def _orden_factores(self, X, relevantes, evidencia, vista, cardinalidades):
+        """Orden 'min_grado' sobre los factores de la red podada reducidos por la evidencia
+        (los mismos que usa consulta_eliminacion)."""
+        familias = [tuple(v for v in (n,) + vista.padres[n] if v not in evidencia)
+                    for n in relevantes]
+        grafo = grafo_interaccion(familias)
+        ocultas = [n for n in relevantes if n not in evidencia and n != X]
+        return ordenar_eliminacion(grafo, cardinalidades, ocultas, heuristica='min_grado')
+
+    def _operaciones_arbol(self, cardinalidades):
+        """Celdas de las cliques del árbol de uniones (se calcula una sola vez)."""
+        if self._costo_arbol is None:
+            orden = ordenar_eliminacion(grafo_moral(self.G), cardinalidades,
+                                        heuristica='min_relleno')
+            self._costo_arbol = (orden.tamano_total, len(orden.cliques))
+        return self._costo_arbol
+
+    def planear(self, consulta, evidencia):
+        """Retorna el Plan para consulta (variable o lista de variables) dada la evidencia."""
+        self._verificar_red()
+        variables = (consulta,) if isinstance(consulta, str) else tuple(consulta)
+        evidencia = {k: v for k, v in evidencia.items() if k not in variables}
+        clave = (variables, frozenset(evidencia), self._arbol is None)
+        estimacion = self._planes.get(clave)
+        if estimacion is None:
+            estimacion = self._planes[clave] = self._estimar(variables, evidencia)
+        return Plan(variables, evidencia, *estimacion)
+
+    def _estimar(self, variables, evidencia):
+        """Retorna (motor, relevantes, ancho, producto, operaciones, costos) para planear."""
+        vista = vista_modelo(self.G)
+        cardinalidades = {v: len(d) for v, d in vista.dominios.items()}
+
+        relevantes, ops_enum, producto = set(), 0.0, 0.0
+        ancho = 0
+        ops_elim = 0.0
+        pasos_elim = 0
+        for X in variables:
+            rel, nodos, hojas = self._operaciones_enumeracion(X, evidencia, vista)
+            relevantes.update(rel)
+            ops_enum += nodos
+            producto = max(producto, hojas)
+
+            orden = self._orden_factores(X, rel, evidencia, vista, cardinalidades)
+            ancho = max(ancho, orden.tamano_clique_max - 1)
+            ops_elim += orden.tamano_total
+            pasos_elim += 2 * len(orden.orden) + len(rel)
+
+        celdas_arbol, n_cliques = self._operaciones_arbol(cardinalidades)
+        ops_arbol = 2.0 * celdas_arbol
+        pasos_arbol = 4 * n_cliques + len(variables)
+        if self._arbol is None:
+            ops_arbol += celdas_arbol
+
+        ancestros = vista.ancestros(set(variables) | set(evidencia))
+        ops_muestreo = float(self.n_muestras) * len(ancestros) * len(variables)
+
+        operaciones = {'enumeracion': ops_enum, 'eliminacion': ops_elim,
+                       'arbol_uniones': ops_arbol, 'muestreo': ops_muestreo}
+        costos = {m: operaciones[m] * COSTO_OPERACION[m] for m in MOTORES}
+        costos['eliminacion'] += SOBRECARGA_PASO * pasos_elim
+        costos['arbol_uniones'] += SOBRECARGA_PASO * pasos_arbol
+
+        exactos = [m for m in MOTORES[:3] if operaciones[m] <= self.max_operaciones]
+        motor = min(exactos, key=costos.__getitem__) if exactos else 'muestreo'
+        return (motor, tuple(vista.en_orden(relevantes)), ancho, producto, operaciones, costos)
+
+    def explicar(self, consulta, evidencia):
+        """Retorna un texto con el plan elegido y las operaciones estimadas por motor."""
+        return str(self.planear(consulta, evidencia))
+
+    def consultar(self, consulta, evidencia, plan=None):
+        """Resuelve la consulta con el motor del plan (se calcula si no se da).
+
+        Returns:
+            Para una variable, dict valor -> probabilidad; para una lista de
+            variables, dict variable -> distribución
+        """
+        if plan is None:
+            plan = self.planear(consulta, evidencia)
+        else:
+            self._verificar_red()
+        evidencia = plan.evidencia
+        if plan.motor == 'arbol_uniones':
+            if self._arbol is None:
+                self._arbol = compilar_arbol_uniones(self.G)
+            posteriores = self._arbol.calibrar(evidencia)
+            resultado = {X: posteriores[X] for X in plan.variables}
+        else:
+            resultado = {}
+            for X in plan.variables:
+                if plan.motor == 'enumeracion':
+                    resultado[X] = consulta_enumeracion(X, dict(evidencia), self.G,
+                                                        nivel_traza='apagado')
+                elif plan.motor == 'eliminacion':
+                    resultado[X] = consulta_eliminacion(X, evidencia, self.G,
+                                                        nivel_traza='apagado')
+                else:
+                    resultado[X] = consulta_muestreo_ponderado(
+                        X, evidencia, self.G, n_muestras=self.n_muestras,
+                        semilla=self.semilla).distribucion
+        return resultado[consulta] if isinstance(consulta, str) else resultado
@@ -0,0 +1,210 @@
+"""Pool de procesos para repartir consultas sobre una red cargada una sola vez.
+
+La enumeración en Python está limitada por el GIL, así que para aprovechar varios
+núcleos hacen falta procesos. PoolInferencia carga (o recibe) la red en el proceso
+padre y crea los trabajadores con fork: cada uno hereda la red copy-on-write, sin
+releer los CSV ni serializar el grafo por tarea; a las tareas sólo viajan las
+consultas. Antes de crear los trabajadores se congela el recolector de basura
+(gc.freeze) para que no toque, y por lo tanto no copie, las páginas de la red.
+
+Cada bloque devuelve, además de los resultados, el pid del trabajador y cuánto
+tiempo (de reloj y de CPU) le llevó; PoolInferencia acumula esos tiempos por
+trabajador y los entrega junto con los resultados.
+
+Ejemplo:
+    with PoolInferencia(G, procesos=4) as pool:
+        resultado = pool.consultar([('DiagnosticoCardio', {'Edad': 'mayor'}), ...])
+    resultado.distribuciones, resultado.trabajadores
+"""
+import gc
+import itertools
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from src.bayesnet import vista_modelo
+from src.eliminacion import consulta_eliminacion
+from src.inference import consulta_enumeracion
+from src.planificador import Planificador
+
+MOTORES = ('planificador', 'eliminacion', 'enumeracion')
+
+# Redes registradas en el padre antes del fork, por clave (ver PoolInferencia)
+_COMPARTIDAS = {}
+_claves = itertools.count()
+
+# Estado de cada proceso trabajador (ver _iniciar_trabajador)
+_RED = None
+_MOTOR = None
+
+
+def normalizar_evidencia(vista, evidencia):
+    """Convierte valores leídos como texto ('True', 'si') al valor del dominio.
+
+    Lanza KeyError si una variable no está en la red o un valor está fuera de dominio.
+    """
+    normalizada = {}
+    for var, val in evidencia.items():
+        if var not in vista.codigos:
+            raise KeyError(f"Variable '{var}' no está en la red")
+        if val not in vista.codigos[var]:
+            val = {str(v): v for v in vista.dominios[var]}.get(str(val), val)
+            if val not in vista.codigos[var]:
+                raise KeyError(f"Valor {val!r} fuera del dominio de '{var}'")
+        normalizada[var] = val
+    return normalizada
+
+
+def _crear_motor(G, motor):
+    if motor == 'planificador':
+        planificador = Planificador(G)
+        return lambda X, e: planificador.consultar(X, e)
+    if motor == 'eliminacion':
+        return lambda X, e: consulta_eliminacion(X, e, G, nivel_traza='apagado')
+    return lambda X, e: consulta_enumeracion(X, e, G, nivel_traza='apagado')
+
+
+def _iniciar_trabajador(clave, motor, red=None):
+    """Inicializador: toma la red heredada por fork (o la recibida si no hay fork)."""
+    global _RED, _MOTOR
+    _RED = red if red is not None else _COMPARTIDAS[clave]
+    _MOTOR = _crear_motor(_RED, motor)
+
+
+def _resolver_bloque(bloque):
+    """Resuelve [(X, evidencia), ...]; retorna (pid, segundos, segundos de CPU, resultados).
+
+    Cada resultado es (distribución, None) o (None, mensaje de error); una consulta
+    que falla, por la razón que sea, no afecta al resto del bloque.
+    """
+    inicio, inicio_cpu = time.perf_counter(), time.process_time()
+    vista = vista_modelo(_RED)
+    resultados = []
+    for X, evidencia in bloque:
+        try:
+            if not isinstance(X, str) or X not in vista.dominios:
+                raise KeyError(f"Variable {X!r} no está en la red")
+            if not isinstance(evidencia, dict):
+                raise TypeError("La evidencia debe ser un objeto de variable a valor")
+            resultados.append((_MOTOR(X, normalizar_evidencia(vista, evidencia)), None))
+        except (KeyError, ValueError, ZeroDivisionError) as e:
+            resultados.append((None, e.args[0] if e.args else type(e).__name__))
+        except Exception as e:
+            resultados.append((None, f"{type(e).__name__}: {e}"))
+    return (os.getpid(), time.perf_counter() - inicio, time.process_time() - inicio_cpu,
+            resultados)
+
+
+class TiempoTrabajador:
+    """Acumulados de un proceso trabajador."""
+    def __init__(self, pid):
+        self.pid = pid
+        self.bloques = 0
+        self.consultas = 0
+        self.segundos = 0.0
+        self.segundos_cpu = 0.0
+
+    def __repr__(self):
+        return (f"TiempoTrabajador(pid={self.pid}, bloques={self.bloques}, "
+                f"consultas={self.consultas}, segundos={self.segundos:.3f}, "
+                f"segundos_cpu={self.segundos_cpu:.3f})")
+
+
+class ResultadoPool:
+    """Resultados de PoolInferencia.consultar.
+
+    Atributos:
+        distribuciones: lista, en el orden de las consultas, de dicts valor -> prob
+                        (None si la consulta falló)
+        errores: lista paralela con el mensaje de error de cada consulta (o None)
+        trabajadores: dict pid -> TiempoTrabajador de los bloques de esta llamada
+        segundos: tiempo de reloj total de la llamada
+    """
+    def __init__(self, distribuciones, errores, trabajadores, segundos):
+        self.distribuciones = distribuciones
+        self.errores = errores
+        self.trabajadores = trabajadores
+        self.segundos = segundos
+
+
+class PoolInferencia:
+    """Pool de procesos que comparten copy-on-write una red cargada en el padre.
+
+    Args:
+        G: networkx.DiGraph ya cargado (conviene compilado, ver formato_binario.cargar_red)
+        procesos: número de trabajadores (por defecto uno por CPU)
+        motor: 'planificador' (por defecto), 'eliminacion' o 'enumeracion'
+        tam_bloque: consultas por tarea en consultar
+    """
+    def __init__(self, G, procesos=None, motor='planificador', tam_bloque=64):
+        if motor not in MOTORES:
+            raise ValueError(f"motor debe ser uno de {MOTORES}")
+        vista_modelo(G)  # que los trabajadores hereden la vista ya construida
+        self.G = G
+        self.tam_bloque = tam_bloque
+        self.trabajadores = {}
+        self._clave = next(_claves)
+        if 'fork' in multiprocessing.get_all_start_methods():
+            _COMPARTIDAS[self._clave] = G
+            contexto = multiprocessing.get_context('fork')
+            initargs = (self._clave, motor)
+            gc.collect()
+            gc.freeze()
+        else:  # sin fork cada trabajador recibe la red una sola vez, al iniciar
+            contexto = multiprocessing.get_context()
+            initargs = (self._clave, motor, G)
+        self._ejecutor = ProcessPoolExecutor(procesos, mp_context=contexto,
+                                             initializer=_iniciar_trabajador,
+                                             initargs=initargs)
+
+    def enviar(self, bloque):
+        """Envía un bloque [(X, evidencia), ...] a un trabajador.
+
+        Retorna un Future con (pid, segundos, segundos de CPU, resultados); pasar su
+        resultado a registrar acumula los tiempos y devuelve los resultados.
+        """
+        return self._ejecutor.submit(_resolver_bloque, list(bloque))
+
+    def registrar(self, respuesta, trabajadores=None):
+        """Acumula los tiempos de la respuesta de un bloque; retorna sus resultados."""
+        pid, segundos, segundos_cpu, resultados = respuesta
+        for destino in (self.trabajadores, trabajadores):
+            if destino is None:
+                continue
+            t = destino.setdefault(pid, TiempoTrabajador(pid))
+            t.bloques += 1
+            t.consultas += len(resultados)
+            t.segundos += segundos
+            t.segundos_cpu += segundos_cpu
+        return resultados
+
+    def consultar(self, consultas):
+        """Resuelve una lista de (X, evidencia) repartida en bloques; retorna ResultadoPool."""
+        inicio = time.perf_counter()
+        consultas = list(consultas)
+        futuros = [self.enviar(consultas[i:i + self.tam_bloque])
+                   for i in range(0, len(consultas), self.tam_bloque)]
+        trabajadores = {}
+        distribuciones, errores = [], []
+        for futuro in futuros:
+            for dist, error in self.registrar(futuro.result(), trabajadores):
+                distribuciones.append(dist)
+                errores.append(error)
+        return ResultadoPool(distribuciones, errores, trabajadores,
+                             time.perf_counter() - inicio)
+
+    def cerrar(self):
+        """Cancela las tareas pendientes, espera a los trabajadores y libera la red."""
+        if self._ejecutor is None:
+            return
+        self._ejecutor.shutdown(wait=True, cancel_futures=True)
+        self._ejecutor = None
+        if _COMPARTIDAS.pop(self._clave, None) is not None and not _COMPARTIDAS:
+            gc.unfreeze()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
@@ -2,9 +2,47 @@
 
 Casos de prueba con variables ocultas y sus respectivos cálculos manuales para validación.
 """
+import argparse
+import asyncio
+import json
+import tempfile
 from pathlib import Path
-from src.bayesnet import construir_red_bayesiana
-from src.inference import consulta_enumeracion
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+from src.bayesnet import construir_red_bayesiana, reemplazar_cpt, vista_modelo
+from src.inference import (TIPOS_DETALLE, CacheEnumeracion, PerfilInferencia,
+                           RastreadorInferencia, consulta_enumeracion, obtener_probabilidad,
+                           variables_relevantes)
+from src.eliminacion import consulta_eliminacion
+from src.cache import CachePosteriores, huella_red
+from src.arbol_uniones import compilar_arbol_uniones
+from src.lote import consulta_lote
+from src.muestreo import consulta_gibbs, consulta_muestreo_ponderado
+from src.formato_binario import cargar_modelo, guardar_modelo
+from src.servidor import ServidorInferencia, _enviar
+from src.main import consultar
+from src.pool import PoolInferencia
+from src.generador_redes import escribir_red, generar_red
+from benchmarks.comparar import comparar as comparar_benchmarks
+from src.planificador import Planificador
+from src.analisis_traza import analizar, leer_registros, renderizar
+from src.orden_eliminacion import (HEURISTICAS, grafo_interaccion, grafo_moral, mejor_orden,
+                                  ordenar_eliminacion)
+
+CARPETA_CARDIO = Path(__file__).resolve().parents[1] / 'data' / 'cardio'
+EVIDENCIAS = [
+    {'Edad': 'mayor', 'PresionAlta': 'si'},
+    {'Edad': 'joven', 'Sedentarismo': 'si'},
+    {'Edad': 'adulto', 'DolorPecho': 'si', 'Fatiga': 'si'},
+]
+
+
+def _error_maximo(esperado, obtenido):
+    """Mayor diferencia absoluta entre dos distribuciones sobre los mismos valores."""
+    return max(abs(esperado[v] - obtenido[v]) for v in esperado)
 
 
 def test_persona_mayor_presion_alta():
@@ -34,20 +72,9 @@ def test_persona_mayor_presion_alta():
     carpeta_data = Path(__file__).resolve().parents[1] / 'data' / 'cardio'
     aristas = carpeta_data / 'edges.csv'
 
-    valores_variables = {
-        'Edad': {'joven', 'adulto', 'mayor'},
-        'Obesidad': {'si', 'no'},
-        'Sedentarismo': {'si', 'no'}, 
-        'PresionAlta': {'si', 'no'},
-        'DolorPecho': {'si', 'no'},
-        'Fatiga': {'si', 'no'},
-        'DiagnosticoCardio': {'si', 'no'}
-    }
-
     G = construir_red_bayesiana(aristas, carpeta_data)
     evidencia = {'Edad': 'mayor', 'PresionAlta': 'si'}
-    dist = consulta_enumeracion('DiagnosticoCardio', evidencia, G,
-                               vars_red=valores_variables)
+    dist = consulta_enumeracion('DiagnosticoCardio', evidencia, G)
     
     # Validar resultado
     valor_esperado = 0.6331  # 63.31%
@@ -86,20 +113,9 @@ def test_persona_joven_sedentaria():
     carpeta_data = Path(__file__).resolve().parents[1] / 'data' / 'cardio'
     aristas = carpeta_data / 'edges.csv'
 
-    valores_variables = {
-        'Edad': {'joven', 'adulto', 'mayor'},
-        'Obesidad': {'si', 'no'},
-        'Sedentarismo': {'si', 'no'}, 
-        'PresionAlta': {'si', 'no'},
-        'DolorPecho': {'si', 'no'},
-        'Fatiga': {'si', 'no'},
-        'DiagnosticoCardio': {'si', 'no'}
-    }
-
     G = construir_red_bayesiana(aristas, carpeta_data)
     evidencia = {'Edad': 'joven', 'Sedentarismo': 'si'}
-    dist = consulta_enumeracion('DiagnosticoCardio', evidencia, G,
-                               vars_red=valores_variables)
+    dist = consulta_enumeracion('DiagnosticoCardio', evidencia, G)
     
     # Validar resultado
     valor_esperado = 0.2214  # 22.14%
@@ -138,20 +154,9 @@ def test_persona_adulta_sintomas():
     carpeta_data = Path(__file__).resolve().parents[1] / 'data' / 'cardio'
     aristas = carpeta_data / 'edges.csv'
 
-    valores_variables = {
-        'Edad': {'joven', 'adulto', 'mayor'},
-        'Obesidad': {'si', 'no'},
-        'Sedentarismo': {'si', 'no'}, 
-        'PresionAlta': {'si', 'no'},
-        'DolorPecho': {'si', 'no'},
-        'Fatiga': {'si', 'no'},
-        'DiagnosticoCardio': {'si', 'no'}
-    }
-
     G = construir_red_bayesiana(aristas, carpeta_data)
     evidencia = {'Edad': 'adulto', 'DolorPecho': 'si', 'Fatiga': 'si'}
-    dist = consulta_enumeracion('DiagnosticoCardio', evidencia, G,
-                               vars_red=valores_variables)
+    dist = consulta_enumeracion('DiagnosticoCardio', evidencia, G)
     
     # Validar resultado
     valor_esperado = 0.5812  # 58.12%
@@ -162,12 +167,888 @@ def test_persona_adulta_sintomas():
     print(f"Error absoluto: {abs(valor_esperado - valor_obtenido):.4f}")
 
 
+def test_eliminacion_coincide_con_enumeracion():
+    """Caso 4: eliminación de variables debe reproducir los resultados de enumeración.
+
+    Se repiten las evidencias de los casos 1 a 3 con ambos motores y se compara la
+    probabilidad de cada valor de DiagnosticoCardio.
+    """
+    carpeta_data = Path(__file__).resolve().parents[1] / 'data' / 'cardio'
+    aristas = carpeta_data / 'edges.csv'
+
+    G = construir_red_bayesiana(aristas, carpeta_data)
+    evidencias = [
+        {'Edad': 'mayor', 'PresionAlta': 'si'},
+        {'Edad': 'joven', 'Sedentarismo': 'si'},
+        {'Edad': 'adulto', 'DolorPecho': 'si', 'Fatiga': 'si'},
+    ]
+    print("\nTest 4: eliminación de variables vs. enumeración")
+    for evidencia in evidencias:
+        esperado = consulta_enumeracion('DiagnosticoCardio', dict(evidencia), G)
+        obtenido = consulta_eliminacion('DiagnosticoCardio', evidencia, G)
+        error = max(abs(esperado[v] - obtenido[v]) for v in esperado)
+        print(f"Evidencia {evidencia}: error absoluto máximo {error:.2e}")
+        assert error < 1e-9
+
+
+def test_cache_invalida_cpt_reemplazada():
+    """Caso 5: reemplazar una CPT no debe dejar posteriores obsoletas en la caché.
+
+    Sobre una red compilada se asigna una CPT nueva directamente al atributo 'cpt'
+    (la tabla compilada queda vieja) y luego con reemplazar_cpt; en ambos casos la
+    consulta a través de CachePosteriores debe coincidir con una red recién cargada
+    con la CPT nueva.
+    """
+    G = construir_red_bayesiana(CARPETA_CARDIO / 'edges.csv', CARPETA_CARDIO, compilar=True)
+    cache = CachePosteriores()
+    evidencia = {'Edad': 'mayor'}
+    antes = cache.consultar('DiagnosticoCardio', evidencia, G)
+
+    nueva = G.nodes['Obesidad']['cpt'].copy()
+    nueva['prob'] = nueva['prob'].to_numpy()[::-1]
+    referencia = construir_red_bayesiana(CARPETA_CARDIO / 'edges.csv', CARPETA_CARDIO)
+    reemplazar_cpt(referencia, 'Obesidad', nueva.copy())
+    esperado = consulta_enumeracion('DiagnosticoCardio', dict(evidencia), referencia,
+                                    nivel_traza='apagado')
+
+    print("\nTest 5: invalidación de la caché al reemplazar una CPT")
+    G.nodes['Obesidad']['cpt'] = nueva
+    directo = cache.consultar('DiagnosticoCardio', evidencia, G)
+    reemplazar_cpt(G, 'Obesidad', nueva.copy())
+    reemplazada = cache.consultar('DiagnosticoCardio', evidencia, G)
+    for nombre, obtenido in (('asignación directa', directo), ('reemplazar_cpt', reemplazada)):
+        error = _error_maximo(esperado, obtenido)
+        print(f"{nombre}: error absoluto máximo {error:.2e}")
+        assert error < 1e-9
+    assert _error_maximo(antes, directo) > 1e-3
+
+
+def test_arbol_uniones_coincide_con_enumeracion():
+    """Caso 6: una calibración del árbol de uniones da la posterior de todos los nodos.
+
+    Para cada evidencia de los casos 1 a 3 se compara la posterior de cada variable no
+    observada con la que da enumeración.
+    """
+    G = construir_red_bayesiana(CARPETA_CARDIO / 'edges.csv', CARPETA_CARDIO, compilar=True)
+    arbol = compilar_arbol_uniones(G)
+    print("\nTest 6: árbol de uniones vs. enumeración (todas las variables)")
+    for evidencia in EVIDENCIAS:
+        posteriores = arbol.calibrar(evidencia)
+        error = max(_error_maximo(consulta_enumeracion(v, dict(evidencia), G,
+                                                       nivel_traza='apagado'), posteriores[v])
+                    for v in vista_modelo(G).orden_topologico if v not in evidencia)
+        print(f"Evidencia {evidencia}: error absoluto máximo {error:.2e}")
+        assert error < 1e-9
+
+
+def test_poda_no_cambia_posteriores():
+    """Caso 7: podar nodos estériles y d-separados no cambia la posterior.
+
+    P(Fatiga | Edad=mayor) sólo depende de Obesidad y Sedentarismo: Edad queda
+    d-separada (PresionAlta no está observada) y DiagnosticoCardio, DolorPecho y
+    PresionAlta son estériles. Además, para las evidencias de los casos 1 a 3 se
+    compara la enumeración con y sin poda en todas las variables no observadas.
+    """
+    G = construir_red_bayesiana(CARPETA_CARDIO / 'edges.csv', CARPETA_CARDIO)
+    print("\nTest 7: enumeración con poda vs. sin poda")
+    relevantes = variables_relevantes(G, 'Fatiga', {'Edad': 'mayor'})
+    print(f"Variables relevantes para P(Fatiga | Edad=mayor): {relevantes}")
+    assert set(relevantes) == {'Obesidad', 'Sedentarismo', 'Fatiga'}
+    for evidencia in EVIDENCIAS:
+        error = 0.0
+        for v in vista_modelo(G).orden_topologico:
+            if v in evidencia:
+                continue
+            podada = consulta_enumeracion(v, dict(evidencia), G, nivel_traza='apagado')
+            completa = consulta_enumeracion(v, dict(evidencia), G, podar=False,
+                                            nivel_traza='apagado')
+            error = max(error, _error_maximo(completa, podada))
+        print(f"Evidencia {evidencia}: error absoluto máximo {error:.2e}")
+        assert error < 1e-12
+
+
+def test_enumeracion_memoizada():
+    """Caso 8: la enumeración memoizada reutiliza subresultados sin cambiar la posterior.
+
+    Se enumera sin poda (para que haya ramas repetidas) con una CacheEnumeracion y se
+    verifica que coincida con la enumeración simple y que la caché tenga aciertos.
+    """
+    G = construir_red_bayesiana(CARPETA_CARDIO / 'edges.csv', CARPETA_CARDIO)
+    print("\nTest 8: enumeración memoizada vs. enumeración")
+    for evidencia in EVIDENCIAS:
+        esperado = consulta_enumeracion('DiagnosticoCardio', dict(evidencia), G,
+                                        nivel_traza='apagado')
+        cache = CacheEnumeracion()
+        obtenido = consulta_enumeracion('DiagnosticoCardio', dict(evidencia), G, podar=False,
+                                        memoizar=cache, nivel_traza='apagado')
+        error = _error_maximo(esperado, obtenido)
+        print(f"Evidencia {evidencia}: error absoluto máximo {error:.2e}, "
+              f"{cache.aciertos} aciertos y {cache.fallos} fallos")
+        assert error < 1e-12
+        assert cache.aciertos > 0
+
+
+def test_consulta_lote_coincide_con_enumeracion():
+    """Caso 9: consulta_lote resuelve varias evidencias en una llamada.
+
+    Las filas son las evidencias de los casos 1 a 3 más una fila sin evidencia (todas
+    las celdas vacías); cada fila debe coincidir con enumeración.
+    """
+    G = construir_red_bayesiana(CARPETA_CARDIO / 'edges.csv', CARPETA_CARDIO, compilar=True)
+    evidencias = EVIDENCIAS + [{}]
+    filas = pd.DataFrame.from_records(evidencias, index=range(len(evidencias)))
+    tabla = consulta_lote('DiagnosticoCardio', filas, G)
+    print("\nTest 9: consulta_lote vs. enumeración")
+    assert list(tabla.index) == list(range(len(evidencias)))
+    for i, evidencia in enumerate(evidencias):
+        esperado = consulta_enumeracion('DiagnosticoCardio', dict(evidencia), G,
+                                        nivel_traza='apagado')
+        error = _error_maximo(esperado, tabla.loc[i])
+        print(f"Evidencia {evidencia}: error absoluto máximo {error:.2e}")
+        assert error < 1e-9
+
+
+def test_muestreo_ponderado_cerca_de_enumeracion():
+    """Caso 10: la ponderación por verosimilitud se acerca a la posterior exacta.
+
+    Con semilla fija y 100.000 muestras, la estimación de cada valor debe estar a menos
+    de 4 errores estándar del resultado de enumeración, y el intervalo de confianza
+    debe contener la estimación.
+    """
+    G = construir_red_bayesiana(CARPETA_CARDIO / 'edges.csv', CARPETA_CARDIO, compilar=True)
+    print("\nTest 10: ponderación por verosimilitud vs. enumeración")
+    for evidencia in EVIDENCIAS:
+        esperado = consulta_enumeracion('DiagnosticoCardio', dict(evidencia), G,
+                                        nivel_traza='apagado')
+        resultado = consulta_muestreo_ponderado('DiagnosticoCardio', evidencia, G,
+                                                n_muestras=100_000, semilla=0)
+        error = _error_maximo(esperado, resultado.distribucion)
+        tolerancia = 4 * max(resultado.errores_estandar.values())
+        print(f"Evidencia {evidencia}: error absoluto máximo {error:.4f} "
+              f"(tolerancia {tolerancia:.4f})")
+        assert error < tolerancia
+        for v, (inferior, superior) in resultado.intervalos.items():
+            assert inferior <= resultado.distribucion[v] <= superior
+
+
+def test_gibbs_cerca_de_enumeracion():
+    """Caso 11: las cadenas de Gibbs convergen a la posterior exacta.
+
+    Las cadenas corren en este proceso (procesos=0) con semilla fija; deben converger
+    y quedar a menos de 4 errores estándar de enumeración. Con la misma semilla, un
+    pool de 2 procesos debe dar exactamente la misma estimación.
+    """
+    G = construir_red_bayesiana(CARPETA_CARDIO / 'edges.csv', CARPETA_CARDIO, compilar=True)
+    print("\nTest 11: muestreo de Gibbs vs. enumeración")
+    for evidencia in EVIDENCIAS:
+        esperado = consulta_enumeracion('DiagnosticoCardio', dict(evidencia), G,
+                                        nivel_traza='apagado')
+        resultado = consulta_gibbs('DiagnosticoCardio', evidencia, G, procesos=0, semilla=0)
+        error = _error_maximo(esperado, resultado.distribucion)
+        tolerancia = 4 * max(resultado.errores_estandar.values())
+        print(f"Evidencia {evidencia}: error absoluto máximo {error:.4f} "
+              f"(tolerancia {tolerancia:.4f}), R-hat máximo {max(resultado.rhat.values()):.4f}")
+        assert resultado.convergio
+        assert error < tolerancia
+    en_pool = consulta_gibbs('DiagnosticoCardio', evidencia, G, procesos=2, semilla=0)
+    assert en_pool.distribucion == resultado.distribucion
+
+
+def test_modelo_binario_ida_y_vuelta():
+    """Caso 12: guardar y cargar un .bnc conserva la red y sus posteriores.
+
+    El modelo cargado debe tener los mismos nodos, aristas, dominios y tablas, con las
+    tablas de sólo lectura sobre el archivo mapeado, y dar las mismas posteriores.
+    Un archivo que no es .bnc debe rechazarse con ValueError.
+    """
+    G = construir_red_bayesiana(CARPETA_CARDIO / 'edges.csv', CARPETA_CARDIO, compilar=True)
+    print("\nTest 12: ida y vuelta por el formato binario .bnc")
+    with tempfile.TemporaryDirectory() as temporal:
+        ruta = Path(temporal) / 'cardio.bnc'
+        guardar_modelo(G, ruta)
+        H = cargar_modelo(ruta)
+        assert set(H.nodes) == set(G.nodes) and set(H.edges) == set(G.edges)
+        assert H.graph['dominios'] == G.graph['dominios']
+        for n in G.nodes:
+            original, cargada = G.nodes[n]['cpt_compilada'], H.nodes[n]['cpt_compilada']
+            assert cargada.padres == original.padres
+            assert np.array_equal(cargada.tabla, original.tabla)
+            assert not cargada.tabla.flags.writeable
+        for evidencia in EVIDENCIAS:
+            esperado = consulta_eliminacion('DiagnosticoCardio', evidencia, G,
+                                            nivel_traza='apagado')
+            obtenido = consulta_eliminacion('DiagnosticoCardio', evidencia, H,
+                                            nivel_traza='apagado')
+            error = _error_maximo(esperado, obtenido)
+            print(f"Evidencia {evidencia}: error absoluto máximo {error:.2e}")
+            assert error == 0
+        invalido = Path(temporal) / 'invalido.bnc'
+        invalido.write_bytes(b'no es un modelo')
+        try:
+            cargar_modelo(invalido)
+        except ValueError as e:
+            print(f"Archivo inválido rechazado: {e}")
+        else:
+            raise AssertionError("cargar_modelo aceptó un archivo que no es .bnc")
+
+
+def test_indice_cpt_se_reconstruye():
+    """Caso 13: el índice hash de una CPT sigue al DataFrame del nodo.
+
+    En una red sin compilar, obtener_probabilidad debe leer del IndiceCPT del nodo y,
+    si se asigna otra CPT directamente al atributo 'cpt', reconstruirlo antes de
+    responder. Una fila inexistente se reporta con KeyError.
+    """
+    G = construir_red_bayesiana(CARPETA_CARDIO / 'edges.csv', CARPETA_CARDIO)
+    print("\nTest 13: reconstrucción del índice hash de CPTs")
+    fila = {'Edad': 'mayor', 'Obesidad': 'si', 'Sedentarismo': 'si', 'PresionAlta': 'si'}
+    cpt = G.nodes['PresionAlta']['cpt']
+    esperado = float(cpt.loc[(cpt['Edad'] == 'mayor') & (cpt['Obesidad'] == 'si')
+                             & (cpt['Sedentarismo'] == 'si') & (cpt['value'] == 'si'),
+                             'prob'].iloc[0])
+    assert obtener_probabilidad('PresionAlta', fila, G) == esperado
+    assert G.nodes['PresionAlta']['indice_cpt'].cpt is cpt
+
+    nueva = G.nodes['Obesidad']['cpt'].copy()
+    nueva['prob'] = nueva['prob'].to_numpy()[::-1]
+    G.nodes['Obesidad']['cpt'] = nueva
+    for valor, p in zip(nueva['value'], nueva['prob']):
+        obtenido = obtener_probabilidad('Obesidad', {'Obesidad': valor}, G)
+        print(f"P(Obesidad={valor}) = {obtenido:.4f} (CPT nueva: {p:.4f})")
+        assert obtenido == p
+    assert G.nodes['Obesidad']['indice_cpt'].cpt is nueva
+    try:
+        obtener_probabilidad('Obesidad', {'Obesidad': 'tal vez'}, G)
+    except KeyError as e:
+        print(f"Fila inexistente: {e}")
+    else:
+        raise AssertionError("obtener_probabilidad aceptó un valor sin fila en la CPT")
+
+
+def _escribir_red_minima(carpeta, cpts):
+    """Escribe en carpeta una red de nodos raíz sin aristas, una CPT por nodo."""
+    carpeta.mkdir()
+    (carpeta / 'edges.csv').write_text('parent,child\n', encoding='utf-8')
+    for nodo, filas in cpts.items():
+        pd.DataFrame(filas, columns=['value', 'prob']).to_csv(carpeta / f'cpt_{nodo}.csv',
+                                                              index=False)
+    return construir_red_bayesiana(carpeta / 'edges.csv', carpeta)
+
+
+def test_completar_complementos():
+    """Caso 14: las filas de complemento faltantes se completan sólo si son inequívocas.
+
+    A usa 'si'/'no', así que a B (sólo 'si') se le agrega 'no' con 1 - P(si). Si otra
+    variable usa 'yes'/'no', el complemento de C (sólo 'no') es ambiguo y la CPT se
+    rechaza por no sumar 1, igual que una CPT completa cuyas filas no suman 1.
+    """
+    print("\nTest 14: completar filas de complemento en CPTs")
+    with tempfile.TemporaryDirectory() as temporal:
+        temporal = Path(temporal)
+        G = _escribir_red_minima(temporal / 'completa', {
+            'A': [('si', 0.3), ('no', 0.7)], 'B': [('si', 0.2)]})
+        print(f"Dominio de B: {G.graph['dominios']['B']}")
+        assert G.graph['dominios']['B'] == ('si', 'no')
+        assert abs(obtener_probabilidad('B', {'B': 'no'}, G) - 0.8) < 1e-12
+
+        casos_invalidos = {
+            'ambigua': {'A': [('si', 0.3), ('no', 0.7)], 'D': [('yes', 0.5), ('no', 0.5)],
+                        'C': [('no', 0.4)]},
+            'no_suma_1': {'A': [('si', 0.5), ('no', 0.6)]},
+        }
+        for nombre, cpts in casos_invalidos.items():
+            try:
+                _escribir_red_minima(temporal / nombre, cpts)
+            except ValueError as e:
+                print(f"{nombre}: {e}")
+                assert 'no suman 1' in str(e)
+            else:
+                raise AssertionError(f"Se aceptó la red {nombre}")
+
+
+def test_cache_lru_y_expiracion():
+    """Caso 15: la caché de posteriores reconoce consultas equivalentes, desaloja la
+    entrada menos usada y expira entradas viejas.
+
+    El orden de la evidencia y la presencia de X en ella no cambian la clave. Con
+    capacidad 2, una tercera consulta desaloja a la menos usada; con ttl=10 y un reloj
+    manual, una entrada consultada 11 segundos después se recalcula.
+    """
+    G = construir_red_bayesiana(CARPETA_CARDIO / 'edges.csv', CARPETA_CARDIO, compilar=True)
+    ahora = [0.0]
+    cache = CachePosteriores(capacidad=2, ttl=10, reloj=lambda: ahora[0])
+    print("\nTest 15: caché de posteriores (claves, LRU y expiración)")
+    primera = cache.consultar('DiagnosticoCardio', {'Edad': 'mayor', 'PresionAlta': 'si'}, G)
+    repetida = cache.consultar('DiagnosticoCardio', {'PresionAlta': 'si', 'Edad': 'mayor',
+                                                     'DiagnosticoCardio': 'si'}, G)
+    assert repetida == primera and (cache.aciertos, cache.fallos) == (1, 1)
+
+    cache.consultar('DiagnosticoCardio', EVIDENCIAS[1], G)
+    cache.consultar('DiagnosticoCardio', EVIDENCIAS[0], G)  # EVIDENCIAS[1] queda última
+    cache.consultar('DiagnosticoCardio', EVIDENCIAS[2], G)
+    assert cache.desalojos == 1
+    assert cache.clave(G, 'DiagnosticoCardio', EVIDENCIAS[1]) not in cache.entradas
+    assert cache.clave(G, 'DiagnosticoCardio', EVIDENCIAS[0]) in cache.entradas
+
+    ahora[0] = 11.0
+    cache.consultar('DiagnosticoCardio', EVIDENCIAS[0], G)
+    print(f"Aciertos {cache.aciertos}, fallos {cache.fallos}, desalojos {cache.desalojos}, "
+          f"expirados {cache.expirados}")
+    assert cache.expirados == 1
+    assert (cache.aciertos, cache.fallos) == (2, 4)
+
+
+def test_sesion_evidencia_incremental():
+    """Caso 16: una sesión de evidencia incremental coincide con calibrar desde cero.
+
+    Se agrega, cambia y retira evidencia de a un elemento y tras cada paso se comparan
+    todas las posteriores con ArbolUniones.calibrar. Un cambio debe recalcular menos
+    mensajes que una propagación completa, y una operación inválida debe rechazarse
+    sin modificar la evidencia.
+    """
+    G = construir_red_bayesiana(CARPETA_CARDIO / 'edges.csv', CARPETA_CARDIO, compilar=True)
+    arbol = compilar_arbol_uniones(G)
+    sesion = arbol.sesion()
+    total_mensajes = 2 * len(arbol.orden_recoleccion)
+    pasos = [('agregar', 'Edad', 'adulto'), ('agregar', 'DolorPecho', 'si'),
+             ('agregar', 'Fatiga', 'si'), ('cambiar', 'Edad', 'mayor'),
+             ('retirar', 'DolorPecho', None)]
+    print("\nTest 16: sesión de evidencia incremental vs. calibrar")
+    sesion.posteriores()
+    for operacion, var, val in pasos:
+        antes = sesion.mensajes_calculados
+        getattr(sesion, operacion)(*((var,) if val is None else (var, val)))
+        obtenidas = sesion.posteriores()
+        esperadas = arbol.calibrar(sesion.evidencia)
+        error = max(_error_maximo(esperadas[v], obtenidas[v]) for v in esperadas)
+        recalculados = sesion.mensajes_calculados - antes
+        print(f"{operacion}({var}): evidencia {sesion.evidencia}, {recalculados} de "
+              f"{total_mensajes} mensajes, error absoluto máximo {error:.2e}")
+        assert error < 1e-12
+        assert recalculados < total_mensajes
+    invalidas = [('agregar', ('Edad', 'joven')), ('cambiar', ('Fatiga', 'tal vez')),
+                 ('retirar', ('Obesidad',))]
+    for operacion, argumentos in invalidas:
+        evidencia = dict(sesion.evidencia)
+        try:
+            getattr(sesion, operacion)(*argumentos)
+        except (KeyError, ValueError) as e:
+            print(f"{operacion}{argumentos} rechazado: {e}")
+        else:
+            raise AssertionError(f"Se aceptó {operacion}{argumentos}")
+        assert sesion.evidencia == evidencia
+
+
+def test_servidor_aisla_errores():
+    """Caso 17: el servidor responde cada solicitud de un lote por separado.
+
+    Se arranca un ServidorInferencia en un puerto libre y se envían a la vez consultas
+    válidas y otras con datos inválidos, para que compartan lote. Las válidas deben
+    coincidir con enumeración y las inválidas recibir su propio código de error; un
+    Content-Length mal formado se responde con 400.
+    """
+    G = construir_red_bayesiana(CARPETA_CARDIO / 'edges.csv', CARPETA_CARDIO, compilar=True)
+    solicitudes = [({'red': 'cardio', 'x': 'DiagnosticoCardio', 'evidencia': e}, 200)
+                   for e in EVIDENCIAS]
+    solicitudes += [
+        ({'red': 'cardio', 'x': 'DiagnosticoCardio', 'evidencia': {'Edad': 'anciano'}}, 400),
+        ({'red': 'cardio', 'x': 'Colesterol', 'evidencia': {}}, 400),
+        ({'red': 'cardio', 'x': ['DiagnosticoCardio'], 'evidencia': {}}, 400),
+        ({'red': 'cardio', 'x': 'DiagnosticoCardio', 'evidencia': {'Edad': ['mayor']}}, 400),
+        ({'red': 'cardio', 'x': 'DiagnosticoCardio', 'evidencia': ['Edad']}, 400),
+        ({'red': 'otra', 'x': 'DiagnosticoCardio', 'evidencia': {}}, 404),
+    ]
+
+    async def enviar(puerto, datos):
+        reader, writer = await asyncio.open_connection('127.0.0.1', puerto)
+        try:
+            return await _enviar(reader, writer, '127.0.0.1', 'POST', '/consulta', datos)
+        finally:
+            writer.close()
+
+    async def enviar_crudo(puerto, encabezado):
+        reader, writer = await asyncio.open_connection('127.0.0.1', puerto)
+        writer.write(encabezado)
+        await writer.drain()
+        estado = int((await reader.readline()).split()[1])
+        writer.close()
+        return estado
+
+    async def correr():
+        servidor = ServidorInferencia({'cardio': G}, ventana_ms=20)
+        srv = await servidor.iniciar('127.0.0.1', 0)
+        puerto = srv.sockets[0].getsockname()[1]
+        try:
+            respuestas = await asyncio.gather(*(enviar(puerto, datos)
+                                                for datos, _ in solicitudes))
+            crudo = await enviar_crudo(puerto, b"POST /consulta HTTP/1.1\r\n"
+                                               b"Content-Length: -5\r\n\r\n")
+        finally:
+            srv.close()
+            await srv.wait_closed()
+            await servidor.detener()
+        return respuestas, crudo, servidor.estadisticas['lotes']
+
+    respuestas, crudo, lotes = asyncio.run(correr())
+    print(f"\nTest 17: aislamiento de errores en el servidor ({lotes} lotes)")
+    for (datos, esperado), (estado, cuerpo) in zip(solicitudes, respuestas):
+        print(f"x={datos['x']!r}, evidencia={datos['evidencia']!r}: {estado} {cuerpo}")
+        assert estado == esperado
+        if estado == 200:
+            exacto = consulta_enumeracion('DiagnosticoCardio', dict(datos['evidencia']), G,
+                                          nivel_traza='apagado')
+            assert _error_maximo(exacto, cuerpo['distribucion']) < 1e-9
+    print(f"Content-Length inválido: {crudo}")
+    assert crudo == 400
+
+
+def test_cli_consultar_registros_de_error():
+    """Caso 18: el subcomando consultar escribe un registro por línea de entrada, en orden.
+
+    Las líneas de JSONL mal formadas producen {"linea": N, "error": ...} sin detener el
+    resto, las consultas válidas coinciden con enumeración y un CSV sin columna 'x'
+    termina con un mensaje de error claro.
+    """
+    G = construir_red_bayesiana(CARPETA_CARDIO / 'edges.csv', CARPETA_CARDIO)
+    lineas = [json.dumps({'x': 'DiagnosticoCardio', 'evidencia': EVIDENCIAS[0]}),
+              '{"x": "DiagnosticoCardio", "evidencia": ',
+              '["DiagnosticoCardio"]',
+              json.dumps({'evidencia': EVIDENCIAS[1]}),
+              json.dumps({'x': 'DiagnosticoCardio', 'evidencia': {'Edad': 'anciano'}}),
+              json.dumps({'x': 'DiagnosticoCardio', 'evidencia': EVIDENCIAS[2]})]
+    print("\nTest 18: consultar en flujo con registros mal formados")
+    with tempfile.TemporaryDirectory() as temporal:
+        temporal = Path(temporal)
+        entrada, salida = temporal / 'consultas.jsonl', temporal / 'resultados.jsonl'
+        entrada.write_text('\n'.join(lineas) + '\n', encoding='utf-8')
+        args = argparse.Namespace(red=str(CARPETA_CARDIO), entrada=str(entrada),
+                                  salida=str(salida), formato=None, motor='eliminacion',
+                                  procesos=1, tam_bloque=2, ventana=None)
+        consultar(args)
+        registros = [json.loads(l) for l in salida.read_text(encoding='utf-8').splitlines()]
+        for registro in registros:
+            print(registro)
+        assert len(registros) == len(lineas)
+        assert [r.get('linea') for r in registros] == [None, 2, 3, 4, None, None]
+        assert 'error' in registros[4]
+        for registro in (registros[0], registros[5]):
+            exacto = consulta_enumeracion('DiagnosticoCardio', dict(registro['evidencia']), G,
+                                          nivel_traza='apagado')
+            assert _error_maximo(exacto, registro['distribucion']) < 1e-9
+
+        csv_invalido = temporal / 'consultas.csv'
+        csv_invalido.write_text('variable,Edad\nDiagnosticoCardio,mayor\n', encoding='utf-8')
+        args.entrada = str(csv_invalido)
+        try:
+            consultar(args)
+        except SystemExit as e:
+            print(e.code)
+            assert "columna 'x'" in str(e.code)
+        else:
+            raise AssertionError("consultar aceptó un CSV sin columna 'x'")
+
+
+def test_pool_inferencia():
+    """Caso 19: PoolInferencia reparte las consultas y conserva su orden.
+
+    Con 2 procesos y bloques de 2 consultas, las válidas deben coincidir con enumeración
+    y cada consulta inválida (variable desconocida, X que no es cadena, evidencia que
+    no es objeto, valor fuera de dominio) debe traer su mensaje sin afectar al resto.
+    Los tiempos por trabajador deben sumar todas las consultas.
+    """
+    G = construir_red_bayesiana(CARPETA_CARDIO / 'edges.csv', CARPETA_CARDIO, compilar=True)
+    consultas = [('DiagnosticoCardio', e) for e in EVIDENCIAS]
+    consultas += [('Colesterol', {}), (None, {}), ('DiagnosticoCardio', ['Edad']),
+                  ('DiagnosticoCardio', {'Edad': 'anciano'}), ('Fatiga', {'Edad': 'mayor'})]
+    validas = [True] * len(EVIDENCIAS) + [False, False, False, False, True]
+    print("\nTest 19: pool de procesos vs. enumeración")
+    with PoolInferencia(G, procesos=2, motor='eliminacion', tam_bloque=2) as pool:
+        resultado = pool.consultar(consultas)
+    for (X, evidencia), valida, dist, error in zip(consultas, validas,
+                                                   resultado.distribuciones, resultado.errores):
+        print(f"{X!r} dado {evidencia!r}: {dist if error is None else error}")
+        if valida:
+            assert error is None
+            exacto = consulta_enumeracion(X, dict(evidencia), G, nivel_traza='apagado')
+            assert _error_maximo(exacto, dist) < 1e-9
+        else:
+            assert dist is None and error
+    assert sum(t.consultas for t in resultado.trabajadores.values()) == len(consultas)
+
+
+def test_generador_redes():
+    """Caso 20: las redes sintéticas son válidas y reproducibles.
+
+    Para cada topología (con y sin dispersión) la red escrita en CSV debe cargarse y
+    compilarse (lo que valida que cada CPT sume 1), ser acíclica, respetar max_padres
+    y el rango de tamaños de dominio. Con la misma semilla se obtiene la misma red.
+    """
+    print("\nTest 20: generador de redes sintéticas")
+    configuraciones = [{'topologia': 'aleatoria', 'localidad': 5},
+                       {'topologia': 'capas', 'n_capas': 4, 'dispersion': 0.3}]
+    with tempfile.TemporaryDirectory() as temporal:
+        for k, parametros in enumerate(configuraciones):
+            aristas, cpts = generar_red(40, max_padres=3, tam_dominio=(2, 4), semilla=k,
+                                        **parametros)
+            carpeta = Path(temporal) / parametros['topologia']
+            escribir_red(carpeta, aristas, cpts)
+            G = construir_red_bayesiana(carpeta / 'edges.csv', carpeta, compilar=True)
+            tamanos = {len(d) for d in G.graph['dominios'].values()}
+            max_padres = max(G.in_degree(n) for n in G.nodes)
+            print(f"{parametros}: {G.number_of_nodes()} nodos, {G.number_of_edges()} aristas, "
+                  f"hasta {max_padres} padres, dominios de tamaño {sorted(tamanos)}")
+            assert G.number_of_nodes() == 40 and nx.is_directed_acyclic_graph(G)
+            assert max_padres <= 3 and tamanos <= {2, 3, 4}
+
+            otra_aristas, otras_cpts = generar_red(40, max_padres=3, tam_dominio=(2, 4),
+                                                   semilla=k, **parametros)
+            assert otra_aristas == aristas
+            assert all(otras_cpts[n].equals(cpts[n]) for n in cpts)
+
+
+def test_reemplazar_cpt_en_modelo_binario():
+    """Caso 21: reemplazar una CPT en una red cargada de un .bnc.
+
+    Los nodos del modelo binario sólo tienen 'cpt_compilada'; tras reemplazar_cpt sus
+    dominios se conservan y las consultas deben coincidir con una red CSV a la que se
+    le reemplazó la misma CPT. Una CPT inválida se rechaza sin modificar el modelo.
+    """
+    G = construir_red_bayesiana(CARPETA_CARDIO / 'edges.csv', CARPETA_CARDIO, compilar=True)
+    nueva = G.nodes['Obesidad']['cpt'].iloc[::-1].reset_index(drop=True)
+    nueva['prob'] = [0.25, 0.75]
+    print("\nTest 21: reemplazar una CPT en un modelo .bnc")
+    with tempfile.TemporaryDirectory() as temporal:
+        ruta = Path(temporal) / 'cardio.bnc'
+        guardar_modelo(G, ruta)
+        H = cargar_modelo(ruta)
+    dominios = dict(H.graph['dominios'])
+    reemplazar_cpt(H, 'Obesidad', nueva.copy())
+    reemplazar_cpt(G, 'Obesidad', nueva.copy())
+    assert H.graph['dominios'] == dominios
+    for evidencia in EVIDENCIAS:
+        esperado = consulta_enumeracion('DiagnosticoCardio', dict(evidencia), G,
+                                        nivel_traza='apagado')
+        obtenido = consulta_enumeracion('DiagnosticoCardio', dict(evidencia), H,
+                                        nivel_traza='apagado')
+        error = _error_maximo(esperado, obtenido)
+        print(f"Evidencia {evidencia}: error absoluto máximo {error:.2e}")
+        assert error < 1e-12
+    invalida = nueva.assign(prob=[0.5, 0.6])
+    try:
+        reemplazar_cpt(H, 'Obesidad', invalida)
+    except ValueError as e:
+        print(f"CPT inválida rechazada: {e}")
+    else:
+        raise AssertionError("reemplazar_cpt aceptó una CPT que no suma 1")
+    assert H.nodes['Obesidad']['cpt'] is not invalida
+    assert consulta_enumeracion('DiagnosticoCardio', dict(EVIDENCIAS[0]), H,
+                                nivel_traza='apagado') == \
+        consulta_enumeracion('DiagnosticoCardio', dict(EVIDENCIAS[0]), G, nivel_traza='apagado')
+
+
+def test_cache_motores_y_huella_guardada():
+    """Caso 22: la caché acepta motores sin traza y reutiliza la huella de la red.
+
+    Con motor=consulta_muestreo_ponderado (que no acepta nivel_traza y retorna un
+    ResultadoMuestreo) se guarda la distribución y la segunda consulta es un acierto.
+    La huella queda en G.graph['huella_red'] y se reutiliza mientras ninguna CPT cambie;
+    reemplazar_cpt la invalida.
+    """
+    G = construir_red_bayesiana(CARPETA_CARDIO / 'edges.csv', CARPETA_CARDIO, compilar=True)
+    cache = CachePosteriores()
+    print("\nTest 22: motores de la caché y huella guardada")
+    primera = cache.consultar('DiagnosticoCardio', EVIDENCIAS[0], G,
+                              motor=consulta_muestreo_ponderado, n_muestras=10_000, semilla=0)
+    segunda = cache.consultar('DiagnosticoCardio', EVIDENCIAS[0], G,
+                              motor=consulta_muestreo_ponderado, n_muestras=10_000, semilla=0)
+    print(f"Muestreo ponderado: {primera}, aciertos {cache.aciertos}")
+    assert isinstance(primera, dict) and segunda == primera and cache.aciertos == 1
+
+    guardada = G.graph['huella_red']
+    assert huella_red(G) == guardada[2] and G.graph['huella_red'] is guardada
+    nueva = G.nodes['Obesidad']['cpt'].copy()
+    nueva['prob'] = nueva['prob'].to_numpy()[::-1]
+    reemplazar_cpt(G, 'Obesidad', nueva)
+    assert 'huella_red' not in G.graph
+    assert huella_red(G) != guardada[2]
+
+
+def test_benchmarks_clasifica_comparaciones():
+    """Caso 23: comparar clasifica cada caso de benchmark contra una línea base fija.
+
+    Con el umbral por defecto (25 %), 1.5x es regresión, 0.5x es mejora y 1.16x (el
+    ruido observado entre corridas de 5 repeticiones) es igual; una diferencia menor que
+    MINIMO_SEGUNDOS nunca es regresión. También se reportan casos nuevos, ausentes y
+    omitidos, y un umbral de 10 % convierte el 1.16x en regresión.
+    """
+    def informe(medianas):
+        resultados = [{'red': 'cardio', 'caso': caso} if m is None else
+                      {'red': 'cardio', 'caso': caso, 'mediana': m}
+                      for caso, m in medianas.items()]
+        return {'metadatos': {}, 'resultados': resultados}
+
+    base = informe({'enumeracion': 0.010, 'eliminacion': 0.010, 'arbol_uniones': 0.010,
+                    'planificador': 1e-5, 'lote': 0.010, 'carga': None})
+    nuevo = informe({'enumeracion': 0.015, 'eliminacion': 0.005, 'arbol_uniones': 0.0116,
+                     'planificador': 5e-5, 'muestreo': 0.010, 'carga': None})
+    esperados = {'enumeracion': 'regresion', 'eliminacion': 'mejora', 'arbol_uniones': 'igual',
+                 'planificador': 'igual', 'lote': 'ausente', 'carga': 'omitido',
+                 'muestreo': 'nuevo'}
+    print("\nTest 23: clasificación de comparaciones de benchmarks")
+    estados = {c.caso: c.estado for c in comparar_benchmarks(base, nuevo)}
+    print(estados)
+    assert estados == esperados
+    estricto = {c.caso: c.estado for c in comparar_benchmarks(base, nuevo, umbral=0.10)}
+    assert estricto['arbol_uniones'] == 'regresion'
+
+
+def test_planificador():
+    """Caso 24: el planificador elige un motor por costo y descarta lo calculado si la red
+    cambia.
+
+    P(Edad) (un nodo raíz sin evidencia) va a enumeración; con max_operaciones=1 ningún
+    motor exacto cabe para P(DiagnosticoCardio | e) y se usa muestreo. Las respuestas de
+    consultar coinciden con enumeración. Tras reemplazar_cpt se descartan los planes y
+    el árbol de uniones guardados y la nueva respuesta usa la CPT nueva.
+    """
+    G = construir_red_bayesiana(CARPETA_CARDIO / 'edges.csv', CARPETA_CARDIO, compilar=True)
+    planificador = Planificador(G)
+    print("\nTest 24: planificador de consultas")
+    plan = planificador.planear('Edad', {})
+    print(planificador.explicar('Edad', {}))
+    assert plan.motor == 'enumeracion' and plan.relevantes == ('Edad',)
+    assert planificador.explicar('Edad', {}).endswith("Motor elegido: enumeracion")
+    restringido = Planificador(G, max_operaciones=1, n_muestras=20_000, semilla=0)
+    plan = restringido.planear('DiagnosticoCardio', EVIDENCIAS[1])
+    print(f"max_operaciones=1: {plan.motor}")
+    assert plan.motor == 'muestreo'
+
+    for evidencia in EVIDENCIAS:
+        esperado = consulta_enumeracion('DiagnosticoCardio', dict(evidencia), G,
+                                        nivel_traza='apagado')
+        plan = planificador.planear('DiagnosticoCardio', evidencia)
+        error = _error_maximo(esperado, planificador.consultar('DiagnosticoCardio', evidencia))
+        print(f"Evidencia {evidencia}: motor {plan.motor}, error absoluto máximo {error:.2e}")
+        assert error < 1e-9
+
+    todas = list(vista_modelo(G).orden_topologico)
+    assert planificador.planear(todas, {}).motor == 'arbol_uniones'
+    antes = planificador.consultar(todas, {})
+    arbol = planificador._arbol
+    assert arbol is not None and len(planificador._planes) == 5
+    nueva = G.nodes['Obesidad']['cpt'].copy()
+    nueva['prob'] = nueva['prob'].to_numpy()[::-1]
+    reemplazar_cpt(G, 'Obesidad', nueva)
+    despues = planificador.consultar(todas, {})
+    esperado = consulta_enumeracion('Fatiga', {}, G, nivel_traza='apagado')
+    print(f"Tras reemplazar_cpt: P(Fatiga) {antes['Fatiga']} -> {despues['Fatiga']}")
+    assert _error_maximo(esperado, despues['Fatiga']) < 1e-9
+    assert _error_maximo(antes['Fatiga'], despues['Fatiga']) > 1e-3
+    assert planificador._arbol is not arbol
+    assert list(planificador._planes) == [(tuple(todas), frozenset(), True)]
+
+
+def test_perfil_inferencia():
+    """Caso 25: contadores por nodo de la enumeración.
+
+    P(Fatiga | Edad=mayor) enumera, podada, Obesidad -> Sedentarismo -> Fatiga (todas
+    binarias) una vez por cada valor de Fatiga. Por valor de Fatiga hay 1 entrada a
+    Obesidad (2 búsquedas), 2 entradas a Sedentarismo (4 búsquedas) y 4 entradas a
+    Fatiga (observada, 4 búsquedas), y cada búsqueda va seguida de un producto. Con
+    perfil el resultado es (distribución, PerfilInferencia), con la misma distribución
+    que sin perfil, y un perfil compartido acumula las cuentas de varias consultas.
+    """
+    G = construir_red_bayesiana(CARPETA_CARDIO / 'edges.csv', CARPETA_CARDIO, compilar=True)
+    evidencia = {'Edad': 'mayor'}
+    esperado = consulta_enumeracion('Fatiga', dict(evidencia), G, nivel_traza='apagado')
+    resultado = consulta_enumeracion('Fatiga', dict(evidencia), G, nivel_traza='apagado',
+                                     perfil=True)
+    print("\nTest 25: perfil por nodo de la enumeración")
+    assert isinstance(resultado, tuple) and len(resultado) == 2
+    dist, perfil = resultado
+    assert isinstance(perfil, PerfilInferencia) and dist == esperado
+    print(perfil)
+    cuentas = {'Obesidad': (2, 4, 4), 'Sedentarismo': (4, 8, 8), 'Fatiga': (8, 8, 8)}
+
+    def verificar(factor):
+        assert set(perfil.entradas) == set(cuentas)
+        for v, (entradas, consultas_cpt, multiplicaciones) in cuentas.items():
+            assert perfil.entradas[v] == factor * entradas
+            assert perfil.consultas_cpt[v] == factor * consultas_cpt
+            assert perfil.multiplicaciones[v] == factor * multiplicaciones
+
+    verificar(1)
+    assert perfil.consultas == 1
+    otra, mismo = consulta_enumeracion('Fatiga', dict(evidencia), G, nivel_traza='apagado',
+                                       perfil=perfil)
+    assert mismo is perfil and otra == esperado
+    verificar(2)
+    assert perfil.consultas == 2 and perfil.segundos_total > 0
+    assert consulta_enumeracion('Fatiga', dict(evidencia), G, nivel_traza='apagado',
+                                perfil=False) == esperado
+
+
+def _trazar(X, evidencia, G, ruta, **opciones):
+    """Ejecuta consulta_enumeracion escribiendo la traza en ruta sin imprimirla."""
+    with RastreadorInferencia(ruta, imprimir=False, **opciones) as rastreador:
+        return consulta_enumeracion(X, dict(evidencia), G, rastreador=rastreador)
+
+
+def test_traza_jsonl_y_analisis():
+    """Caso 26: la traza JSONL se vuelve a renderizar igual que la traza de texto y el
+    análisis reconstruye el árbol de enumeración.
+
+    P(Fatiga | Edad=mayor) enumera Obesidad -> Sedentarismo -> Fatiga una vez por valor
+    de Fatiga: Obesidad entra 2 veces con subárboles de 7 nodos, Sedentarismo 4 con 3
+    nodos y Fatiga (observada) 8 con 1 nodo; en total 14 nodos a profundidad 3.
+    """
+    G = construir_red_bayesiana(CARPETA_CARDIO / 'edges.csv', CARPETA_CARDIO, compilar=True)
+    evidencia = {'Edad': 'mayor'}
+    print("\nTest 26: traza JSONL, renderizado y análisis")
+    with tempfile.TemporaryDirectory() as temporal:
+        texto, jsonl = Path(temporal) / 'traza.txt', Path(temporal) / 'traza.jsonl'
+        _trazar('Fatiga', evidencia, G, texto)
+        _trazar('Fatiga', evidencia, G, jsonl, formato='jsonl')
+        renderizada = '\n'.join(renderizar(leer_registros(jsonl))) + '\n'
+        assert renderizada == texto.read_text(encoding='utf-8')
+        stats, resumen = analizar(leer_registros(jsonl))
+    print(resumen)
+    assert resumen == {'consultas': 1, 'nodos': 14, 'profundidad_max': 3}
+    esperadas = {'Obesidad': (2, 14, 7), 'Sedentarismo': (4, 12, 3), 'Fatiga': (8, 8, 1)}
+    for v, (llamadas, nodos, maximo) in esperadas.items():
+        st = stats[v]
+        print(f"{v}: {st.llamadas} llamadas, subárbol total {st.nodos_subarbol}, "
+              f"máximo {st.max_subarbol}")
+        assert (st.llamadas, st.nodos_subarbol, st.max_subarbol) == (llamadas, nodos, maximo)
+        assert st.aciertos_cache == 0
+    assert set(stats) == set(esperadas)
+
+
+def test_niveles_y_escritores_de_traza():
+    """Caso 27: niveles de traza y escritores por bloques o en segundo plano.
+
+    Con nivel 'apagado' no se crea el archivo de log. Con 'resumen' sólo se escriben
+    registros de resumen (ninguno de TIPOS_DETALLE) y la posterior es la misma. Con
+    'completo', escribir línea a línea (tam_bloque=1), por bloques y desde un hilo
+    escritor produce archivos idénticos, en texto y en JSONL (sin marcas de tiempo).
+    """
+    G = construir_red_bayesiana(CARPETA_CARDIO / 'edges.csv', CARPETA_CARDIO, compilar=True)
+    X, evidencia = 'DiagnosticoCardio', EVIDENCIAS[0]
+    esperado = consulta_enumeracion(X, dict(evidencia), G, nivel_traza='apagado')
+    print("\nTest 27: niveles de traza y escritores")
+    with tempfile.TemporaryDirectory() as temporal:
+        temporal = Path(temporal)
+        apagado = temporal / 'apagado.txt'
+        assert consulta_enumeracion(X, dict(evidencia), G, archivo_log=apagado,
+                                    nivel_traza='apagado') == esperado
+        assert not apagado.exists()
+
+        resumen = temporal / 'resumen.jsonl'
+        assert _trazar(X, evidencia, G, resumen, nivel='resumen', formato='jsonl') == esperado
+        tipos = [r['t'] for r in leer_registros(resumen)]
+        print(f"Registros de resumen: {sorted(set(tipos))}")
+        assert tipos and not TIPOS_DETALLE & set(tipos)
+        assert {'consulta', 'res_x', 'posterior'} <= set(tipos)
+
+        for formato in ('texto', 'jsonl'):
+            contenidos = {}
+            for nombre, opciones in (('sincrono', {'tam_bloque': 1}),
+                                     ('bloques', {'tam_bloque': 7}),
+                                     ('segundo_plano', {'tam_bloque': 7,
+                                                        'en_segundo_plano': True})):
+                ruta = temporal / f'{nombre}.{formato}'
+                assert _trazar(X, evidencia, G, ruta, formato=formato, **opciones) == esperado
+                if formato == 'jsonl':
+                    registros = list(leer_registros(ruta))
+                    for r in registros:
+                        r.pop('ts')
+                    contenidos[nombre] = registros
+                else:
+                    contenidos[nombre] = ruta.read_text(encoding='utf-8')
+            print(f"{formato}: {len(contenidos['sincrono'])} "
+                  f"{'registros' if formato == 'jsonl' else 'caracteres'} por escritor")
+            assert contenidos['bloques'] == contenidos['sincrono']
+            assert contenidos['segundo_plano'] == contenidos['sincrono']
+
+
+def test_orden_eliminacion():
+    """Caso 28: heurísticas de orden de eliminación sobre un ciclo A-B-C-D-A.
+
+    Con |A| = |C| = 2 y |B| = |D| = 3, calculado a mano:
+    - 'min_relleno' (empates por nombre) elimina A (relleno B-D, clique ABD de 18
+      celdas), luego B (BCD, 18), C (CD, 6) y D (3): total 45, clique máxima 3.
+    - 'min_relleno_ponderado' prefiere B (relleno A-C de peso 4 contra 9), luego A
+      (ACD, 12), C (6) y D (3): total 12 + 12 + 6 + 3 = 33.
+    El desempate aleatorio con la misma semilla da siempre el mismo orden, mejor_orden
+    no es peor que ninguna heurística y una heurística desconocida lanza ValueError.
+    """
+    ciclo = grafo_interaccion([('A', 'B'), ('B', 'C'), ('C', 'D'), ('D', 'A')])
+    cardinalidades = {'A': 2, 'B': 3, 'C': 2, 'D': 3}
+    print("\nTest 28: órdenes de eliminación")
+    relleno = ordenar_eliminacion(ciclo, cardinalidades, heuristica='min_relleno')
+    print(relleno, relleno.orden, relleno.cliques)
+    assert relleno.orden == ('A', 'B', 'C', 'D')
+    assert relleno.cliques == [('A', 'B', 'D'), ('B', 'C', 'D')]
+    assert (relleno.tamano_clique_max, relleno.celdas_max, relleno.tamano_total) == (3, 18, 45)
+    ponderado = ordenar_eliminacion(ciclo, cardinalidades)
+    print(ponderado, ponderado.orden, ponderado.cliques)
+    assert ponderado.orden == ('B', 'A', 'C', 'D')
+    assert ponderado.cliques == [('A', 'B', 'C'), ('A', 'C', 'D')]
+    assert (ponderado.tamano_clique_max, ponderado.celdas_max, ponderado.tamano_total) == \
+        (3, 12, 33)
+    parcial = ordenar_eliminacion(ciclo, cardinalidades, variables=['A'],
+                                  heuristica='min_grado')
+    assert parcial.orden == ('A',) and parcial.tamano_total == 18
+
+    moral = grafo_moral(construir_red_bayesiana(CARPETA_CARDIO / 'edges.csv', CARPETA_CARDIO))
+    dominios = {v: 2 if v != 'Edad' else 3 for v in moral.nodes}
+    for heuristica in HEURISTICAS:
+        ordenes = {ordenar_eliminacion(moral, dominios, heuristica=heuristica, semilla=7).orden
+                   for _ in range(3)}
+        assert len(ordenes) == 1 and sorted(next(iter(ordenes))) == sorted(moral.nodes)
+    mejor = mejor_orden(moral, dominios)
+    print(f"mejor_orden en cardio: {mejor}")
+    assert all(mejor.costo() <= ordenar_eliminacion(moral, dominios, heuristica=h).costo()
+               for h in HEURISTICAS)
+    try:
+        ordenar_eliminacion(ciclo, cardinalidades, heuristica='max_grado')
+    except ValueError as e:
+        print(f"Heurística desconocida: {e}")
+    else:
+        raise AssertionError("ordenar_eliminacion aceptó una heurística desconocida")
+
+
 def main():
     """Ejecuta todos los casos de prueba."""
     print("Ejecutando casos de prueba para el diagnóstico cardíaco...")
     test_persona_mayor_presion_alta()
     test_persona_joven_sedentaria()
     test_persona_adulta_sintomas()
+    test_eliminacion_coincide_con_enumeracion()
+    test_cache_invalida_cpt_reemplazada()
+    test_arbol_uniones_coincide_con_enumeracion()
+    test_poda_no_cambia_posteriores()
+    test_enumeracion_memoizada()
+    test_consulta_lote_coincide_con_enumeracion()
+    test_muestreo_ponderado_cerca_de_enumeracion()
+    test_gibbs_cerca_de_enumeracion()
+    test_modelo_binario_ida_y_vuelta()
+    test_indice_cpt_se_reconstruye()
+    test_completar_complementos()
+    test_cache_lru_y_expiracion()
+    test_sesion_evidencia_incremental()
+    test_servidor_aisla_errores()
+    test_cli_consultar_registros_de_error()
+    test_pool_inferencia()
+    test_generador_redes()
+    test_reemplazar_cpt_en_modelo_binario()
+    test_cache_motores_y_huella_guardada()
+    test_benchmarks_clasifica_comparaciones()
+    test_planificador()
+    test_perfil_inferencia()
+    test_traza_jsonl_y_analisis()
+    test_niveles_y_escritores_de_traza()
+    test_orden_eliminacion()
 
 
 if __name__ == '__main__':
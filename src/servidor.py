@@ -0,0 +1,391 @@
+"""Servidor HTTP/JSON de inferencia sobre asyncio, con agrupación de solicitudes.
+
+Las redes se cargan (compiladas) una sola vez al arrancar. Cada solicitud se encola
+en la red correspondiente; una tarea por red espera una ventana corta (ventana_ms)
+para juntar las solicitudes concurrentes y las resuelve todas con una llamada a
+lote.consulta_lote por variable de consulta, en un hilo aparte para no bloquear el
+bucle de eventos.
+
+- Contrapresión: si la cola de una red tiene max_pendientes solicitudes, las nuevas
+  se rechazan de inmediato con 503.
+- Tiempo límite: una solicitud que no se resuelve en tiempo_limite segundos recibe 504.
+
+Rutas:
+    POST /consulta      {"red": ..., "x": ..., "evidencia": {...}} -> {"distribucion": {...}}
+    GET  /redes         dominios de cada red cargada
+    GET  /estadisticas  contadores del servidor
+
+Uso:
+    python -m src.servidor servir --red cardio=data/cardio --puerto 8765
+    python -m src.servidor carga --red cardio --puerto 8765 --total 5000 --concurrencia 64
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.bayesnet import vista_modelo
+from src.formato_binario import cargar_red
+from src.lote import consulta_lote
+
+MAX_CUERPO = 1 << 20
+RAZONES = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable', 504: 'Gateway Timeout'}
+
+
+class ErrorSolicitud(Exception):
+    """Error que se responde al cliente con el código HTTP dado."""
+    def __init__(self, estado, mensaje):
+        super().__init__(mensaje)
+        self.estado = estado
+
+
+def resolver_lote(G, solicitudes):
+    """Resuelve una lista de (X, evidencia); retorna una lista de dicts o excepciones.
+
+    Las solicitudes se agrupan por X y cada grupo se evalúa con una sola llamada a
+    consulta_lote. Si un grupo falla (por ejemplo, por un valor fuera de dominio) se
+    reintenta solicitud por solicitud para aislar a las que causan el error: las de
+    datos inválidos reciben 400 y cualquier otra falla 500, sin afectar al resto.
+    """
+    resultados = [None] * len(solicitudes)
+    grupos = {}
+    for k, (X, evidencia) in enumerate(solicitudes):
+        if isinstance(X, str):
+            grupos.setdefault(X, []).append(k)
+        else:
+            resultados[k] = ErrorSolicitud(400, "'x' debe ser el nombre de una variable")
+    for X, posiciones in grupos.items():
+        try:
+            filas = _evaluar(G, X, [solicitudes[k][1] for k in posiciones])
+        except Exception:
+            filas = [_evaluar_una(G, X, solicitudes[k][1]) for k in posiciones]
+        for k, fila in zip(posiciones, filas):
+            resultados[k] = fila
+    return resultados
+
+
+def _evaluar_una(G, X, evidencia):
+    """Evalúa una sola solicitud; retorna su fila o la ErrorSolicitud que le corresponde."""
+    try:
+        return _evaluar(G, X, [evidencia])[0]
+    except (KeyError, ValueError, TypeError) as e:
+        return ErrorSolicitud(400, e.args[0] if e.args else type(e).__name__)
+    except Exception as e:
+        return ErrorSolicitud(500, f"Error interno: {e}")
+
+
+def _evaluar(G, X, evidencias):
+    if X not in G.nodes:
+        raise KeyError(f"Variable '{X}' no está en la red")
+    tabla = consulta_lote(X, pd.DataFrame.from_records(evidencias, index=range(len(evidencias))), G)
+    filas = []
+    for fila in tabla.itertuples(index=False):
+        if np.isnan(fila[0]):
+            filas.append(ErrorSolicitud(400, "La evidencia tiene probabilidad cero"))
+        else:
+            filas.append({str(val): float(p) for val, p in zip(tabla.columns, fila)})
+    return filas
+
+
+class ServidorInferencia:
+    """Servidor de consultas con una cola y una tarea de agrupación por red.
+
+    Args:
+        redes: dict nombre -> networkx.DiGraph (conviene compilado)
+        ventana_ms: milisegundos que se espera para juntar solicitudes en un lote
+        tam_lote: máximo de solicitudes por lote
+        max_pendientes: tamaño máximo de la cola de cada red (contrapresión)
+        tiempo_limite: segundos máximos por solicitud
+    """
+    def __init__(self, redes, ventana_ms=5.0, tam_lote=256, max_pendientes=1024,
+                 tiempo_limite=2.0):
+        self.redes = redes
+        self.ventana = ventana_ms / 1000
+        self.tam_lote = tam_lote
+        self.max_pendientes = max_pendientes
+        self.tiempo_limite = tiempo_limite
+        self.colas = {}
+        self.tareas = []
+        self.estadisticas = {'solicitudes': 0, 'lotes': 0, 'resueltas': 0,
+                             'rechazadas': 0, 'vencidas': 0, 'errores': 0}
+
+    async def iniciar(self, host='127.0.0.1', puerto=8765):
+        """Arranca las tareas de agrupación y retorna el asyncio.Server."""
+        for nombre in self.redes:
+            self.colas[nombre] = asyncio.Queue(self.max_pendientes)
+            self.tareas.append(asyncio.create_task(self._procesar_lotes(nombre)))
+        return await asyncio.start_server(self._atender, host, puerto)
+
+    async def detener(self):
+        """Cancela las tareas de agrupación."""
+        for tarea in self.tareas:
+            tarea.cancel()
+        await asyncio.gather(*self.tareas, return_exceptions=True)
+
+    async def consultar(self, red, X, evidencia):
+        """Encola la consulta y espera su resultado (dict valor -> probabilidad)."""
+        if red not in self.colas:
+            raise ErrorSolicitud(404, f"Red '{red}' no cargada")
+        futuro = asyncio.get_running_loop().create_future()
+        try:
+            self.colas[red].put_nowait((X, evidencia, futuro))
+        except asyncio.QueueFull:
+            self.estadisticas['rechazadas'] += 1
+            raise ErrorSolicitud(503, "Demasiadas solicitudes pendientes") from None
+        try:
+            return await asyncio.wait_for(futuro, self.tiempo_limite)
+        except asyncio.TimeoutError:
+            self.estadisticas['vencidas'] += 1
+            raise ErrorSolicitud(504, "Tiempo límite agotado") from None
+
+    async def _procesar_lotes(self, nombre):
+        cola = self.colas[nombre]
+        bucle = asyncio.get_running_loop()
+        while True:
+            lote = [await cola.get()]
+            if len(lote) < self.tam_lote and self.ventana > 0:
+                await asyncio.sleep(self.ventana)
+            while len(lote) < self.tam_lote and not cola.empty():
+                lote.append(cola.get_nowait())
+            # las solicitudes vencidas o canceladas mientras esperaban no se evalúan
+            lote = [s for s in lote if not s[2].done()]
+            if not lote:
+                continue
+            self.estadisticas['lotes'] += 1
+            try:
+                resultados = await bucle.run_in_executor(
+                    None, resolver_lote, self.redes[nombre], [(X, e) for X, e, _ in lote])
+            except Exception as e:  # error inesperado: se reporta a todo el lote
+                resultados = [ErrorSolicitud(500, f"Error interno: {e}")] * len(lote)
+            for (_, _, futuro), resultado in zip(lote, resultados):
+                if futuro.done():
+                    continue
+                if isinstance(resultado, Exception):
+                    futuro.set_exception(resultado)
+                else:
+                    futuro.set_result(resultado)
+
+    async def _atender(self, reader, writer):
+        try:
+            while True:
+                try:
+                    solicitud = await _leer_solicitud(reader)
+                except ErrorSolicitud as e:
+                    await _responder(writer, e.estado, {'error': str(e)}, cerrar=True)
+                    break
+                if solicitud is None:
+                    break
+                metodo, ruta, cuerpo, seguir = solicitud
+                estado, respuesta = await self._despachar(metodo, ruta, cuerpo)
+                await _responder(writer, estado, respuesta, cerrar=not seguir)
+                if not seguir:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:  # error inesperado: se responde 500 y se cierra
+            try:
+                await _responder(writer, 500, {'error': f"Error interno: {e}"}, cerrar=True)
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    async def _despachar(self, metodo, ruta, cuerpo):
+        try:
+            if ruta == '/consulta':
+                if metodo != 'POST':
+                    raise ErrorSolicitud(405, "Use POST")
+                self.estadisticas['solicitudes'] += 1
+                red, X, evidencia = _validar_consulta(cuerpo)
+                distribucion = await self.consultar(red, X, evidencia)
+                self.estadisticas['resueltas'] += 1
+                return 200, {'distribucion': distribucion}
+            if ruta == '/redes':
+                return 200, {nombre: {v: list(d) for v, d in vista_modelo(G).dominios.items()}
+                             for nombre, G in self.redes.items()}
+            if ruta == '/estadisticas':
+                pendientes = {nombre: cola.qsize() for nombre, cola in self.colas.items()}
+                return 200, {**self.estadisticas, 'pendientes': pendientes}
+            raise ErrorSolicitud(404, f"Ruta desconocida: {ruta}")
+        except ErrorSolicitud as e:
+            if e.estado == 400:
+                self.estadisticas['errores'] += 1
+            return e.estado, {'error': str(e)}
+
+
+def _validar_consulta(cuerpo):
+    """Retorna (red, x, evidencia) del cuerpo JSON; lanza ErrorSolicitud(400) si no es válido."""
+    try:
+        datos = json.loads(cuerpo)
+        red, X = datos['red'], datos['x']
+        evidencia = datos.get('evidencia') or {}
+    except (ValueError, KeyError, TypeError, AttributeError):
+        raise ErrorSolicitud(400, "Se espera JSON con 'red', 'x' y 'evidencia'") from None
+    if not isinstance(red, str) or not isinstance(X, str):
+        raise ErrorSolicitud(400, "'red' y 'x' deben ser cadenas")
+    if not isinstance(evidencia, dict) or \
+            not all(isinstance(v, (str, int, float, bool)) for v in evidencia.values()):
+        raise ErrorSolicitud(400, "'evidencia' debe ser un objeto de variable a valor escalar")
+    return red, X, evidencia
+
+
+async def _leer_solicitud(reader):
+    """Lee una solicitud HTTP/1.1; retorna (método, ruta, cuerpo, keep-alive) o None."""
+    linea = await reader.readline()
+    if not linea.strip():
+        return None
+    try:
+        metodo, ruta, version = linea.decode('latin-1').split()
+    except ValueError:
+        raise ErrorSolicitud(400, "Línea de solicitud inválida") from None
+    encabezados = {}
+    while True:
+        linea = await reader.readline()
+        if linea in (b'\r\n', b'\n', b''):
+            break
+        nombre, _, valor = linea.decode('latin-1').partition(':')
+        encabezados[nombre.strip().lower()] = valor.strip()
+    largo = encabezados.get('content-length', '0')
+    if not (largo.isascii() and largo.isdigit()):
+        raise ErrorSolicitud(400, "Content-Length inválido")
+    largo = int(largo)
+    if largo > MAX_CUERPO:
+        raise ErrorSolicitud(413, "Cuerpo demasiado grande")
+    cuerpo = await reader.readexactly(largo) if largo else b''
+    conexion = encabezados.get('connection', '').lower()
+    seguir = conexion != 'close' if version == 'HTTP/1.1' else conexion == 'keep-alive'
+    return metodo, ruta.split('?', 1)[0], cuerpo, seguir
+
+
+async def _responder(writer, estado, datos, cerrar=False):
+    cuerpo = json.dumps(datos, ensure_ascii=False).encode('utf-8')
+    encabezados = [f"HTTP/1.1 {estado} {RAZONES.get(estado, '')}",
+                   'Content-Type: application/json; charset=utf-8',
+                   f'Content-Length: {len(cuerpo)}',
+                   'Connection: close' if cerrar else 'Connection: keep-alive']
+    if estado == 503:
+        encabezados.append('Retry-After: 1')
+    writer.write(('\r\n'.join(encabezados) + '\r\n\r\n').encode('latin-1') + cuerpo)
+    await writer.drain()
+
+
+async def _enviar(reader, writer, host, metodo, ruta, datos=None):
+    """Envía una solicitud por una conexión keep-alive; retorna (estado, JSON)."""
+    cuerpo = json.dumps(datos).encode('utf-8') if datos is not None else b''
+    writer.write((f"{metodo} {ruta} HTTP/1.1\r\nHost: {host}\r\n"
+                  f"Content-Type: application/json\r\nContent-Length: {len(cuerpo)}\r\n\r\n"
+                  ).encode('latin-1') + cuerpo)
+    await writer.drain()
+    estado = int((await reader.readline()).split()[1])
+    largo = 0
+    while True:
+        linea = await reader.readline()
+        if linea in (b'\r\n', b''):
+            break
+        nombre, _, valor = linea.decode('latin-1').partition(':')
+        if nombre.strip().lower() == 'content-length':
+            largo = int(valor)
+    return estado, json.loads(await reader.readexactly(largo))
+
+
+async def prueba_carga(host, puerto, red, total=1000, concurrencia=32, max_evidencia=3,
+                       semilla=0):
+    """Cliente de carga local: envía total consultas aleatorias con concurrencia conexiones.
+
+    Las consultas se generan con los dominios que publica GET /redes. Retorna un dict
+    con la duración, el rendimiento, percentiles de latencia y la cuenta por código HTTP.
+    """
+    reader, writer = await asyncio.open_connection(host, puerto)
+    _, redes = await _enviar(reader, writer, host, 'GET', '/redes')
+    writer.close()
+    dominios = redes[red]
+    variables = sorted(dominios)
+    rng = random.Random(semilla)
+    consultas = []
+    for _ in range(total):
+        X = rng.choice(variables)
+        otras = [v for v in variables if v != X]
+        observadas = rng.sample(otras, rng.randint(0, min(max_evidencia, len(otras))))
+        consultas.append({'red': red, 'x': X,
+                          'evidencia': {v: rng.choice(dominios[v]) for v in observadas}})
+
+    latencias, estados = [], {}
+    siguiente = iter(consultas)
+
+    async def conexion():
+        reader, writer = await asyncio.open_connection(host, puerto)
+        try:
+            for consulta in siguiente:
+                inicio = time.perf_counter()
+                estado, _ = await _enviar(reader, writer, host, 'POST', '/consulta', consulta)
+                latencias.append(time.perf_counter() - inicio)
+                estados[estado] = estados.get(estado, 0) + 1
+        finally:
+            writer.close()
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(conexion() for _ in range(concurrencia)))
+    duracion = time.perf_counter() - inicio
+    p50, p95, p99 = np.percentile(latencias, [50, 95, 99]) * 1000
+    return {'consultas': total, 'duracion_s': duracion, 'por_segundo': total / duracion,
+            'latencia_ms': {'p50': p50, 'p95': p95, 'p99': p99}, 'estados': estados}
+
+
+async def _servir(args):
+    redes = {}
+    for especificacion in args.red:
+        nombre, _, ruta = especificacion.partition('=')
+        redes[nombre] = cargar_red(ruta or nombre)
+    servidor = ServidorInferencia(redes, args.ventana_ms, args.tam_lote,
+                                  args.max_pendientes, args.tiempo_limite)
+    srv = await servidor.iniciar(args.host, args.puerto)
+    print(f"Sirviendo {sorted(redes)} en http://{args.host}:{args.puerto}")
+    try:
+        async with srv:
+            await srv.serve_forever()
+    finally:
+        await servidor.detener()
+
+
+def main():
+    p = argparse.ArgumentParser(description='Servidor HTTP/JSON de inferencia')
+    sub = p.add_subparsers(dest='comando', required=True)
+    p_servir = sub.add_parser('servir', help='Cargar redes y atender consultas')
+    p_servir.add_argument('--red', action='append', required=True,
+                          help='NOMBRE=RUTA (carpeta con CSVs o archivo .bnc); repetible')
+    p_servir.add_argument('--host', default='127.0.0.1')
+    p_servir.add_argument('--puerto', type=int, default=8765)
+    p_servir.add_argument('--ventana-ms', type=float, default=5.0,
+                          help='Ventana de agrupación de solicitudes en milisegundos')
+    p_servir.add_argument('--tam-lote', type=int, default=256)
+    p_servir.add_argument('--max-pendientes', type=int, default=1024,
+                          help='Solicitudes en cola por red antes de responder 503')
+    p_servir.add_argument('--tiempo-limite', type=float, default=2.0,
+                          help='Segundos por solicitud antes de responder 504')
+    p_carga = sub.add_parser('carga', help='Cliente de prueba de carga local')
+    p_carga.add_argument('--red', required=True, help='Nombre de la red en el servidor')
+    p_carga.add_argument('--host', default='127.0.0.1')
+    p_carga.add_argument('--puerto', type=int, default=8765)
+    p_carga.add_argument('--total', type=int, default=1000)
+    p_carga.add_argument('--concurrencia', type=int, default=32)
+    p_carga.add_argument('--semilla', type=int, default=0)
+    args = p.parse_args()
+
+    if args.comando == 'servir':
+        try:
+            asyncio.run(_servir(args))
+        except KeyboardInterrupt:
+            pass
+    else:
+        resultado = asyncio.run(prueba_carga(args.host, args.puerto, args.red, args.total,
+                                             args.concurrencia, semilla=args.semilla))
+        print(json.dumps(resultado, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()